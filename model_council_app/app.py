@@ -1,9 +1,17 @@
 import os
-from flask import Flask, render_template, request, jsonify
-import asyncio
+import json
+import uuid
+from flask import Flask, render_template, request, jsonify, Response, g, make_response
+from werkzeug.utils import secure_filename
 from rag import VectorStore, DocumentProcessor
+from sessions import sessions
 from council import ModelCouncil
+from async_runtime import runtime
+from host_pool import host_pool
+from ingest import ingest_jobs, ingest_file
+from council_runs import parse_run, retrieve_context, council_events, sse
 import config
+import metrics
 
 # Initialize Flask App
 app = Flask(__name__)
@@ -17,27 +25,55 @@ app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Global State (Simple in-memory for single user local app)
-class GlobalState:
-    def __init__(self):
-        self.vector_store = VectorStore()
-        self.doc_loaded = False
-        self.filename = None
-        self.full_text = None
+# Default session: requests without a session id (e.g. API clients), as in the single-user app
+state = sessions.default
 
-state = GlobalState()
+# Keep the model list warm so requests don't pay an ollama.list() round trip
+# (one refresh loop per host; it doubles as the host health check)
+host_pool.start_background_refresh()
+
+@app.before_request
+def open_session():
+    # Each request works on its session's documents; pinned so it isn't unloaded meanwhile
+    session_id = request.headers.get(config.SESSION_HEADER) or request.cookies.get(config.SESSION_COOKIE)
+    g.state = sessions.acquire(session_id)
+
+@app.teardown_request
+def close_session(error=None):
+    session_state = g.pop('state', None)
+    if session_state is not None:
+        sessions.release(session_state)
 
 @app.route('/')
 def index():
-    return render_template('index.html', app_title=config.APP_TITLE, app_icon=config.APP_ICON)
+    response = make_response(render_template('index.html', app_title=config.APP_TITLE, app_icon=config.APP_ICON))
+    if config.SESSIONS_ENABLED and not sessions.valid_id(request.cookies.get(config.SESSION_COOKIE)):
+        # A new browser gets its own workspace
+        response.set_cookie(config.SESSION_COOKIE, uuid.uuid4().hex, max_age=365 * 24 * 3600, httponly=True, samesite='Lax')
+    return response
 
 @app.route('/api/config')
 def get_config():
+    if request.args.get('refresh'):
+        host_pool.invalidate()
     return jsonify({
         "models": ModelCouncil.get_available_models(),
         "personas": config.PERSONAS
     })
 
+@app.route('/api/hosts')
+def get_hosts():
+    return jsonify({"hosts": host_pool.status()})
+
+@app.route('/api/sessions')
+def get_sessions():
+    # Memory use of the loaded sessions, against SESSION_MEMORY_BUDGET (detail only for the caller's own)
+    return jsonify(sessions.public_stats(g.state))
+
+@app.route('/api/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/models')
 def get_models():
     # Deprecated, keeping for backward compat if needed, but /api/config is better
@@ -47,164 +83,183 @@ def get_models():
 @app.route('/api/active_doc')
 def get_active_doc():
     return jsonify({
-        "loaded": state.doc_loaded,
-        "filename": state.filename
+        "loaded": g.state.doc_loaded,
+        "filename": g.state.filename,
+        "documents": g.state.vector_store.documents()
     })
 
+@app.route('/api/documents')
+def list_documents():
+    return jsonify({"documents": g.state.vector_store.documents()})
+
+@app.route('/api/documents/<doc_id>', methods=['DELETE'])
+def delete_document(doc_id):
+    if not g.state.vector_store.delete_document(doc_id):
+        return jsonify({"error": "Document not found"}), 404
+    documents = g.state.vector_store.documents()
+    if not documents:
+        g.state.doc_loaded = False
+        g.state.filename = None
+        g.state.full_text = None
+        g.state.save()
+    return jsonify({"success": True, "documents": documents})
+
 @app.route('/api/history')
 def get_history():
-    return jsonify(HistoryManager.load_history())
+    # Paginated summaries; the total count is returned in a header to keep the list format
+    entries, total = HistoryManager.list_entries(
+        limit=min(request.args.get('limit', 50, type=int), 500),
+        offset=request.args.get('offset', 0, type=int),
+        mode=request.args.get('mode'),
+        model=request.args.get('model'),
+        date_from=request.args.get('from'),
+        date_to=request.args.get('to')
+    )
+    response = jsonify(entries)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+@app.route('/api/history/<int:entry_id>')
+def get_history_entry(entry_id):
+    entry = HistoryManager.get_entry(entry_id)
+    if entry is None:
+        return jsonify({"error": "Entry not found"}), 404
+    return jsonify(entry)
 
 @app.route('/api/upload_url', methods=['POST'])
 def upload_url():
-    data = request.json
-    url = data.get('url')
-    if not url:
+    """
+    Reads one URL ("url") or a list ("urls"), fetched concurrently; each page
+    is added to the session's index as its own document.
+    """
+    data = request.json or {}
+    urls = data.get('urls') or ([data['url']] if data.get('url') else [])
+    urls = list(dict.fromkeys(u.strip() for u in urls if isinstance(u, str) and u.strip()))
+    if not urls:
         return jsonify({"error": "No URL provided"}), 400
-    
+    if len(urls) > config.URL_MAX_PER_REQUEST:
+        return jsonify({"error": f"At most {config.URL_MAX_PER_REQUEST} URLs per request"}), 400
+
+    documents = {}
+    texts = []
     try:
-        text = DocumentProcessor.load_url(url)
-        text = DocumentProcessor.load_url(url)
-        if text:
+        # Pages are indexed as they arrive, while the rest are still being fetched
+        for url, text, cached, error in DocumentProcessor.iter_urls(urls):
+            if not text:
+                documents[url] = {"url": url, "success": False, "error": error or "Could not extract text from URL"}
+                continue
             # Store full text fallback
-            state.full_text = text
-            state.filename = url
-            state.doc_loaded = True # Assume loaded even if embeddings fail, so we can use fallback
-            
-            count = state.vector_store.add_document(text, url)
-            return jsonify({"success": True, "chunks": count, "filename": url})
-        else:
-            return jsonify({"error": "Could not extract text from URL"}), 400
+            texts.append(text)
+            g.state.full_text = "\n\n".join(texts)
+            g.state.filename = url
+            g.state.doc_loaded = True # Assume loaded even if embeddings fail, so we can use fallback
+
+            count = g.state.vector_store.add_document(text, url)
+            documents[url] = {"url": url, "success": True, "chunks": count, "cached": cached,
+                              "ingest": g.state.vector_store.last_ingest_stats}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        if texts:
+            g.state.save()
+
+    documents = [documents[url] for url in urls]
+    loaded = [d for d in documents if d["success"]]
+    if not loaded:
+        return jsonify({"error": "Could not extract text from URL", "documents": documents}), 400
+    return jsonify({"success": True, "chunks": sum(d["chunks"] for d in loaded), "filename": g.state.filename,
+                    "ingest": g.state.vector_store.last_ingest_stats, "documents": documents})
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
+    """
+    Saves the upload to disk and ingests it in the background.
+    Returns a job id right away; progress is streamed by /api/upload/<job_id>/events.
+    """
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
-    
-    if file:
+
+    filename = file.filename
+    ext = filename.split('.')[-1].lower()
+    if ext not in ('pdf', 'docx', 'txt'):
+        return jsonify({"error": "Could not extract text"}), 400
+
+    try:
+        # Streamed to disk instead of read into memory
+        path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{secure_filename(filename) or 'upload'}")
+        file.save(path)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    # The job runs after this request ends: keep the session loaded until it finishes
+    session_state = g.state
+    sessions.pin(session_state)
+
+    def work(job):
         try:
-            filename = file.filename
-            file_bytes = file.read() # Read into memory
-            
-            # Determine type and process
-            ext = filename.split('.')[-1].lower()
-            text = ""
-            
-            import io
-            file_stream = io.BytesIO(file_bytes)
-            
-            if ext == 'pdf':
-                text = DocumentProcessor.load_pdf(file_stream)
-            elif ext == 'docx':
-                text = DocumentProcessor.load_docx(file_stream)
-            elif ext == 'txt':
-                text = DocumentProcessor.load_txt(file_stream)
-                
-            if text:
-                # Store full text fallback
-                state.full_text = text
-                state.filename = filename
-                state.doc_loaded = True # Assume loaded even if embeddings fail
-                
-                count = state.vector_store.add_document(text, filename)
-                return jsonify({"success": True, "chunks": count, "filename": filename})
+            try:
+                result = ingest_file(job, session_state.vector_store, path, ext)
+            finally:
+                os.remove(path)
+            text = result.pop("text")
+            if not text:
+                raise ValueError("Could not extract text")
+            # Store full text fallback (bounded prefix of the document)
+            session_state.full_text = text
+            session_state.filename = filename
+            session_state.doc_loaded = True # Assume loaded even if embeddings fail
+            session_state.save()
+            return {"success": True, **result}
+        finally:
+            sessions.release(session_state)
+
+    job = ingest_jobs.submit(filename, work)
+    return jsonify({"job_id": job.id, "filename": filename}), 202
+
+@app.route('/api/upload/<job_id>/events')
+def upload_events(job_id):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    def generate():
+        for event in job.iter_events():
+            if event is None:
+                yield ": keepalive\n\n"
             else:
-                return jsonify({"error": "Could not extract text"}), 400
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
+                yield f"data: {json.dumps(event)}\n\n"
+
+    return Response(generate(), mimetype='text/event-stream')
 
 @app.route('/api/clear_doc', methods=['POST'])
 def clear_doc():
-    state.vector_store = VectorStore()
-    state.doc_loaded = False
-    state.filename = None
+    g.state.vector_store.clear()
+    g.state.doc_loaded = False
+    g.state.filename = None
+    g.state.full_text = None
+    g.state.save()
     return jsonify({"success": True})
 
 @app.route('/api/run_council', methods=['POST'])
 def run_council():
-    data = request.json
-    selected_models = data.get('models', [])
-    judge_model = data.get('judge')
-    prompt = data.get('prompt')
-    persona_mode = data.get('persona', "Padrão (Neutro)")
-    
-    if not selected_models or not prompt:
+    try:
+        run = parse_run(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if run is None:
         return jsonify({"error": "Missing parameters"}), 400
 
     # 1. Retrieve Context
-    context_chunks = []
-    if state.doc_loaded:
-        # Try vector search first
-        context_chunks = state.vector_store.query(prompt, n_results=4)
+    timings = metrics.RunTimings()
+    context_chunks = retrieve_context(g.state, run["prompt"], timings)
         
-        # Fallback: If no chunks found (e.g. no embedding model) but we have text, use full text
-        if not context_chunks and state.full_text:
-            print("Using full text fallback for context.")
-            # Limit text length to avoid context window overflow (e.g. 50k chars is usually safe for modern models)
-            # This is a simple safety cap.
-            safe_text = state.full_text[:50000]
-            if len(state.full_text) > 50000:
-                safe_text += "\n...(truncated)..."
-            context_chunks = [safe_text]
-        
-    # 2. Run Council & 3. Synthesize via Streaming
-    import queue
-    import threading
-    import json
-    from flask import Response
-
+    # 2. Run Council & 3. Synthesize via Streaming (see asgi.py for the async-native path)
     def generate():
-        q = queue.Queue()
-        
-        def worker():
-            async def async_process():
-                results = []
-                try:
-                    # Stream Model Execution
-                    async for event in ModelCouncil.run_council(selected_models, prompt, context_chunks, persona_mode):
-                        q.put(json.dumps(event))
-                        if event['type'] == 'model_done':
-                            results.append(event['result'])
-                    
-                    # Stream Synthesis
-                    q.put(json.dumps({"type": "synthesis_start"}))
-                    
-                    # Filter out failed results for synthesis
-                    valid_results = [r for r in results if r['status'] == 'Success']
-                    
-                    synthesis = await ModelCouncil.synthesize_answers(judge_model, prompt, valid_results, persona_mode)
-                    q.put(json.dumps({"type": "synthesis_done", "result": synthesis}))
-                    
-                    # Save History
-                    # We save the history here, but we don't return it in the stream necessarily, 
-                    # or we can send a "complete" event.
-                    # The UI reloads history separately anyway.
-                    HistoryManager.save_entry(prompt, persona_mode, synthesis, [r['model'] for r in valid_results])
-                    
-                    # Send context separately if needed by UI
-                    q.put(json.dumps({"type": "context", "data": context_chunks}))
-
-                except Exception as e:
-                    q.put(json.dumps({"type": "error", "error": str(e)}))
-                finally:
-                    q.put(None) # Sentinel
-
-            asyncio.run(async_process())
-
-        # Start the background worker
-        threading.Thread(target=worker).start()
-
-        # Yield from queue
-        while True:
-            item = q.get()
-            if item is None:
-                break
-            yield f"data: {item}\n\n"
+        for event in runtime.stream(council_events(context_chunks=context_chunks, timings=timings, **run)):
+            yield sse(event)
 
     return Response(generate(), mimetype='text/event-stream')
 
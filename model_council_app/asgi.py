@@ -0,0 +1,126 @@
+"""
+ASGI entry point:
+
+    pip install uvicorn asgiref
+    uvicorn asgi:app --port 8501
+
+/api/run_council is served natively: the council run is a coroutine on the
+server's event loop, each event is written straight to the client (a slow
+reader slows the run down through the socket, not a queue) and a client that
+disconnects cancels the model calls still in flight. Open streams cost no
+thread, only the blocking retrieval step borrows one from the loop's pool.
+Every other route is the Flask app, through asgiref's WSGI adapter; the
+event schema is the same on both servers.
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+import config
+import metrics
+from app import app as flask_app
+from council_runs import parse_run, retrieve_context, council_events, sse
+from sessions import sessions
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # Only /api/run_council is available without it
+    WsgiToAsgi = None
+
+wsgi = WsgiToAsgi(flask_app) if WsgiToAsgi else None
+
+def _headers(scope):
+    return {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+
+def _session_id(headers):
+    session_id = headers.get(config.SESSION_HEADER.lower())
+    if not session_id and 'cookie' in headers:
+        cookie = SimpleCookie()
+        cookie.load(headers['cookie'])
+        if config.SESSION_COOKIE in cookie:
+            session_id = cookie[config.SESSION_COOKIE].value
+    return session_id
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b"")
+        if not message.get('more_body'):
+            return body
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+async def run_council(scope, receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        return
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        data = None
+    try:
+        run = parse_run(data)
+    except ValueError as e:
+        await _send_json(send, 400, {"error": str(e)})
+        return
+    if run is None:
+        await _send_json(send, 400, {"error": "Missing parameters"})
+        return
+
+    # 1. Retrieve Context (blocking index and embedding calls, off the loop)
+    state = sessions.acquire(_session_id(_headers(scope)))
+    try:
+        timings = metrics.RunTimings()
+        context_chunks = await asyncio.to_thread(retrieve_context, state, run["prompt"], timings)
+    finally:
+        sessions.release(state)
+
+    # 2. Run Council & 3. Synthesize, written to the socket as they happen
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache")]})
+    events = council_events(context_chunks=context_chunks, timings=timings, **run)
+
+    async def stream():
+        async for event in events:
+            await send({"type": "http.response.body", "body": sse(event).encode('utf-8'), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    streaming = asyncio.create_task(stream())
+    watcher = asyncio.create_task(disconnected())
+    try:
+        await asyncio.wait([streaming, watcher], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Client gone (or server shutting down): stop the run and its model calls
+        streaming.cancel()
+        watcher.cancel()
+        await asyncio.gather(streaming, watcher, return_exceptions=True)
+        await events.aclose()
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({"type": "lifespan.startup.complete"})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/api/run_council' and scope['method'] == 'POST':
+        await run_council(scope, receive, send)
+    elif wsgi is not None:
+        await wsgi(scope, receive, send)
+    else:
+        await _send_json(send, 501, {"error": "Install asgiref to serve the other routes over ASGI"})
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import weakref
+import httpx
+import ollama
+import config
+
+_DONE = object()
+
+class AsyncRuntime:
+    """
+    One long-lived event loop per process, running in a background thread.
+    Flask handlers submit coroutines to it instead of spinning up a thread and
+    an asyncio.run() loop per request.
+    """
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # loop -> {host: AsyncClient}. Clients are bound to the loop that created them.
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    ready = threading.Event()
+
+                    def run():
+                        asyncio.set_event_loop(loop)
+                        loop.call_soon(ready.set)
+                        loop.run_forever()
+
+                    self._thread = threading.Thread(target=run, name="council-loop", daemon=True)
+                    self._thread.start()
+                    ready.wait()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro):
+        """
+        Schedules a coroutine on the shared loop. Returns a concurrent.futures.Future.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """
+        Blocking helper: runs a coroutine on the shared loop and returns its result.
+        """
+        return self.submit(coro).result(timeout)
+
+    def stream(self, agen, maxsize=config.EVENT_QUEUE_SIZE):
+        """
+        Drives an async generator on the shared loop and yields its items to the
+        calling (sync) thread through a bounded queue. The producer waits when the
+        consumer falls behind. Closing the returned generator cancels the producer.
+        """
+        events = self.run(self._new_queue(maxsize))
+
+        async def pump():
+            cancelled = False
+            try:
+                async for item in agen:
+                    await events.put(item)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                # Closed even when cancelled mid-put, so the run cancels its own work
+                await agen.aclose()
+                # A cancelled pump has no consumer left: waiting for queue room would hang
+                if not cancelled:
+                    await events.put(_DONE)
+
+        future = self.submit(pump())
+        try:
+            while True:
+                item = self.run(events.get())
+                if item is _DONE:
+                    break
+                yield item
+            # Re-raise any error from the producer
+            future.result()
+        finally:
+            future.cancel()
+
+    @staticmethod
+    async def _new_queue(maxsize):
+        return asyncio.Queue(maxsize=maxsize)
+
+    def get_client(self, host=None):
+        """
+        Returns a keep-alive ollama.AsyncClient for the given host, shared by every
+        call made on the current event loop.
+        """
+        host = host or config.OLLAMA_HOST
+        loop = asyncio.get_running_loop()
+        clients = self._clients.get(loop)
+        if clients is None:
+            clients = self._clients[loop] = {}
+        client = clients.get(host)
+        if client is None:
+            client = ollama.AsyncClient(
+                host=host,
+                limits=httpx.Limits(
+                    max_connections=config.OLLAMA_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.OLLAMA_MAX_CONNECTIONS
+                )
+            )
+            clients[host] = client
+        return client
+
+runtime = AsyncRuntime()
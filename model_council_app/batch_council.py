@@ -0,0 +1,289 @@
+"""
+Batch council runs over a prompt file (regression sets, offline evaluation):
+
+    python batch_council.py prompts.jsonl results.jsonl --models llama3 mistral --judge llama3 --concurrency 4
+
+Each input line is a JSON object with a "prompt" and, optionally, "id",
+"models", "judge", "persona" and "document" (a PDF/DOCX/TXT path whose
+passages are retrieved as context, as for an upload). Missing fields take
+the command-line defaults; a row without "id" is identified by its line
+number.
+
+Rows are grouped by model set and judge, so consecutive runs reuse the models
+already loaded, and at most --concurrency council runs are in flight (member
+calls are still admitted by the scheduler). Each result is appended to the
+output JSONL as soon as it finishes: rerunning the same command after an
+interruption skips the rows already there (and, with --retry-errors, runs the
+failed ones again). A summary with throughput and per-model latency
+percentiles is printed at the end, and written as JSON with --summary.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+import numpy as np
+import config
+import parsing
+from council import ModelCouncil
+from rag import DocumentProcessor, VectorStore
+
+DEFAULT_PERSONA = "Padrão (Neutro)"
+
+def load_rows(path, models=None, judge=None, persona=DEFAULT_PERSONA):
+    """
+    Input rows with defaults applied. Rows that can't be run (bad JSON, no
+    prompt or no models) are returned with an "error" instead.
+    """
+    rows = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                if not isinstance(data, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                rows.append({"id": f"line-{line_no}", "error": f"Invalid JSON: {e}"})
+                continue
+            row = {
+                "id": str(data.get("id", f"line-{line_no}")),
+                "prompt": data.get("prompt"),
+                "models": list(data.get("models") or models or []),
+                "persona": data.get("persona", persona),
+                "document": data.get("document")
+            }
+            row["judge"] = data.get("judge") or judge or (row["models"][0] if row["models"] else None)
+            if not row["prompt"] or not row["models"]:
+                row["error"] = "Missing prompt or models"
+            rows.append(row)
+    return rows
+
+def group_rows(rows):
+    """
+    Rows ordered by (model set, judge), first appearance first, keeping the
+    file order within a group.
+    """
+    first_seen = {}
+    for row in rows:
+        first_seen.setdefault(_group_key(row), len(first_seen))
+    return sorted(rows, key=lambda row: first_seen[_group_key(row)])
+
+def _group_key(row):
+    return tuple(sorted(row.get("models") or ())), row.get("judge")
+
+def finished_ids(path, retry_errors=False):
+    """
+    Ids already in the output file. A line cut short by an interruption is
+    dropped from the file so new results start on a line of their own.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data and not data.endswith(b"\n"):
+        with open(path, 'wb') as f:
+            f.write(data[:data.rfind(b"\n") + 1])
+    statuses = {}  # id -> status of its latest record (a retried row appears more than once)
+    for line in data.decode('utf-8', errors='replace').splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        statuses[record.get("id")] = record.get("status")
+    return {i for i, status in statuses.items() if status == "Success" or not retry_errors}
+
+class Documents:
+    """
+    In-memory index per document path, built once and shared by the rows
+    that use it.
+    """
+    def __init__(self):
+        self._stores = {}
+
+    def store(self, path):
+        if path not in self._stores:
+            self._stores[path] = asyncio.ensure_future(asyncio.to_thread(self._load, path))
+        return self._stores[path]
+
+    @staticmethod
+    def _load(path):
+        ext = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+        pieces, _ = parsing.iter_file(path, ext)
+        store = VectorStore()
+        if not store.add_chunks(DocumentProcessor.iter_chunks(pieces), source_name=os.path.basename(path)):
+            raise ValueError(f"No text extracted from {path}")
+        return store
+
+async def run_row(row, documents, use_cache=False, quorum=None, deadline=None):
+    """
+    One council run and its synthesis, as an output record.
+    """
+    record = {k: row.get(k) for k in ("id", "prompt", "models", "judge", "persona", "document")}
+    if row.get("error"):
+        return {**record, "status": "Error", "error": row["error"], "elapsed": 0.0}
+
+    start = time.perf_counter()
+    try:
+        context_chunks = []
+        if row["document"]:
+            store = await documents.store(row["document"])
+            context_chunks = await asyncio.to_thread(store.query, row["prompt"], n_results=4)
+
+        answers, excluded = [], []
+        async for event in ModelCouncil.run_council(row["models"], row["prompt"], context_chunks, row["persona"], stream=False,
+                                                     use_cache=use_cache, quorum=quorum, deadline=deadline,
+                                                     judge_model=row["judge"]):
+            if event["type"] == "model_done":
+                result = event["result"]
+                answers.append({k: result.get(k) for k in ("model", "status", "response", "elapsed", "ttft", "cached")})
+            elif event["type"] == "model_error":
+                answers.append({"model": event["model"], "status": "Error", "response": f"Error: {event['error']}"})
+            elif event["type"] == "members_excluded":
+                excluded = event["members"]
+
+        valid_results = [a for a in answers if a["status"] == "Success"]
+        synthesis_start = time.perf_counter()
+        synthesis = await ModelCouncil.synthesize_answers(row["judge"], row["prompt"], valid_results, row["persona"],
+                                                          context=ModelCouncil.format_context(context_chunks))
+        if not valid_results:
+            synthesis_status = "Empty"
+        elif synthesis.startswith("Error during synthesis"):
+            synthesis_status = "Error"
+        else:
+            synthesis_status = "Success"
+        record.update({
+            "status": "Success" if synthesis_status == "Success" else "Error",
+            "answers": answers,
+            "excluded": excluded,
+            "synthesis": synthesis,
+            "synthesis_status": synthesis_status,
+            "synthesis_elapsed": time.perf_counter() - synthesis_start
+        })
+    except Exception as e:
+        record.update({"status": "Error", "error": str(e)})
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+async def run_batch(rows, out_path, concurrency=4, retry_errors=False, on_record=None, **run_options):
+    """
+    Runs the rows not yet in out_path, `concurrency` at a time, appending each
+    record as it finishes. Returns the summary of this invocation.
+    """
+    done = finished_ids(out_path, retry_errors)
+    todo = [row for row in group_rows(rows) if row["id"] not in done]
+    queue = asyncio.Queue()
+    for row in todo:
+        queue.put_nowait(row)
+    documents = Documents()
+    records = []
+    started = time.perf_counter()
+
+    with open(out_path, 'a', encoding='utf-8') as out:
+        async def worker():
+            while not queue.empty():
+                row = queue.get_nowait()
+                record = await run_row(row, documents, **run_options)
+                # Single-threaded loop: whole lines, one writer at a time
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                records.append(record)
+                if on_record:
+                    on_record(record)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(todo))))))
+
+    return summarize(records, time.perf_counter() - started, skipped=len(rows) - len(todo))
+
+def _distribution(values):
+    if not values:
+        return {}
+    return {
+        "p50_s": float(np.percentile(values, 50)),
+        "p95_s": float(np.percentile(values, 95)),
+        "p99_s": float(np.percentile(values, 99)),
+        "max_s": float(max(values))
+    }
+
+def summarize(records, wall, skipped=0):
+    members = defaultdict(lambda: {"elapsed": [], "ttft": [], "errors": 0})
+    judges = defaultdict(list)
+    for record in records:
+        for answer in record.get("answers", []):
+            stats = members[answer["model"]]
+            if answer["status"] != "Success":
+                stats["errors"] += 1
+            elif not answer.get("cached"):
+                stats["elapsed"].append(answer["elapsed"])
+                if answer.get("ttft") is not None:
+                    stats["ttft"].append(answer["ttft"])
+        if record.get("synthesis_status") == "Success":
+            judges[record["judge"]].append(record["synthesis_elapsed"])
+
+    return {
+        "rows": len(records),
+        "skipped": skipped,
+        "errors": sum(1 for r in records if r["status"] != "Success"),
+        "wall_s": wall,
+        "rows_per_s": len(records) / wall if wall else None,
+        "row_latency": _distribution([r["elapsed"] for r in records]),
+        "models": {
+            model: {"answers": len(s["elapsed"]), "errors": s["errors"], **_distribution(s["elapsed"]),
+                    "ttft_p50_s": float(np.percentile(s["ttft"], 50)) if s["ttft"] else None}
+            for model, s in sorted(members.items())
+        },
+        "judges": {model: {"syntheses": len(v), **_distribution(v)} for model, v in sorted(judges.items())}
+    }
+
+def print_summary(summary):
+    rate = summary["rows_per_s"] or 0
+    print(f"\n{summary['rows']} rows in {summary['wall_s']:.1f}s ({rate:.2f} rows/s), "
+          f"{summary['errors']} errors, {summary['skipped']} already done")
+    print(f"{'model':<32} {'n':>5} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for role, table in (("", summary["models"]), ("judge ", summary["judges"])):
+        for model, s in table.items():
+            n = s.get("answers", s.get("syntheses"))
+            cells = [f"{s[k]:.2f}s" if k in s else "-" for k in ("p50_s", "p95_s", "p99_s", "max_s")]
+            print(f"{role + model:<32} {n:>5} {s.get('errors', 0):>4} " + " ".join(f"{c:>8}" for c in cells))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the council over a JSONL file of prompts.")
+    parser.add_argument("input", help="JSONL with one {'prompt', 'id'?, 'models'?, 'judge'?, 'persona'?, 'document'?} per line")
+    parser.add_argument("output", help="JSONL results, appended to (and resumed from) if it exists")
+    parser.add_argument("--models", nargs="+", help="Council members for rows without 'models'")
+    parser.add_argument("--judge", help="Judge for rows without 'judge' (default: the first member)")
+    parser.add_argument("--persona", default=DEFAULT_PERSONA, choices=list(config.PERSONAS))
+    parser.add_argument("--concurrency", type=int, default=4, help="Council runs in flight")
+    parser.add_argument("--quorum", type=int)
+    parser.add_argument("--deadline", type=float, default=config.DEFAULT_TIMEOUT)
+    parser.add_argument("--cache", action="store_true", help="Reuse member answers from the response cache")
+    parser.add_argument("--retry-errors", action="store_true", help="Run again the rows whose previous result failed")
+    parser.add_argument("--summary", help="Also write the summary as JSON to this path")
+    args = parser.parse_args(argv)
+
+    rows = load_rows(args.input, args.models, args.judge, args.persona)
+    ids = [row["id"] for row in rows]
+    if len(set(ids)) != len(ids):
+        parser.error("Row ids must be unique to resume a run")
+
+    def progress(record):
+        print(f"[{record['status']}] {record['id']} ({record['elapsed']:.1f}s)", flush=True)
+
+    try:
+        summary = asyncio.run(run_batch(rows, args.output, args.concurrency, args.retry_errors, on_record=progress,
+                                        use_cache=args.cache, quorum=args.quorum, deadline=args.deadline))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. Finished rows are in {args.output}; run the same command again to resume.")
+        return 130
+
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+End-to-end benchmark of the app against the stub Ollama server.
+
+Starts the stub in a child process (so it doesn't count towards this
+process's memory), serves the Flask app with werkzeug on a free port and
+drives it over HTTP at the given concurrency:
+
+    council  POST /api/run_council, SSE read to the end
+    upload   POST /api/upload, then the job's SSE until done
+    query    VectorStore.query in-process, on the uploaded documents
+
+Reports p50/p95/p99 latency, time to first SSE event, throughput, errors and
+peak RSS, and writes them as JSON so runs can be compared across commits:
+
+    python benchmarks/bench_app.py --concurrency 8 --requests 64 --out bench.json
+    python benchmarks/bench_app.py --compare bench.json   # prints the change vs. that run
+"""
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import requests
+from stub_ollama import StubOllama, parse_profiles
+
+def _serve_stub(kwargs, urls, stop):
+    stub = StubOllama(**kwargs).start()
+    urls.put(stub.url)
+    stop.wait()
+    stub.stop()
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else None
+
+def summarize(latencies, first_events, errors, wall):
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "first_event_p50_ms": percentile(first_events, 50),
+        "first_event_p95_ms": percentile(first_events, 95),
+        "throughput_rps": len(latencies) / wall if wall else None
+    }
+
+def run_load(fn, n_requests, concurrency):
+    """
+    Calls fn() n_requests times from `concurrency` threads. fn returns the time
+    to its first event (or None) and raises on failure.
+    """
+    latencies, first_events, errors = [], [], [0]
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            first = fn()
+        except Exception as e:
+            print(f"  request failed: {e}")
+            with lock:
+                errors[0] += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            if first is not None:
+                first_events.append(first)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    return summarize(latencies, first_events, errors[0], time.perf_counter() - start)
+
+def read_sse(response, start):
+    """
+    Consumes an SSE response; returns (seconds to the first data event, events).
+    """
+    first, events = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data: "):
+            if first is None:
+                first = time.perf_counter() - start
+            events.append(json.loads(line[6:]))
+    return first, events
+
+def council_request(base, models, judge):
+    def fn():
+        start = time.perf_counter()
+        with requests.post(f"{base}/api/run_council", stream=True, timeout=600, json={
+            "models": models, "judge": judge, "prompt": "Quais os riscos do projeto?", "stream": True
+        }) as r:
+            r.raise_for_status()
+            first, events = read_sse(r, start)
+        if not events or events[-1]["type"] == "error":
+            raise RuntimeError(events[-1] if events else "empty stream")
+        return first
+    return fn
+
+def upload_request(base, size_kb):
+    counter = [0]
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            counter[0] += 1
+            n = counter[0]
+        # Distinct text per upload so the embedding cache doesn't hide the work
+        text = " ".join(f"Documento {n} frase {i} sobre custos e prazos." for i in range(size_kb * 1024 // 40))
+        start = time.perf_counter()
+        r = requests.post(f"{base}/api/upload", timeout=60,
+                          files={"file": (f"doc{n}.txt", io.BytesIO(text.encode('utf-8')))})
+        r.raise_for_status()
+        with requests.get(f"{base}/api/upload/{r.json()['job_id']}/events", stream=True, timeout=600) as events:
+            first, received = read_sse(events, start)
+        if not received or received[-1].get("type") != "done":
+            raise RuntimeError(received[-1] if received else "empty stream")
+        return first
+    return fn
+
+def query_request(vector_store):
+    prompts = [f"Qual o custo do documento {i}?" for i in range(50)]
+    counter = iter(range(10 ** 9))
+
+    def fn():
+        vector_store.query(prompts[next(counter) % len(prompts)], n_results=4)
+        return None
+    return fn
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(current, baseline):
+    print(f"\nChange vs. {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "first_event_p50_ms", "throughput_rps"):
+            if result.get(key) and before.get(key):
+                print(f"  {name:8s} {key:20s} {before[key]:10.1f} -> {result[key]:10.1f} ({(result[key] / before[key] - 1) * 100:+.1f}%)")
+    if baseline.get("peak_rss_mb"):
+        print(f"  peak RSS {baseline['peak_rss_mb']:.1f} MB -> {current['peak_rss_mb']:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', default=["upload", "query", "council"], choices=["upload", "query", "council"])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=32, help="requests per scenario")
+    parser.add_argument('--members', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05, help="stub seconds before the first token")
+    parser.add_argument('--tokens', type=int, default=50)
+    parser.add_argument('--tokens-per-s', type=float, default=200)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--profile', action='append', default=[], metavar="MODEL=LATENCY:TOKENS_PER_S:FAILURE_RATE")
+    parser.add_argument('--upload-kb', type=int, default=64)
+    parser.add_argument('--out', help="write results as JSON")
+    parser.add_argument('--compare', help="previous JSON results to compare against")
+    args = parser.parse_args()
+
+    members = [f"stub-m{i}:latest" for i in range(args.members)]
+    judge = "stub-judge:latest"
+    stub_kwargs = dict(models=members + [judge], latency=args.latency, tokens=args.tokens,
+                       tokens_per_s=args.tokens_per_s, failure_rate=args.failure_rate,
+                       profiles=parse_profiles(args.profile))
+    urls, stop = multiprocessing.Queue(), multiprocessing.Event()
+    stub_process = multiprocessing.Process(target=_serve_stub, args=(stub_kwargs, urls, stop), daemon=True)
+    stub_process.start()
+    os.environ['OLLAMA_HOST'] = urls.get(timeout=30)
+
+    # The app writes its index, caches and history under the working directory
+    os.chdir(tempfile.mkdtemp(prefix="council-bench-"))
+    from werkzeug.serving import make_server
+    import app as council_app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, council_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "scenarios": {}
+    }
+    builders = {
+        "upload": lambda: upload_request(base, args.upload_kb),
+        "query": lambda: query_request(council_app.state.vector_store),
+        "council": lambda: council_request(base, members, judge)
+    }
+    for name in args.scenarios:
+        if name == "query" and not len(council_app.state.vector_store.index):
+            upload_request(base, args.upload_kb)()
+        result = run_load(builders[name](), args.requests, args.concurrency)
+        results["scenarios"][name] = result
+        fmt = lambda v: f"{v:8.1f}" if v is not None else "       -"
+        print(f"{name:8s} p50 {fmt(result['p50_ms'])} ms  p95 {fmt(result['p95_ms'])} ms  p99 {fmt(result['p99_ms'])} ms  "
+              f"first event p50 {fmt(result['first_event_p50_ms'])} ms  {fmt(result['throughput_rps'])} req/s  "
+              f"{result['errors']} errors")
+
+    # ru_maxrss is in KB on Linux
+    results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS {results['peak_rss_mb']:.1f} MB")
+
+    server.shutdown()
+    stop.set()
+    stub_process.join(timeout=10)
+
+    if args.out:
+        with open(os.path.join(APP_DIR, args.out) if not os.path.isabs(args.out) else args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare if os.path.isabs(args.compare) else os.path.join(APP_DIR, args.compare)) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+PDF parsing throughput: in-process PyPDF2 versus the parsing process pool at
+several worker counts, on a generated multi-hundred-page PDF.
+
+    python benchmarks/bench_parse.py --pages 400 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import parsing
+from rag import DocumentProcessor
+
+def make_pdf(path, pages, lines_per_page=45):
+    """
+    Writes a minimal text-only PDF (Helvetica, one content stream per page).
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = [f"Pagina {p} linha {i}: o conselho analisa custos, riscos e viabilidade tecnica do projeto." for i in range(lines_per_page)]
+        body = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = body.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids) + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.pdf")
+    make_pdf(path, args.pages)
+    print(f"{args.pages} pages, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        baseline_text = DocumentProcessor.load_pdf(f)
+    baseline = time.perf_counter() - start
+    print(f"{'in-process':>12} {baseline:8.2f}s  {args.pages / baseline:8.1f} pages/s")
+
+    for workers in args.workers:
+        config.PARSE_WORKERS = workers
+        parsing._reset_pool()
+        parsing.run(parsing.pdf_page_count, path)  # start the workers outside the timing
+        start = time.perf_counter()
+        pieces, _ = parsing.iter_file(path, 'pdf')
+        text = "".join(pieces)
+        elapsed = time.perf_counter() - start
+        assert text == baseline_text
+        print(f"{f'{workers} workers':>12} {elapsed:8.2f}s  {args.pages / elapsed:8.1f} pages/s  speed-up x{baseline / elapsed:.2f}")
+    parsing._reset_pool()
+
+if __name__ == '__main__':
+    main()
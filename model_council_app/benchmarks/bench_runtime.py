@@ -0,0 +1,84 @@
+"""
+Per-request overhead of the council runner: the old thread + asyncio.run() +
+new AsyncClient per call, versus the shared loop and pooled keep-alive client.
+
+Runs against the stub server, so the numbers are pure orchestration overhead.
+
+    python benchmarks/bench_runtime.py --requests 200 --models 4 --users 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ollama
+from stub_ollama import StubOllama
+
+def one_request_legacy(host, models):
+    """
+    Mirrors the original handler: a fresh thread, a fresh loop and a fresh client per call.
+    """
+    async def process():
+        async def call(model):
+            client = ollama.AsyncClient(host=host)
+            await client.chat(model=model, messages=[{'role': 'user', 'content': 'hi'}], stream=False)
+        await asyncio.gather(*(call(m) for m in models))
+
+    t = threading.Thread(target=lambda: asyncio.run(process()))
+    t.start()
+    t.join()
+
+def one_request_shared(host, models):
+    from async_runtime import runtime
+
+    async def process():
+        async def call(model):
+            client = runtime.get_client(host)
+            await client.chat(model=model, messages=[{'role': 'user', 'content': 'hi'}], stream=False)
+        await asyncio.gather(*(call(m) for m in models))
+
+    runtime.run(process())
+
+def measure(fn, host, models, n_requests, users):
+    latencies = []
+
+    def timed():
+        start = time.perf_counter()
+        fn(host, models)
+        latencies.append(time.perf_counter() - start)
+
+    fn(host, models)  # warm-up
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        for _ in range(n_requests):
+            pool.submit(timed)
+    wall = time.perf_counter() - start
+    return {
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000,
+        "req_per_s": n_requests / wall
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--models', type=int, default=4)
+    parser.add_argument('--users', type=int, default=8)
+    args = parser.parse_args()
+
+    with StubOllama(tokens=5) as stub:
+        models = stub.models * (args.models // len(stub.models) + 1)
+        models = models[:args.models]
+        for name, fn in (("legacy (thread + asyncio.run + new client)", one_request_legacy),
+                         ("shared loop + pooled client", one_request_shared)):
+            r = measure(fn, stub.url, models, args.requests, args.users)
+            print(f"{name:45s} mean {r['mean_ms']:7.2f} ms  p95 {r['p95_ms']:7.2f} ms  {r['req_per_s']:7.1f} req/s")
+
+if __name__ == '__main__':
+    main()
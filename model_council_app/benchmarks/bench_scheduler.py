@@ -0,0 +1,73 @@
+"""
+Model swapping on a memory-limited host: every member fired at once versus
+the Ollama-aware scheduler, over consecutive council runs.
+
+The stub keeps at most --fit models loaded, evicts idle ones LRU-first and
+spends --load-time seconds per load, like Ollama on a small box.
+
+    python benchmarks/bench_scheduler.py --members 4 --fit 3 --runs 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_ollama import StubOllama
+
+MODEL_SIZE = 4 * 1024 ** 3
+
+def run_councils(members, judge, runs):
+    from async_runtime import runtime
+    from council import ModelCouncil
+
+    async def one_run():
+        prompt = "Qual a melhor estratégia?"
+        results = []
+        async for event in ModelCouncil.run_council(members, prompt, stream=False, judge_model=judge):
+            if event["type"] == "model_done":
+                results.append(event["result"])
+        await ModelCouncil.synthesize_answers(judge, prompt, results)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        runtime.run(one_run())
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=4)
+    parser.add_argument('--fit', type=int, default=3, help="models that fit in memory at once")
+    parser.add_argument('--runs', type=int, default=4)
+    parser.add_argument('--load-time', type=float, default=0.3)
+    parser.add_argument('--latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    members = [f"stub-m{i}:latest" for i in range(args.members)]
+    judge = "stub-judge:latest"
+    stub = StubOllama(models=members + [judge], latency=args.latency, model_size=MODEL_SIZE,
+                      memory=args.fit * MODEL_SIZE, load_time=args.load_time).start()
+    os.environ['OLLAMA_HOST'] = stub.url
+
+    import config
+    config.SCHEDULER_MEMORY_BUDGET = args.fit * MODEL_SIZE
+    config.SCHEDULER_SIZE_OVERHEAD = 1.0
+    from scheduler import scheduler
+    scheduler.memory_budget = config.SCHEDULER_MEMORY_BUDGET
+
+    print(f"{args.members} members + judge, {args.fit} fit in memory, {args.load_time}s per load, {args.runs} runs")
+    for enabled in (False, True):
+        config.SCHEDULER_ENABLED = enabled
+        with stub._memory_cond:
+            stub._resident.clear()
+        stub.loads = 0
+        timings = run_councils(members, judge, args.runs)
+        label = "scheduler" if enabled else "all at once"
+        print(f"{label:>12}: {sum(timings):6.2f}s total, {sum(timings) / len(timings):5.2f}s/run, {stub.loads} model loads")
+    stub.stop()
+
+if __name__ == '__main__':
+    main()
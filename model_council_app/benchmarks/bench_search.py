@@ -0,0 +1,70 @@
+"""
+Recall@k and query latency of the search backends against the exact baseline.
+
+Vectors are drawn from a mixture of Gaussians (real embeddings are clustered,
+uniform random vectors are not) and queries are perturbed corpus rows.
+
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000 --dim 384
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import ExactSearch, IVFSearch
+
+def clustered_vectors(n, dim, n_clusters, rng):
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        end = min(n, start + 100000)
+        labels = rng.integers(0, n_clusters, size=end - start)
+        out[start:end] = centers[labels] + 0.6 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+def latency(backend, queries, k, **kwargs):
+    times, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        idx, _ = backend.search(q, k, **kwargs)
+        times.append(time.perf_counter() - start)
+        results.append(idx)
+    times = np.array(times) * 1000
+    return results, float(np.mean(times)), float(np.percentile(times, 95))
+
+def recall(results, truth, k):
+    return float(np.mean([len(set(r[:k]) & set(t[:k])) / k for r, t in zip(results, truth)]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'n':>9} {'backend':>14} {'recall@k':>9} {'mean ms':>9} {'p95 ms':>9}")
+    for n in args.sizes:
+        corpus = clustered_vectors(n, args.dim, max(16, n // 500), rng)
+        queries = corpus[rng.choice(n, size=args.queries)] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        exact = ExactSearch(corpus)
+        truth, mean_ms, p95_ms = latency(exact, queries, args.k)
+        print(f"{n:>9} {'exact':>14} {1.0:>9.3f} {mean_ms:>9.3f} {p95_ms:>9.3f}")
+
+        start = time.perf_counter()
+        ivf = IVFSearch(corpus)
+        print(f"{n:>9} {'ivf build':>14} {'':>9} {(time.perf_counter() - start) * 1000:>9.0f} {'':>9}  ({ivf.n_lists} lists)")
+        for nprobe in args.nprobe:
+            results, mean_ms, p95_ms = latency(ivf, queries, args.k, nprobe=nprobe)
+            print(f"{n:>9} {f'ivf nprobe={nprobe}':>14} {recall(results, truth, args.k):>9.3f} {mean_ms:>9.3f} {p95_ms:>9.3f}")
+
+if __name__ == '__main__':
+    main()
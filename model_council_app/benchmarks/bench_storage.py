@@ -0,0 +1,82 @@
+"""
+Memory per chunk and recall@k of each embedding storage precision
+(EMBED_STORAGE_DTYPE) against float32 exact search.
+
+Vectors come from bench_search's Gaussian mixture and queries are perturbed
+corpus rows; chunk text is synthetic, CHUNK_SIZE characters of mixed
+Portuguese. Text is also measured as a list of str, for comparison with the
+contiguous buffer the segments keep.
+
+    python benchmarks/bench_storage.py --size 100000 --dim 384
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from vector_index import STORAGE, VectorIndex
+from bench_search import clustered_vectors, recall
+
+WORDS = "contrato prazo pagamento cláusula rescisão multa serviço relatório ação período".split()
+
+def synthetic_chunks(n, size, rng):
+    words = rng.choice(WORDS, size=(n, size // 8))
+    return [" ".join(row)[:size] for row in words]
+
+def list_bytes(chunks):
+    # What a list of str costs: one object per chunk plus the list's pointers
+    return sum(sys.getsizeof(c) for c in chunks) + sys.getsizeof(chunks)
+
+def run_queries(index, queries, k):
+    times, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = index.search(q, k)
+        times.append(time.perf_counter() - start)
+        results.append([i for _, _, i in hits])
+    times = np.array(times) * 1000
+    return results, float(np.mean(times)), float(np.percentile(times, 95))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--chunk-size', type=int, default=config.CHUNK_SIZE)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    # Only the vectors and text are measured here
+    config.BM25_ENABLED = False
+
+    corpus = clustered_vectors(args.size, args.dim, max(16, args.size // 500), rng)
+    queries = corpus[rng.choice(args.size, size=args.queries)] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    chunks = synthetic_chunks(args.size, args.chunk_size, rng)
+
+    text_list = list_bytes(chunks) / args.size
+    print(f"{args.size} chunks, dim {args.dim}, {args.chunk_size} chars per chunk")
+    print(f"text: {text_list:.0f} B/chunk as a list of str\n")
+    print(f"{'storage':>10} {'vector B':>9} {'text B':>8} {'total B':>8} {f'recall@{args.k}':>10} {'mean ms':>8} {'p95 ms':>8}")
+    print(f"{'float64':>10} {args.dim * 8:>9} {'':>8} {'':>8} {'':>10} {'':>8} {'':>8}  (np.array of Python floats)")
+
+    truth = None
+    for dtype in STORAGE:
+        index = VectorIndex(dtype=dtype, backend="exact")
+        index.add("bench", chunks, corpus, "bench")
+        segment = index.segments[0]
+        vector_bytes = (segment.vectors.nbytes + (segment.scales.nbytes if segment.scales is not None else 0)) / args.size
+        text_bytes = (len(segment._text) + segment._offsets.nbytes) / args.size
+        results, mean_ms, p95_ms = run_queries(index, queries, args.k)
+        if truth is None:
+            truth = results  # float32 comes first: it is the reference
+        print(f"{dtype:>10} {vector_bytes:>9.0f} {text_bytes:>8.0f} {vector_bytes + text_bytes:>8.0f} "
+              f"{recall(results, truth, args.k):>10.3f} {mean_ms:>8.2f} {p95_ms:>8.2f}")
+
+if __name__ == '__main__':
+    main()
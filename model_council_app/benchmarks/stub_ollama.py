@@ -0,0 +1,284 @@
+"""
+Minimal fake Ollama HTTP server for offline benchmarks and tests.
+
+Implements the endpoints the app uses (/api/tags, /api/ps, /api/show,
+/api/chat, /api/generate, /api/embed, /api/embeddings, /api/version) with
+deterministic answers and embeddings, so the council can be exercised without
+real models. Latency, decode speed (tokens/s) and failure rate can be set
+globally or per model through `profiles`. With `memory` set, models are loaded and evicted like Ollama does
+(LRU among idle models, `load_time` seconds per load), which makes swap
+thrashing measurable.
+
+Usage:
+    python benchmarks/stub_ollama.py --port 11500
+    OLLAMA_HOST=http://127.0.0.1:11500 python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+DEFAULT_MODELS = ["stub-llama:latest", "stub-mistral:latest", "stub-judge:latest"]
+DEFAULT_EMBED_MODEL = "all-minilm:latest"
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512  # Benchmarks open many connections at once
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+def fake_embedding(text, dim):
+    """
+    Deterministic unit vector derived from the text, so repeated inputs match.
+    """
+    rng = np.random.default_rng(zlib.crc32(text.encode('utf-8')))
+    vec = rng.standard_normal(dim).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+class StubOllama:
+    def __init__(self, models=None, embed_model=DEFAULT_EMBED_MODEL, host="127.0.0.1", port=0,
+                 latency=0.0, tokens=20, embedding_dim=384, model_size=1, memory=None, load_time=0.0,
+                 tokens_per_s=None, failure_rate=0.0, profiles=None, seed=0):
+        self.models = list(models or DEFAULT_MODELS)
+        self.embed_model = embed_model
+        self.latency = latency  # seconds before the first byte of every model call
+        self.tokens = tokens  # tokens per generated answer
+        self.tokens_per_s = tokens_per_s  # decode speed; None = tokens are sent at once
+        self.failure_rate = failure_rate  # share of model calls answered with HTTP 500
+        self.profiles = dict(profiles or {})  # model -> overrides of latency / tokens_per_s / failure_rate
+        self._random = random.Random(seed)
+        self.embedding_dim = embedding_dim
+        self.model_size = model_size  # bytes reported (and used) per model
+        self.memory = memory  # None: every model fits at once
+        self.load_time = load_time  # seconds to load a model that is not resident
+        self.requests = 0
+        self.loads = 0
+        self._resident = OrderedDict()  # model -> active requests, least recently used first
+        self._memory_cond = threading.Condition()
+        self._server = _Server((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def profile(self, model):
+        p = {"latency": self.latency, "tokens_per_s": self.tokens_per_s, "failure_rate": self.failure_rate}
+        p.update(self.profiles.get(model, {}))
+        return p
+
+    def acquire_model(self, model):
+        """
+        Makes the model resident for one request and returns its load time in seconds.
+        Loads are serialized; idle models are evicted LRU-first when memory is short,
+        and a request waits while every resident model is busy.
+        """
+        with self._memory_cond:
+            while model not in self._resident:
+                if self.memory is None or (len(self._resident) + 1) * self.model_size <= self.memory:
+                    time.sleep(self.load_time)
+                    self._resident[model] = 0
+                    self.loads += 1
+                    self._resident[model] += 1
+                    return self.load_time
+                idle = [m for m, busy in self._resident.items() if not busy]
+                if idle:
+                    del self._resident[idle[0]]
+                else:
+                    self._memory_cond.wait()
+            self._resident.move_to_end(model)
+            self._resident[model] += 1
+            return 0.0
+
+    def release_model(self, model):
+        with self._memory_cond:
+            if model in self._resident:
+                self._resident[model] -= 1
+            self._memory_cond.notify_all()
+
+    def answer_tokens(self, model, prompt):
+        return [f"{model.split(':')[0]}-tok{i} " for i in range(self.tokens)]
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, parts):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for part in parts:
+                    line = (json.dumps(part) + "\n").encode('utf-8')
+                    self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                stub.requests += 1
+                if self.path == '/api/tags':
+                    names = stub.models + [stub.embed_model]
+                    self._send_json({"models": [
+                        {"name": n, "model": n, "modified_at": _now(), "size": stub.model_size, "digest": "stub",
+                         "details": {"family": "bert" if n == stub.embed_model else "llama"}}
+                        for n in names
+                    ]})
+                elif self.path == '/api/ps':
+                    with stub._memory_cond:
+                        resident = list(stub._resident)
+                    self._send_json({"models": [
+                        {"name": n, "model": n, "size": stub.model_size, "size_vram": 0, "digest": "stub",
+                         "expires_at": _now(), "details": {"family": "llama"}}
+                        for n in resident
+                    ]})
+                elif self.path == '/api/version':
+                    self._send_json({"version": "0.0.0-stub"})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                stub.requests += 1
+                body = self._read_json()
+                model = body.get('model', '')
+                if self.path in ('/api/chat', '/api/generate'):
+                    self._generate(body, chat=self.path == '/api/chat')
+                elif self.path == '/api/embed':
+                    inputs = body.get('input') or []
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    self._send_json({"model": model, "embeddings": [fake_embedding(t, stub.embedding_dim) for t in inputs]})
+                elif self.path == '/api/embeddings':
+                    self._send_json({"embedding": fake_embedding(body.get('prompt', ''), stub.embedding_dim)})
+                elif self.path == '/api/show':
+                    is_embed = model == stub.embed_model
+                    self._send_json({
+                        "details": {"family": "bert" if is_embed else "llama"},
+                        "model_info": {"general.architecture": "stub", "stub.context_length": 8192},
+                        "capabilities": ["embedding"] if is_embed else ["completion"]
+                    })
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _generate(self, body, chat):
+                model = body.get('model', '')
+                if model not in stub.models:
+                    self._send_json({"error": f"model '{model}' not found"}, 404)
+                    return
+                prompt = body['messages'][-1]['content'] if chat else body.get('prompt', '')
+                tokens = stub.answer_tokens(model, prompt)
+                profile = stub.profile(model)
+                load_duration = stub.acquire_model(model)
+                try:
+                    if profile["latency"]:
+                        time.sleep(profile["latency"])
+                    if stub._random.random() < profile["failure_rate"]:
+                        self._send_json({"error": "stub failure"}, 500)
+                        return
+                    self._answer(body, chat, model, prompt, tokens, load_duration, profile["tokens_per_s"])
+                finally:
+                    stub.release_model(model)
+
+            def _answer(self, body, chat, model, prompt, tokens, load_duration, tokens_per_s):
+                decode_time = len(tokens) / tokens_per_s if tokens_per_s else 0.0
+
+                def part(text, done):
+                    p = {"model": model, "created_at": _now(), "done": done}
+                    if chat:
+                        p["message"] = {"role": "assistant", "content": text}
+                    else:
+                        p["response"] = text
+                    if done:
+                        p.update({"done_reason": "stop", "eval_count": len(tokens), "prompt_eval_count": len(prompt) // 4,
+                                  "load_duration": int(load_duration * 1e9)})
+                        if tokens_per_s:
+                            p["eval_duration"] = int(decode_time * 1e9)
+                    return p
+
+                def paced():
+                    for t in tokens:
+                        if tokens_per_s:
+                            time.sleep(1 / tokens_per_s)
+                        yield part(t, False)
+                    yield part("", True)
+
+                if body.get('stream', True):
+                    self._send_stream(paced())
+                else:
+                    time.sleep(decode_time)
+                    self._send_json(part("".join(tokens), True))
+
+        return Handler
+
+def parse_profiles(specs):
+    """
+    ["model=latency:tokens_per_s:failure_rate", ...] -> profiles dict (empty fields keep the defaults).
+    """
+    profiles = {}
+    for spec in specs:
+        model, _, values = spec.rpartition("=")
+        profile = {}
+        for key, value in zip(("latency", "tokens_per_s", "failure_rate"), values.split(":")):
+            if value:
+                profile[key] = float(value)
+        profiles[model] = profile
+    return profiles
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Ollama server")
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--tokens', type=int, default=20)
+    parser.add_argument('--tokens-per-s', type=float, default=None)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--profile', action='append', default=[], metavar="MODEL=LATENCY:TOKENS_PER_S:FAILURE_RATE",
+                        help="per-model override, e.g. stub-llama:latest=0.5:20:0.1")
+    args = parser.parse_args()
+    server = StubOllama(port=args.port, latency=args.latency, tokens=args.tokens, tokens_per_s=args.tokens_per_s,
+                        failure_rate=args.failure_rate, profiles=parse_profiles(args.profile))
+    print(f"Stub Ollama listening on {server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
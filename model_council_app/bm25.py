@@ -0,0 +1,149 @@
+"""
+BM25 lexical index, one per document segment.
+
+Built while a document is ingested, so retrieval works without an embedding
+model and can be fused with the vector ranking (see retrieval.fuse). Postings
+are flat arrays (chunk ids and term frequencies back to back, with one offset
+per term) rather than Python lists, and are saved next to the segment as
+<id>.bm25.npz. Tokens are lowercased and accent-folded ("ação" matches
+"acao"), and Portuguese/English stopwords are dropped.
+"""
+import math
+import os
+import re
+import unicodedata
+from array import array
+from collections import Counter
+import numpy as np
+import config
+from search import top_k
+
+TOKEN = re.compile(r"\w+")
+MAX_TF = 65535  # term frequencies are stored as uint16
+
+# Accent-folded, like the tokens they are compared with
+STOPWORDS = frozenset("""
+a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela delas dele deles depois do dos e ela elas
+ele eles em entre era eram essa essas esse esses esta estao estas este estes eu foi foram ha isso isto ja lhe lhes mais
+mas me mesmo meu meus minha minhas muito na nao nas nem no nos nossa nossas nosso nossos num numa o os ou para pela
+pelas pelo pelos por qual quando que quem se sem ser seu seus so sua suas tambem te tem tu tua tuas um uma umas uns
+voce voces vos
+an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+def fold(text):
+    """
+    Lowercase without accents: 'Atenção' -> 'atencao'.
+    """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text):
+    return [t for t in TOKEN.findall(fold(text)) if len(t) > 1 and t not in STOPWORDS]
+
+class LexicalBuilder:
+    """
+    Accumulates postings chunk by chunk; freeze() packs them into a LexicalIndex.
+    """
+    def __init__(self):
+        self._postings = {}  # term -> (array of chunk ids, array of term frequencies)
+        self._lengths = array('i')
+
+    def add(self, chunks):
+        for chunk in chunks:
+            chunk_id = len(self._lengths)
+            tokens = tokenize(chunk)
+            self._lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                ids, tfs = self._postings.setdefault(term, (array('i'), array('H')))
+                ids.append(chunk_id)
+                tfs.append(min(tf, MAX_TF))
+
+    def freeze(self):
+        vocab = sorted(self._postings)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(self._postings[t][0]) for t in vocab])
+        ids = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for n, term in enumerate(vocab):
+            term_ids, term_tfs = self._postings[term]
+            ids[offsets[n]:offsets[n + 1]] = np.frombuffer(term_ids, dtype=np.int32)
+            tfs[offsets[n]:offsets[n + 1]] = np.frombuffer(term_tfs, dtype=np.uint16)
+        return LexicalIndex(vocab, offsets, ids, tfs, np.frombuffer(self._lengths, dtype=np.int32).copy())
+
+class LexicalIndex:
+    def __init__(self, vocab, offsets, ids, tfs, lengths):
+        self.terms = {term: n for n, term in enumerate(vocab)}
+        self.vocab = vocab
+        self.offsets = offsets
+        self.ids = ids
+        self.tfs = tfs
+        self.lengths = lengths
+
+    @classmethod
+    def build(cls, chunks):
+        builder = LexicalBuilder()
+        builder.add(chunks)
+        return builder.freeze()
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def memory_bytes(self):
+        # Arrays plus a rough figure for the term dictionary
+        arrays = self.offsets.nbytes + self.ids.nbytes + self.tfs.nbytes + self.lengths.nbytes
+        return arrays + sum(len(t) + 100 for t in self.vocab)
+
+    def postings(self, term):
+        """
+        (chunk ids, term frequencies) of a term, or None if it doesn't occur.
+        """
+        n = self.terms.get(term)
+        if n is None:
+            return None
+        start, end = self.offsets[n], self.offsets[n + 1]
+        return self.ids[start:end], self.tfs[start:end]
+
+    def save(self, path):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, vocab=np.array(self.vocab, dtype=str), offsets=self.offsets, ids=self.ids,
+                 tfs=self.tfs, lengths=self.lengths)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["vocab"].tolist(), data["offsets"], data["ids"], data["tfs"], data["lengths"])
+
+def search(indexes, query, n_results, k1=config.BM25_K1, b=config.BM25_B):
+    """
+    BM25 over several segments as one corpus. indexes: (segment, LexicalIndex)
+    pairs. Returns (score, segment, chunk index) tuples, best first; chunks
+    sharing no term with the query are left out.
+    """
+    terms = Counter(tokenize(query))
+    indexes = [(segment, ix) for segment, ix in indexes if len(ix)]
+    if not terms or not indexes:
+        return []
+
+    n_chunks = sum(len(ix) for _, ix in indexes)
+    avg_length = max(1.0, sum(int(ix.lengths.sum()) for _, ix in indexes) / n_chunks)
+    scores = [np.zeros(len(ix), dtype=np.float32) for _, ix in indexes]
+    for term, query_tf in terms.items():
+        found = [(n, ix.postings(term)) for n, (_, ix) in enumerate(indexes)]
+        found = [(n, p) for n, p in found if p is not None]
+        df = sum(len(ids) for _, (ids, _) in found)
+        if not df:
+            continue
+        idf = math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+        for n, (ids, tfs) in found:
+            tfs = tfs.astype(np.float32)
+            norm = k1 * (1 - b + b * indexes[n][1].lengths[ids] / avg_length)
+            scores[n][ids] += query_tf * idf * tfs * (k1 + 1) / (tfs + norm)
+
+    sizes = [len(s) for s in scores]
+    starts = np.cumsum([0] + sizes)
+    flat = np.concatenate(scores)
+    best = [i for i in top_k(flat, n_results) if flat[i] > 0]
+    owners = np.searchsorted(starts, best, side='right') - 1
+    return [(float(flat[i]), indexes[o][0], int(i - starts[o])) for i, o in zip(best, owners)]
@@ -9,11 +9,90 @@ CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 EMBEDDING_MODEL = 'all-minilm' # Lightweight model for ollama
 VECTOR_DB_PATH = os.path.join(os.getcwd(), "chroma_db")
+EMBED_BATCH_SIZE = 32  # Chunks per /api/embed call
+EMBED_MAX_IN_FLIGHT = 4  # Concurrent embedding batches
+EMBED_MAX_RETRIES = 2  # Retries per batch (and per chunk once a batch is split)
+EMBED_CACHE_ENABLED = True
+EMBED_CACHE_PATH = os.path.join(os.getcwd(), "embedding_cache")
+EMBED_CACHE_MAX_ENTRIES = 200000  # Vectors kept per embedding model (LRU eviction beyond this)
+EMBED_CACHE_FLUSH_EVERY = 1024  # New vectors that trigger writing the cache index to disk
+EMBED_CACHE_FLUSH_INTERVAL = 30  # ...or seconds since the last write (it is also written at exit)
+INGEST_WORKERS = 2  # Documents ingested concurrently in the background
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Parsing processes (0 = parse in the web process)
+PARSE_PAGES_PER_TASK = 16  # PDF pages per worker task
+PARSE_TIMEOUT = 300  # seconds allowed to parse one document
+FULL_TEXT_FALLBACK_CHARS = 50000  # Document text used as context when nothing can be embedded
+EMBED_STORAGE_DTYPE = "float32"  # Vectors of new documents: "float16" halves their memory (slower to score on CPU), "int8" (per-vector scale) quarters it
+SEARCH_BACKEND = "exact"  # "exact" (brute force) or "ivf" (approximate, for large corpora)
+IVF_MIN_VECTORS = 20000  # Below this size the exact search is used even with "ivf"
+IVF_NPROBE = 8  # Clusters scanned per query; higher = better recall, slower
+RETRIEVAL_CANDIDATES = 3  # Hits fetched per requested passage before merging and MMR
+MMR_DIVERSITY = 0.5  # 0 = rank by relevance only, 1 = by novelty only
+CONTEXT_MAX_CHARS = 4000  # Context block budget, identical for every member (~1000 tokens)
+BM25_ENABLED = True  # Lexical index per document: retrieval keeps working without an embedding model
+HYBRID_RETRIEVAL = False  # Fuse vector and BM25 rankings (reciprocal rank fusion) when an embedder is available
+BM25_K1 = 1.2  # Term frequency saturation
+BM25_B = 0.75  # Chunk length normalization
+RRF_K = 60  # Rank offset in reciprocal rank fusion; higher flattens the top of each ranking
+
+# URL Ingestion Config
+URL_FETCH_WORKERS = 8  # Pages fetched and parsed concurrently; also the size of the HTTP connection pool
+URL_FETCH_TIMEOUT = 10  # seconds per request
+URL_MAX_PER_REQUEST = 50  # URLs accepted by one /api/upload_url call
+URL_CACHE_PATH = os.path.join(os.getcwd(), "url_cache")  # Fetched pages, revalidated with ETag/Last-Modified; None disables
+URL_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Disk used by cached pages; least recently used ones are removed beyond this (None = unbounded)
+
+# Session Config
+SESSIONS_ENABLED = True  # Each browser (cookie) or API client (X-Session-Id header) gets its own documents
+SESSIONS_PATH = os.path.join(os.getcwd(), "sessions")  # Per-session indexes; None keeps them in memory (unloaded = lost)
+SESSION_MEMORY_BUDGET = 1024 ** 3  # Bytes of loaded session indexes; idle sessions beyond it are unloaded LRU-first
+SESSION_COOKIE = "council_session"
+SESSION_HEADER = "X-Session-Id"
 
 # Ollama Config
-DEFAULT_TIMEOUT = 120  # seconds
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")  # None -> ollama default (http://127.0.0.1:11434)
+OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", "").split(",") if h.strip()] or [OLLAMA_HOST]  # Comma-separated host pool
+OLLAMA_EMBED_HOST = os.getenv("OLLAMA_EMBED_HOST")  # Dedicated host for document embeddings; None -> routed through the pool
+HOST_RETRIES = 1  # Other hosts tried when a call fails on one
+HOST_FAILURE_COOLDOWN = 30  # seconds a failing host is skipped before it is tried again
+OLLAMA_MAX_CONNECTIONS = 32  # Keep-alive connections per host in the shared client pool
+MODEL_REGISTRY_TTL = 30  # seconds a cached ollama.list() stays valid
+EVENT_QUEUE_SIZE = 256  # Bounded queue between the council loop and each SSE response
+DEFAULT_TIMEOUT = 120  # seconds before the council stops waiting for members (request "deadline" overrides)
 DEFAULT_TEMPERATURE = 0.7
 
+# Scheduler Config
+SCHEDULER_ENABLED = True  # Order/limit council calls by Ollama memory to avoid model swapping
+SCHEDULER_MEMORY_BUDGET = None  # Bytes for loaded models; None -> free RAM of this host (local Ollama only)
+SCHEDULER_MEMORY_FRACTION = 0.9  # Share of that memory the council may use
+SCHEDULER_SIZE_OVERHEAD = 1.2  # In-memory size vs. file size for models not loaded yet
+OLLAMA_KEEP_ALIVE = None  # e.g. "10m" to keep council models loaded between runs; None -> server default
+LOAD_THRESHOLD = 0.5  # A load_duration above this many seconds counts as a model load
+
+# Judge Prompt Budget Config
+JUDGE_CONTEXT_TOKENS = 8192  # num_ctx requested for the judge (capped by the model's context length)
+JUDGE_OUTPUT_RESERVE = 1024  # tokens of that context kept free for the verdict
+CHARS_PER_TOKEN = 4  # rough token estimate for prompt budgeting
+JUDGE_DEDUP_SIMILARITY = 0.8  # paragraphs this similar to an earlier answer's are dropped
+JUDGE_MAP_REDUCE_RATIO = 3.0  # answers over budget by this factor are summarized in groups first
+JUDGE_MAX_REDUCE_ROUNDS = 2
+JUDGE_SEES_CONTEXT = True  # Judge gets the members' context block too (same prefix, so cheap when cached)
+JUDGE_MIN_ANSWERS_TOKENS = 512  # answers always get at least this much; the judge's context block is cut (or dropped) first
+
+# Response Cache Config
+RESPONSE_CACHE_ENABLED = False  # Opt-in; a request can also send "cache": true
+RESPONSE_CACHE_MAX_ENTRIES = 1000  # Member answers kept in memory (LRU)
+RESPONSE_CACHE_TTL = 3600  # Seconds; a request can override it with "cache_ttl"
+RESPONSE_CACHE_PATH = None  # e.g. os.path.join(os.getcwd(), "response_cache.db") to keep answers across restarts
+
+# Metrics Config (Prometheus text format at /api/metrics)
+METRICS_SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+METRICS_TOKENS_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Streaming Config
+STREAM_TOKENS = True  # Stream member answers as 'model_token' events
+TOKEN_FLUSH_INTERVAL_MS = 100  # Batch token deltas per model to avoid flooding the SSE channel
+
 # Personas / Modes
 PERSONAS = {
     "Padrão (Neutro)": {
@@ -40,6 +119,7 @@ PERSONAS = {
 }
 
 # Prompt Templates
+CONTEXT_PROMPT_TEMPLATE = "Context information is below.\n---------------------\n{context}\n---------------------\nGiven the context information and not prior knowledge, answer the query."
 SYNTHESIS_PROMPT_TEMPLATE = """
 Você atua como o Presidente do Conselho de Inteligência Artificial.
 Sua missão é analisar as respostas fornecidas por outros modelos (os Conselheiros) e entregar um veredito final de alta qualidade ao usuário.
@@ -58,3 +138,15 @@ Instruções para o Veredito:
 
 Gere a resposta em Markdown profissional, utilizando formatação clara (negrito, listas, títulos).
 """
+
+JUDGE_MAP_PROMPT_TEMPLATE = """
+Você auxilia o Presidente do Conselho de Inteligência Artificial.
+Condense as respostas abaixo dos Conselheiros para a pergunta do usuário, preservando todos os pontos relevantes, as divergências entre eles e qualquer informação exclusiva de um único conselheiro.
+
+Pergunta: {user_prompt}
+
+Respostas:
+{model_responses}
+
+Responda em tópicos objetivos, com no máximo {max_words} palavras, indicando qual conselheiro sustenta cada ponto quando houver divergência.
+"""
@@ -1,66 +1,144 @@
 import asyncio
-import ollama
+import contextlib
+import time
 import config
+import judge_budget
+import metrics
+from host_pool import host_pool
+from response_cache import response_cache
+from scheduler import scheduler
+
+class _Admission:
+    """
+    A member's scheduler slot, recording when the member actually starts: its
+    deadline runs from then, not from when it was queued behind other models.
+    A member still queued is bound by the run's own deadline.
+    """
+    def __init__(self, slot):
+        self.slot = slot
+        self.waiting = False
+        self.queued = self.started = time.monotonic()
+
+    async def __aenter__(self):
+        self.waiting = True
+        try:
+            await self.slot.__aenter__()
+        finally:
+            self.waiting = False
+            self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self.slot.__aexit__(*exc)
+
+    async def skip(self):
+        await self.slot.skip()
+
+    def expires_at(self, deadline):
+        return (self.queued if self.waiting else self.started) + deadline
+
+    def expired(self, deadline, now):
+        return now >= self.expires_at(deadline)
 
 class ModelCouncil:
     @staticmethod
     def get_available_models():
-        try:
-            models_info = ollama.list()
-            # Handle response whether it's a dict or object
-            # New versions return an object with a 'models' attribute containing Model objects
-            
-            models_list = []
-            if hasattr(models_info, 'models'):
-                models_list = models_info.models
-            elif isinstance(models_info, dict) and 'models' in models_info:
-                models_list = models_info['models']
-            else:
-                # Fallback if it returns list directly
-                models_list = models_info
-
-            # Extract names
-            names = []
-            for m in models_list:
-                if hasattr(m, 'model'):
-                    names.append(m.model)
-                elif isinstance(m, dict):
-                    names.append(m.get('model') or m.get('name'))
-            return names
-        except Exception as e:
-            print(f"Error fetching models: {e}")
-            return []
+        # Served from the per-host registry caches, not a fresh ollama.list() per call
+        return host_pool.model_names()
 
     @staticmethod
-    async def query_model(model_name, prompt, context=None, temperature=config.DEFAULT_TEMPERATURE, system_prompt=None):
+    def build_messages(prompt, context=None, system_prompt=None):
         """
-        Queries a single model asynchronously.
+        Chat messages with the retrieved context first, in a system message that is
+        byte-identical for every member and the judge, so Ollama can reuse the
+        prompt-prefix KV cache across calls; persona instructions come after it.
         """
-        full_prompt = prompt
-        
-        messages = []
+        system = config.CONTEXT_PROMPT_TEMPLATE.format(context=context) if context else ""
         if system_prompt:
-            messages.append({'role': 'system', 'content': system_prompt})
-            
-        if context:
-            # We can put context in a system message or user message. 
-            # Usually putting it in user or system depends on model, but appending to prompt is safest for generic use.
-            full_prompt = f"Context information is below.\n---------------------\n{context}\n---------------------\nGiven the context information and not prior knowledge, answer the query.\nQuery: {prompt}"
-        
-        messages.append({'role': 'user', 'content': full_prompt})
+            system = f"{system}\n\n{system_prompt}" if system else system_prompt
+        messages = [{'role': 'system', 'content': system}] if system else []
+        messages.append({'role': 'user', 'content': prompt})
+        return messages
 
-        try:
-            client = ollama.AsyncClient()
-            response = await client.chat(
-                model=model_name, 
+    @staticmethod
+    async def query_model(model_name, prompt, context=None, temperature=config.DEFAULT_TEMPERATURE, system_prompt=None, on_token=None, use_cache=False, cache_ttl=None, slot=None):
+        """
+        Queries a single model asynchronously.
+        If on_token is given, the answer is streamed and each text delta is passed to it.
+        If slot is given (see scheduler.Schedule.slot), the call waits for it first
+        (a cache hit skips it instead).
+        With use_cache, a previous successful answer to the same
+        (model, system prompt, context, prompt, temperature) is returned instead.
+        """
+        cache_key = None
+        if use_cache:
+            cache_key = response_cache.key(model_name, system_prompt, context, prompt, temperature)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                if slot is not None:
+                    # Never admitted: release its place in the plan order
+                    await slot.skip()
+                cached.update({"cached": True, "ttft": None, "elapsed": 0.0})
+                return cached
+
+        messages = ModelCouncil.build_messages(prompt, context, system_prompt)
+
+        queued = time.perf_counter()
+        start = None
+        ttft = None
+        parts = []
+
+        async def attempt(client, host):
+            nonlocal ttft
+            if on_token is None:
+                response = await client.chat(
+                    model=model_name, 
+                    messages=messages,
+                    options={'temperature': temperature},
+                    keep_alive=config.OLLAMA_KEEP_ALIVE,
+                    stream=False
+                )
+                return response['message']['content'], response, host
+            final = {}
+            stream = await client.chat(
+                model=model_name,
                 messages=messages,
                 options={'temperature': temperature},
-                stream=False # Keep False for basic implementation first, True for advanced streaming
+                keep_alive=config.OLLAMA_KEEP_ALIVE,
+                stream=True
             )
+            async for part in stream:
+                if part.get('done'):
+                    final = part
+                delta = part['message']['content']
+                if not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(delta)
+                on_token(delta)
+            return "".join(parts), final, host
+
+        try:
+            # The scheduler slot (if any) holds the call until its model fits in memory
+            async with slot or contextlib.nullcontext():
+                start = time.perf_counter()
+                # Another host is only tried if nothing was streamed to the user yet
+                content, final, host = await host_pool.call(model_name, attempt, can_retry=lambda: not parts)
+            metrics.observe_ollama(model_name, "member", final)
+
+            if cache_key is not None:
+                response_cache.put(cache_key, {"model": model_name, "response": content, "status": "Success"}, ttl=cache_ttl)
             return {
                 "model": model_name,
-                "response": response['message']['content'],
-                "status": "Success"
+                "response": content,
+                "status": "Success",
+                "host": host.label,
+                "ttft": ttft,
+                "elapsed": time.perf_counter() - start,
+                "queued": start - queued,
+                "load_duration": (final.get('load_duration') or 0) / 1e9,
+                "cached": False
             }
         except Exception as e:
             return {
@@ -70,78 +148,328 @@ class ModelCouncil:
             }
 
     @staticmethod
-    async def run_council(selected_models, prompt, context_chunks=None, persona_mode="Padrão (Neutro)"):
+    def format_context(context_chunks):
+        return "\n\n".join(context_chunks) if context_chunks else None
+
+    @staticmethod
+    async def run_council(selected_models, prompt, context_chunks=None, persona_mode="Padrão (Neutro)", stream=config.STREAM_TOKENS,
+                          use_cache=config.RESPONSE_CACHE_ENABLED, cache_ttl=None, quorum=None, deadline=None, judge_model=None):
         """
         Runs the prompt against all selected models in parallel with Persona injection.
-        Yields progress events.
+        Yields progress events; member events carry the model and its position
+        in selected_models ('index'), as one model may be asked more than once.
+        In streaming mode, partial answers are yielded as 'model_token' events,
+        batched every TOKEN_FLUSH_INTERVAL_MS.
+        With use_cache, unchanged member answers come from the response cache
+        (flagged 'cached' in model_done), so changing only the judge re-runs just the synthesis.
+        The council ends early once `quorum` members have answered successfully,
+        and a member is cancelled once it has run for `deadline` seconds (time
+        spent queued by the scheduler doesn't count), or once the run itself has
+        lasted `deadline` while it is still queued. Cancelled members get
+        'model_timeout' events and a final 'members_excluded' event lists every
+        member left out of the synthesis and why ('error', 'quorum' or 'deadline').
+        Calls are admitted by the scheduler (resident models first, limited by
+        memory, judge kept warm); the plan is yielded as a 'schedule' event and
+        model loads as a final 'load_metrics' event.
         """
-        context_text = "\n\n".join(context_chunks) if context_chunks else None
+        context_text = ModelCouncil.format_context(context_chunks)
         
         persona_config = config.PERSONAS.get(persona_mode, config.PERSONAS["Padrão (Neutro)"])
         
         # Create tasks
         pending_tasks = []
-        model_map = {} # task -> model_name
+        model_map = {} # task -> (member index, model_name)
+        admissions = {} # task -> _Admission, for per-member deadlines
+        token_buffers = {} # member index -> list of pending deltas (a model can sit twice in one council)
+        flush_interval = config.TOKEN_FLUSH_INTERVAL_MS / 1000 if stream else None
 
-        for i, model in enumerate(selected_models):
-            # Determine system prompt for this specific model
-            sys_prompt = None
+        schedule = await scheduler.plan(selected_models, judge_model)
+        yield {"type": "schedule", **schedule.summary()}
+
+        # Closing the generator early (client gone) cancels the members still running
+        try:
+            for i, model in enumerate(selected_models):
+                # Determine system prompt for this specific model
+                sys_prompt = None
             
-            if "roles" in persona_config:
-                # Assign roles in round-robin fashion
-                role_desc = persona_config["roles"][i % len(persona_config["roles"])]
-                sys_prompt = role_desc
-            elif "system_prompt" in persona_config:
-                sys_prompt = persona_config["system_prompt"]
+                if "roles" in persona_config:
+                    # Assign roles in round-robin fashion
+                    role_desc = persona_config["roles"][i % len(persona_config["roles"])]
+                    sys_prompt = role_desc
+                elif "system_prompt" in persona_config:
+                    sys_prompt = persona_config["system_prompt"]
                 
-            task = asyncio.create_task(ModelCouncil.query_model(model, prompt, context_text, system_prompt=sys_prompt))
-            pending_tasks.append(task)
-            model_map[task] = model
+                on_token = None
+                if stream:
+                    buffer = token_buffers[i] = []
+                    on_token = buffer.append
+
+                admission = _Admission(schedule.slot(model))
+                task = asyncio.create_task(ModelCouncil.query_model(model, prompt, context_text, system_prompt=sys_prompt, on_token=on_token,
+                                                                      use_cache=use_cache, cache_ttl=cache_ttl,
+                                                                      slot=admission))
+                pending_tasks.append(task)
+                model_map[task] = (i, model)
+                admissions[task] = admission
             
-            # Yield start event
-            yield {"type": "model_start", "model": model}
-
-        # Wait for tasks as they complete
-        while pending_tasks:
-            done, pending_tasks = await asyncio.wait(pending_tasks, return_when=asyncio.FIRST_COMPLETED)
-            for task in done:
-                model_name = model_map[task]
-                try:
-                    result = await task
-                    yield {"type": "model_done", "model": model_name, "result": result}
-                except Exception as e:
-                    yield {"type": "model_error", "model": model_name, "error": str(e)}
+                # Yield start event
+                yield {"type": "model_start", "model": model, "index": i}
+
+            # Wait for tasks as they complete
+            answered = 0
+            excluded = []  # {"model", "reason"} for members left out of the synthesis
+            load_times = {}  # model -> seconds Ollama spent loading it for this run
+            while pending_tasks:
+                timeout = flush_interval
+                # Wake up for the next member deadline (the run's, for members still queued)
+                expiries = [admissions[t].expires_at(deadline) for t in pending_tasks] if deadline else []
+                if expiries:
+                    remaining = max(0, min(expiries) - time.monotonic())
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                done, pending_tasks = await asyncio.wait(pending_tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                # Flush batched deltas before any completion so model_done always comes last
+                for index, buffer in token_buffers.items():
+                    if buffer:
+                        yield {"type": "model_token", "model": selected_models[index], "index": index, "delta": "".join(buffer)}
+                        buffer.clear()
+
+                for task in done:
+                    index, model_name = model_map[task]
+                    try:
+                        result = await task
+                        if result.get("load_duration"):
+                            load_times[model_name] = result["load_duration"]
+                        if result["status"] == "Success":
+                            answered += 1
+                        else:
+                            excluded.append({"model": model_name, "reason": "error"})
+                        yield {"type": "model_done", "model": model_name, "index": index, "result": result, "ttft": result.get("ttft"),
+                               "cached": result.get("cached", False)}
+                    except Exception as e:
+                        excluded.append({"model": model_name, "reason": "error"})
+                        yield {"type": "model_error", "model": model_name, "index": index, "error": str(e)}
             
-            # Update pending tasks list (although asyncio.wait returns the new pending set)
-            pending_tasks = list(pending_tasks)
+                # Update pending tasks list (although asyncio.wait returns the new pending set)
+                pending_tasks = list(pending_tasks)
+
+                cancelled, reason = [], None
+                if quorum and answered >= quorum:
+                    cancelled, reason = pending_tasks, "quorum"
+                elif deadline:
+                    now = time.monotonic()
+                    cancelled, reason = [t for t in pending_tasks if admissions[t].expired(deadline, now)], "deadline"
+                if cancelled:
+                    for task in cancelled:
+                        task.cancel()
+                    await asyncio.gather(*cancelled, return_exceptions=True)
+                    for task in cancelled:
+                        index, model_name = model_map[task]
+                        excluded.append({"model": model_name, "reason": reason})
+                        yield {"type": "model_timeout", "model": model_name, "index": index, "reason": reason}
+                    pending_tasks = [t for t in pending_tasks if t not in cancelled]
+        finally:
+            for task in model_map:
+                task.cancel()
+
+        loads = {m: t for m, t in load_times.items() if t >= config.LOAD_THRESHOLD}
+        yield {"type": "load_metrics", "loads": len(loads), "load_time": sum(loads.values()),
+               "loads_expected": len(schedule.loads_expected), "models": load_times}
+
+        if excluded:
+            yield {"type": "members_excluded", "members": excluded, "answered": answered}
 
     @staticmethod
-    async def synthesize_answers(judge_model, prompt, model_results, council_mode="Padrão"):
+    async def synthesize_answers(judge_model, prompt, model_results, council_mode="Padrão", context=None):
         """
         Uses the judge model to synthesize the results.
         """
-        # Format the responses for the judge
-        responses_text = ""
-        for res in model_results:
-            if res['status'] == "Success":
-                responses_text += f"## Response from {res['model']}:\n{res['response']}\n\n"
-        
-        if not responses_text:
-            return "No successful responses to synthesize."
+        with metrics.stage("synthesis"):
+            prepared = await ModelCouncil.prepare_synthesis(judge_model, prompt, model_results, council_mode, context)
+            if prepared is None:
+                return "No successful responses to synthesize."
+            result = await ModelCouncil._synthesize(judge_model, prepared)
+        return result["response"]
 
-        synthesis_prompt = config.SYNTHESIS_PROMPT_TEMPLATE.format(
+    @staticmethod
+    async def synthesize_stream(judge_model, prompt, model_results, council_mode="Padrão", stream=config.STREAM_TOKENS, context=None):
+        """
+        Streams the judge's synthesis as 'synthesis_token' events (batched every
+        TOKEN_FLUSH_INTERVAL_MS), then one 'synthesis_done' event carrying the final
+        text, status, time-to-first-token, tokens/s and prefill figures.
+        A 'synthesis_budget' event first reports how the judge prompt was fitted.
+        """
+        prepared = await ModelCouncil.prepare_synthesis(judge_model, prompt, model_results, council_mode, context)
+        if prepared is None:
+            yield {"type": "synthesis_done", "result": "No successful responses to synthesize.", "status": "Empty"}
+            return
+        yield {"type": "synthesis_budget", **prepared["stats"]}
+
+        buffer = []
+        task = asyncio.create_task(ModelCouncil._synthesize(judge_model, prepared, on_token=buffer.append if stream else None))
+        try:
+            while True:
+                done, _ = await asyncio.wait([task], timeout=config.TOKEN_FLUSH_INTERVAL_MS / 1000 if stream else None)
+                if buffer:
+                    yield {"type": "synthesis_token", "delta": "".join(buffer)}
+                    buffer.clear()
+                if done:
+                    break
+        finally:
+            # Client went away mid-stream: stop generating
+            task.cancel()
+        result = task.result()
+        yield {"type": "synthesis_done", "result": result["response"], "status": result["status"],
+               "ttft": result.get("ttft"), "tokens_per_s": result.get("tokens_per_s"),
+               "load_duration": result.get("load_duration"), "prompt_tokens": result.get("prompt_tokens"),
+               "prefill_s": result.get("prefill_s"), "prefill_before_s": result.get("prefill_before_s")}
+
+    @staticmethod
+    async def prepare_synthesis(judge_model, prompt, model_results, council_mode="Padrão", context=None):
+        """
+        Builds the judge messages within the judge's token budget (see judge_budget).
+        With JUDGE_SEES_CONTEXT, the members' context block is the shared first
+        message, so a judge that was also a member reuses its cached prefix.
+        Returns {"messages", "num_ctx", "stats"}, or None if no member answered.
+        """
+        results = [r for r in model_results if r['status'] == "Success"]
+        if not results:
+            return None
+
+        capabilities = await asyncio.to_thread(host_pool.capabilities, judge_model)
+        num_ctx, budget = judge_budget.judge_context(capabilities)
+        build = lambda answers: config.SYNTHESIS_PROMPT_TEMPLATE.format(
             user_prompt=prompt,
-            model_responses=responses_text,
+            model_responses=judge_budget.format_responses(answers),
             council_mode=council_mode
         )
+        if not config.JUDGE_SEES_CONTEXT:
+            context = None
+        context_trimmed = False
+        fixed = judge_budget.estimate_tokens(build([]))
+        tokens_before = judge_budget.estimate_tokens(build(results) + ModelCouncil.build_messages("", context)[0]['content'])
+        if context:
+            # The answers come first: a context block that would leave them less than the minimum is cut, or dropped
+            overhead = judge_budget.estimate_tokens(config.CONTEXT_PROMPT_TEMPLATE.format(context=""))
+            room = budget - fixed - config.JUDGE_MIN_ANSWERS_TOKENS - overhead
+            if judge_budget.estimate_tokens(context) > room:
+                context_trimmed = True
+                context = context[:room * config.CHARS_PER_TOKEN] + "\n...(truncated)..." if room > 0 else None
+        messages = ModelCouncil.build_messages("", context)
+        context_tokens = judge_budget.estimate_tokens(messages[0]['content']) if context else 0
+        answers_budget = max(config.JUDGE_MIN_ANSWERS_TOKENS, budget - fixed - context_tokens)
 
-        try:
-            client = ollama.AsyncClient()
-            response = await client.generate(
-                model=judge_model,
-                prompt=synthesis_prompt,
-                stream=False
+        answers, strategy = judge_budget.compact(results, answers_budget)
+        rounds = 0
+        while strategy == "map_reduce":
+            if rounds == config.JUDGE_MAX_REDUCE_ROUNDS:
+                answers = judge_budget.trim(answers, answers_budget)
+                break
+            answers = await ModelCouncil._map_answers(judge_model, prompt, answers, answers_budget, num_ctx)
+            rounds += 1
+            answers, strategy = judge_budget.compact(answers, answers_budget)
+
+        synthesis_prompt = build(answers)
+        messages[-1]['content'] = synthesis_prompt
+        return {
+            "messages": messages,
+            "num_ctx": num_ctx,
+            "stats": {
+                "strategy": "map_reduce" if rounds else strategy,
+                "reduce_rounds": rounds,
+                "context_trimmed": context_trimmed,
+                "context_tokens": num_ctx,
+                "budget_tokens": budget,
+                "tokens_before": tokens_before,
+                "tokens_after": sum(judge_budget.estimate_tokens(m['content']) for m in messages)
+            }
+        }
+
+    @staticmethod
+    async def _map_answers(judge_model, prompt, answers, answers_budget, num_ctx):
+        """
+        Map step of hierarchical synthesis: the judge condenses each group of
+        answers (groups sized to the budget) into one summary, concurrently.
+        """
+        overhead = judge_budget.estimate_tokens(config.JUDGE_MAP_PROMPT_TEMPLATE.format(user_prompt=prompt, model_responses="", max_words=0))
+        batches = judge_budget.groups(answers, max(answers_budget // 2, answers_budget - overhead))
+        # Summaries together must fit the final prompt (~0.75 words per token)
+        max_words = max(50, int(answers_budget / len(batches) * 0.75))
+
+        async def summarize(batch):
+            map_prompt = config.JUDGE_MAP_PROMPT_TEMPLATE.format(
+                user_prompt=prompt, model_responses=judge_budget.format_responses(batch), max_words=max_words
             )
-            return response['response']
+
+            async def attempt(client, host):
+                response = await client.generate(model=judge_model, prompt=map_prompt, options={'num_ctx': num_ctx},
+                                                 keep_alive=config.OLLAMA_KEEP_ALIVE, stream=False)
+                metrics.observe_ollama(judge_model, "judge_map", response)
+                return response['response']
+
+            label = ", ".join(r["model"] for r in batch)
+            try:
+                summary = await host_pool.call(judge_model, attempt)
+            except Exception as e:
+                print(f"Error summarizing answers from {label}: {e}")
+                summary = judge_budget.format_responses(judge_budget.key_points(batch))
+            return {"model": f"Resumo de {label}", "response": summary, "status": "Success"}
+
+        return list(await asyncio.gather(*(summarize(batch) for batch in batches)))
+
+    @staticmethod
+    async def _synthesize(judge_model, prepared, on_token=None):
+        messages = prepared["messages"]
+        options = {'num_ctx': prepared["num_ctx"]}
+
+        start = time.perf_counter()
+        ttft = None
+        parts = []
+
+        async def attempt(client, host):
+            nonlocal ttft
+            if on_token is None:
+                final = await client.chat(
+                    model=judge_model,
+                    messages=messages,
+                    options=options,
+                    keep_alive=config.OLLAMA_KEEP_ALIVE,
+                    stream=False
+                )
+                return final['message']['content'], final
+            final = {}
+            async for part in await client.chat(model=judge_model, messages=messages, options=options,
+                                                  keep_alive=config.OLLAMA_KEEP_ALIVE, stream=True):
+                if part.get('done'):
+                    final = part
+                delta = part['message']['content']
+                if not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(delta)
+                on_token(delta)
+            return "".join(parts), final
+
+        try:
+            content, final = await host_pool.call(judge_model, attempt, can_retry=lambda: not parts)
         except Exception as e:
-            return f"Error during synthesis: {str(e)}"
+            return {"response": f"Error during synthesis: {str(e)}", "status": "Error"}
+        metrics.observe_ollama(judge_model, "judge", final)
+
+        elapsed = time.perf_counter() - start
+        # Prefer Ollama's own decode counters; fall back to counted chunks over the decode time
+        eval_count, eval_duration = final.get('eval_count'), final.get('eval_duration')
+        if eval_count and eval_duration:
+            tokens_per_s = eval_count / (eval_duration / 1e9)
+        else:
+            decode_time = elapsed - (ttft or 0)
+            tokens_per_s = (eval_count or len(parts)) / decode_time if decode_time > 0 else None
+
+        # Prefill of the uncompacted prompt, extrapolated from the measured rate
+        prefill_s = final.get('prompt_eval_duration') / 1e9 if final.get('prompt_eval_duration') else None
+        stats = prepared["stats"]
+        prefill_before_s = prefill_s * stats["tokens_before"] / stats["tokens_after"] if prefill_s else None
+        return {"response": content, "status": "Success", "ttft": ttft, "elapsed": elapsed, "tokens_per_s": tokens_per_s,
+                "load_duration": (final.get('load_duration') or 0) / 1e9,
+                "prompt_tokens": final.get('prompt_eval_count'), "prefill_s": prefill_s, "prefill_before_s": prefill_before_s}
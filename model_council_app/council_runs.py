@@ -0,0 +1,130 @@
+"""
+One council run, independent of the web server: request parsing, context
+retrieval and the stream of SSE events. Shared by the Flask app (app.py),
+which drives the events on the shared loop from a worker thread, and the ASGI
+app (asgi.py), which streams them from the server's own loop.
+"""
+import asyncio
+import json
+import math
+import time
+import config
+import metrics
+from council import ModelCouncil
+from history import HistoryManager
+
+def _number(data, key, kind, default=None):
+    """
+    data[key] converted with kind (int or float) and clamped at 0; None if
+    absent or null. Raises ValueError for anything that isn't a finite number.
+    """
+    value = data.get(key, default)
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        value = kind(value)
+        if not math.isfinite(value):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid '{key}': expected a number") from None
+    return max(value, 0)
+
+def parse_run(data):
+    """
+    council_events() arguments from a /api/run_council JSON body, or None if
+    models or prompt are missing. Raises ValueError for an invalid cache_ttl,
+    quorum or deadline.
+    """
+    data = data or {}
+    run = {
+        "selected_models": data.get('models', []),
+        "judge_model": data.get('judge'),
+        "prompt": data.get('prompt'),
+        "persona_mode": data.get('persona', "Padrão (Neutro)"),
+        "stream_tokens": data.get('stream', config.STREAM_TOKENS),
+        # Response cache: opt-in via config or "cache": true, skipped with "bypass_cache": true
+        "use_cache": bool(data.get('cache', config.RESPONSE_CACHE_ENABLED)) and not data.get('bypass_cache', False),
+        "cache_ttl": _number(data, 'cache_ttl', float),
+        # Start the synthesis once `quorum` members answered or after `deadline` seconds (null disables)
+        "quorum": _number(data, 'quorum', int),
+        "deadline": _number(data, 'deadline', float, config.DEFAULT_TIMEOUT)
+    }
+    if not run["selected_models"] or not run["prompt"]:
+        return None
+    return run
+
+def retrieve_context(state, prompt, timings=None):
+    """
+    Context passages for the prompt from the session's documents (blocking).
+    """
+    context_chunks = []
+    if state.doc_loaded:
+        # Vector search, or BM25 when there is no embedding model
+        with metrics.run(timings):
+            context_chunks = state.vector_store.query(prompt, n_results=4)
+
+        # Fallback: If no chunks found (nothing could be indexed, or the search came back empty) but we have text, use full text
+        if not context_chunks and state.full_text:
+            print("Using full text fallback for context.")
+            # Limit text length to avoid context window overflow (e.g. 50k chars is usually safe for modern models)
+            # This is a simple safety cap.
+            safe_text = state.full_text[:config.FULL_TEXT_FALLBACK_CHARS]
+            if len(state.full_text) >= config.FULL_TEXT_FALLBACK_CHARS:
+                safe_text += "\n...(truncated)..."
+            context_chunks = [safe_text]
+    return context_chunks
+
+def sse(event):
+    return f"data: {json.dumps(event)}\n\n"
+
+async def council_events(selected_models, judge_model, prompt, context_chunks, persona_mode, stream_tokens,
+                         use_cache=False, cache_ttl=None, quorum=None, deadline=None, timings=None):
+    """
+    Full council run as an async generator of SSE events.
+    Ends with a 'timings' event: seconds per stage (retrieval, members,
+    synthesis, history) and Ollama's load/prefill/generation figures per call.
+    Closing the generator early (client gone) cancels the model calls in flight.
+    """
+    # The generator runs in its own task, so the binding lasts for this run only
+    timings = metrics.bind(timings)
+    results = []
+    try:
+        # Stream Model Execution
+        with metrics.stage("members"):
+            async for event in ModelCouncil.run_council(selected_models, prompt, context_chunks, persona_mode, stream=stream_tokens,
+                                                         use_cache=use_cache, cache_ttl=cache_ttl,
+                                                         quorum=quorum, deadline=deadline, judge_model=judge_model):
+                yield event
+                if event['type'] == 'model_done':
+                    results.append(event['result'])
+
+        # Stream Synthesis
+        yield {"type": "synthesis_start"}
+
+        # Filter out failed results for synthesis
+        valid_results = [r for r in results if r['status'] == 'Success']
+
+        synthesis = None
+        with metrics.stage("synthesis"):
+            async for event in ModelCouncil.synthesize_stream(judge_model, prompt, valid_results, persona_mode, stream=stream_tokens,
+                                                               context=ModelCouncil.format_context(context_chunks)):
+                yield event
+                if event['type'] == 'synthesis_done':
+                    synthesis = event
+
+        # Save History, only for a synthesis that finished cleanly
+        # The UI reloads history separately anyway. File I/O is kept off the event loop.
+        if synthesis['status'] == 'Success':
+            with metrics.stage("history"):
+                await asyncio.to_thread(HistoryManager.save_entry, prompt, persona_mode, synthesis['result'], [r['model'] for r in valid_results])
+
+        # Send context separately if needed by UI
+        yield {"type": "context", "data": context_chunks}
+
+    except Exception as e:
+        yield {"type": "error", "error": str(e)}
+
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - timings.started, stage="total")
+    yield {"type": "timings", **timings.summary()}
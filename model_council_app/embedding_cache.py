@@ -0,0 +1,189 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+import config
+
+class _ModelCache:
+    """
+    Cache files for one embedding model:
+      vectors.f32  memory-mapped float32 matrix (capacity x dim)
+      keys.npy     16-byte content digest per slot
+      stamps.npy   last-use counter per slot (for LRU eviction)
+      meta.json    dim and capacity
+    """
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.dim = None
+        self.capacity = 0
+        self.count = 0
+        self.vectors = None
+        self.keys = np.zeros((0, 16), dtype=np.uint8)
+        self.stamps = np.zeros(0, dtype=np.int64)
+        self.slots = {}  # digest -> slot
+        self.clock = 0
+        self.dirty = False
+        self.pending = 0  # vectors put since the last flush
+        self.last_flush = time.monotonic()
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        if not os.path.exists(self._path("meta.json")):
+            return
+        try:
+            with open(self._path("meta.json"), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            keys = np.load(self._path("keys.npy"))
+            stamps = np.load(self._path("stamps.npy"))
+            self.dim = meta["dim"]
+            self.capacity = meta["capacity"]
+            self.vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode='r+', shape=(self.capacity, self.dim))
+        except Exception as e:
+            print(f"Embedding cache at {self.directory} is unreadable, starting empty: {e}")
+            self.dim = None
+            self.capacity = 0
+            return
+        self.count = len(keys)
+        self.keys = np.zeros((self.capacity, 16), dtype=np.uint8)
+        self.keys[:self.count] = keys
+        self.stamps = np.zeros(self.capacity, dtype=np.int64)
+        self.stamps[:self.count] = stamps
+        self.slots = {k.tobytes(): i for i, k in enumerate(keys)}
+        self.clock = int(stamps.max()) + 1 if len(stamps) else 0
+
+    def _grow(self, needed):
+        new_capacity = min(self.max_entries, max(needed, self.capacity * 2, 1024))
+        if new_capacity <= self.capacity:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        with open(self._path("vectors.f32"), 'ab') as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self.vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode='r+', shape=(new_capacity, self.dim))
+        self.keys = np.concatenate([self.keys, np.zeros((new_capacity - self.capacity, 16), dtype=np.uint8)])
+        self.stamps = np.concatenate([self.stamps, np.zeros(new_capacity - self.capacity, dtype=np.int64)])
+        self.capacity = new_capacity
+
+    def _allocate(self, n):
+        """
+        Returns n free slots, evicting the least recently used entries if the cache is full.
+        """
+        if self.count + n > self.capacity:
+            self._grow(self.count + n)
+        used = self.count
+        free = min(n, self.capacity - used)
+        slots = list(range(used, used + free))
+        missing = n - free
+        if missing:
+            victims = np.argpartition(self.stamps[:used], missing - 1)[:missing]
+            for slot in victims.tolist():
+                del self.slots[self.keys[slot].tobytes()]
+                slots.append(slot)
+        self.count += free
+        return slots
+
+    def get(self, digests):
+        found = {}
+        for digest in digests:
+            slot = self.slots.get(digest)
+            if slot is not None:
+                found[digest] = np.array(self.vectors[slot])
+                self.stamps[slot] = self.clock
+                self.clock += 1
+                self.dirty = True
+        return found
+
+    def put(self, items):
+        if not items:
+            return
+        if self.dim is None:
+            self.dim = len(items[0][1])
+        items = [(d, v) for d, v in items if d not in self.slots and len(v) == self.dim][:self.max_entries]
+        slots = self._allocate(len(items))
+        for slot, (digest, vector) in zip(slots, items):
+            self.vectors[slot] = vector
+            self.keys[slot] = np.frombuffer(digest, dtype=np.uint8)
+            self.stamps[slot] = self.clock
+            self.clock += 1
+            self.slots[digest] = slot
+        self.pending += len(items)
+        self.dirty = True
+
+    def should_flush(self, every, interval):
+        return self.pending >= every or time.monotonic() - self.last_flush >= interval
+
+    def flush(self):
+        if not self.dirty or self.vectors is None:
+            return
+        self.vectors.flush()
+        np.save(self._path("keys.npy"), self.keys[:self.count])
+        np.save(self._path("stamps.npy"), self.stamps[:self.count])
+        with open(self._path("meta.json"), 'w', encoding='utf-8') as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity}, f)
+        self.dirty = False
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache on disk, keyed by (embedding model, chunk hash).
+    Bounded to max_entries vectors per model with LRU eviction.
+    """
+    def __init__(self, path=config.EMBED_CACHE_PATH, max_entries=config.EMBED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._models = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha256(text.encode('utf-8')).digest()[:16]
+
+    def _model_cache(self, model):
+        cache = self._models.get(model)
+        if cache is None:
+            slug = re.sub(r'[^A-Za-z0-9_.-]', '_', model)
+            cache = self._models[model] = _ModelCache(os.path.join(self.path, slug), self.max_entries)
+        return cache
+
+    def get_many(self, model, texts):
+        """
+        Returns one vector per text, or None on a miss.
+        """
+        digests = [self.digest(t) for t in texts]
+        with self._lock:
+            found = self._model_cache(model).get(digests)
+        vectors = [found.get(d) for d in digests]
+        hits = sum(v is not None for v in vectors)
+        self.hits += hits
+        self.misses += len(texts) - hits
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        items = [(self.digest(t), np.asarray(v, dtype=np.float32)) for t, v in zip(texts, vectors) if v is not None]
+        with self._lock:
+            cache = self._model_cache(model)
+            cache.put(items)
+            # Writing the index rewrites keys/stamps in full: batched, not per put
+            if cache.should_flush(config.EMBED_CACHE_FLUSH_EVERY, config.EMBED_CACHE_FLUSH_INTERVAL):
+                cache.flush()
+
+    def flush(self):
+        with self._lock:
+            for cache in self._models.values():
+                cache.flush()
+
+embedding_cache = EmbeddingCache()
+atexit.register(embedding_cache.flush)
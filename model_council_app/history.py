@@ -1,41 +1,159 @@
 import json
 import os
+import sqlite3
+import threading
 from datetime import datetime
 
-HISTORY_FILE = "history.json"
+HISTORY_FILE = "history.json"  # Legacy store, imported once into the database
+HISTORY_DB = "history.db"
+PREVIEW_CHARS = 200
+
+_local = threading.local()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    mode TEXT,
+    synthesis TEXT,
+    models TEXT
+);
+CREATE TABLE IF NOT EXISTS entry_models (
+    entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+    model TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries(timestamp);
+CREATE INDEX IF NOT EXISTS idx_entries_mode ON entries(mode);
+CREATE INDEX IF NOT EXISTS idx_entry_models_model ON entry_models(model, entry_id);
+"""
 
 class HistoryManager:
+    """
+    Council history in SQLite (WAL mode): each save is one small atomic insert,
+    and listings are paginated summaries. Full syntheses are loaded by id.
+    """
     @staticmethod
-    def load_history():
+    def _connect():
+        # One connection per thread; sqlite3 connections must not be shared across threads
+        conn = getattr(_local, 'conn', None)
+        if conn is None or _local.path != HISTORY_DB:
+            conn = sqlite3.connect(HISTORY_DB, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            _local.conn, _local.path = conn, HISTORY_DB
+            HistoryManager._migrate_json(conn)
+        return conn
+
+    @staticmethod
+    def _migrate_json(conn):
         if not os.path.exists(HISTORY_FILE):
-            return []
+            return
+        # IMMEDIATE takes the write lock first, so only one thread imports the file
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return []
+            if not conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                try:
+                    with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+                        legacy = json.load(f)
+                except Exception as e:
+                    print(f"Error reading legacy history: {e}")
+                    legacy = []
+                # Legacy file is newest first
+                for entry in reversed(legacy):
+                    HistoryManager._insert(conn, entry.get("prompt", ""), entry.get("mode"), entry.get("synthesis"),
+                                           entry.get("models") or [], entry.get("timestamp"))
+                conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(len(legacy)),))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    @staticmethod
+    def _insert(conn, prompt, mode, synthesis, models_used, timestamp=None):
+        cur = conn.execute(
+            "INSERT INTO entries (timestamp, prompt, mode, synthesis, models) VALUES (?, ?, ?, ?, ?)",
+            (timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"), prompt, mode, synthesis,
+             json.dumps(models_used, ensure_ascii=False))
+        )
+        conn.executemany("INSERT INTO entry_models (entry_id, model) VALUES (?, ?)",
+                         [(cur.lastrowid, m) for m in models_used])
+        return cur.lastrowid
 
     @staticmethod
     def save_entry(prompt, mode, synthesis, models_used):
-        history = HistoryManager.load_history()
-        
-        entry = {
-            "id": len(history) + 1,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "prompt": prompt,
-            "mode": mode,
-            "synthesis": synthesis,
-            "models": models_used
-        }
-        
-        # Prepend to keep newest first
-        history.insert(0, entry)
-        
-        # Limit to last 50 entries
-        history = history[:50]
-        
         try:
-            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(history, f, indent=2, ensure_ascii=False)
+            conn = HistoryManager._connect()
+            with conn:
+                return HistoryManager._insert(conn, prompt, mode, synthesis, models_used)
         except Exception as e:
             print(f"Error saving history: {e}")
+            return None
+
+    @staticmethod
+    def list_entries(limit=50, offset=0, mode=None, model=None, date_from=None, date_to=None):
+        """
+        Newest-first summaries (prompt preview, no synthesis), filtered by
+        mode, model and/or timestamp range ('YYYY-MM-DD[ HH:MM:SS]').
+        """
+        clauses, params = [], []
+        if mode:
+            clauses.append("e.mode = ?")
+            params.append(mode)
+        if model:
+            clauses.append("e.id IN (SELECT entry_id FROM entry_models WHERE model = ?)")
+            params.append(model)
+        if date_from:
+            clauses.append("e.timestamp >= ?")
+            params.append(date_from)
+        if date_to:
+            # A bare date includes the whole day
+            clauses.append("e.timestamp <= ?")
+            params.append(date_to if len(date_to) > 10 else date_to + " 23:59:59")
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        try:
+            conn = HistoryManager._connect()
+            rows = conn.execute(
+                f"SELECT e.id, e.timestamp, substr(e.prompt, 1, {PREVIEW_CHARS}) AS prompt, "
+                f"length(e.prompt) > {PREVIEW_CHARS} AS truncated, e.mode, e.models "
+                f"FROM entries e {where} ORDER BY e.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+            total = conn.execute(f"SELECT count(*) FROM entries e {where}", params).fetchone()[0]
+        except Exception as e:
+            print(f"Error loading history: {e}")
+            return [], 0
+
+        entries = [{
+            "id": r["id"],
+            "timestamp": r["timestamp"],
+            "prompt": r["prompt"],
+            "truncated": bool(r["truncated"]),
+            "mode": r["mode"],
+            "models": json.loads(r["models"] or "[]")
+        } for r in rows]
+        return entries, total
+
+    @staticmethod
+    def get_entry(entry_id):
+        try:
+            row = HistoryManager._connect().execute(
+                "SELECT id, timestamp, prompt, mode, synthesis, models FROM entries WHERE id = ?", (entry_id,)
+            ).fetchone()
+        except Exception as e:
+            print(f"Error loading history entry: {e}")
+            return None
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["models"] = json.loads(entry["models"] or "[]")
+        return entry
+
+    @staticmethod
+    def load_history():
+        # Backward compatible: latest 50 summaries
+        return HistoryManager.list_entries()[0]
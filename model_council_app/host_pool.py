@@ -0,0 +1,194 @@
+"""
+Pool of Ollama hosts.
+
+Each host keeps its own model inventory (a ModelRegistry refreshed in the
+background, which doubles as the health check). A call for a model goes to
+the healthy host that has it with the fewest requests in flight, preferring
+one that already has the model loaded, and moves on to the next host when the
+call fails. Embeddings can be pinned to a dedicated host.
+"""
+import asyncio
+import threading
+import time
+import httpx
+import config
+from model_registry import ModelRegistry
+
+class NoHostAvailable(Exception):
+    pass
+
+class Host:
+    def __init__(self, url):
+        self.url = url
+        self.registry = ModelRegistry(url)
+        self.outstanding = 0
+        self.loaded = set()  # models Ollama reported in memory at the last /api/ps
+        self.down_until = 0.0
+
+    @property
+    def label(self):
+        return self.url or "default"
+
+    def available(self):
+        return self.registry.healthy is not False and time.monotonic() >= self.down_until
+
+def is_host_failure(e):
+    """
+    Errors worth retrying on another host: the host is unreachable or broken,
+    or it doesn't have the model (404). Bad requests are not retried.
+    """
+    if isinstance(e, (httpx.TransportError, ConnectionError)):
+        return True
+    status = getattr(e, 'status_code', None)
+    return status == 404 or (status is not None and status >= 500)
+
+class HostPool:
+    """
+    Routes Ollama calls across config.OLLAMA_HOSTS. Exposes the same lookups as
+    ModelRegistry (models, model_names, capabilities, invalidate), merged over
+    all hosts.
+    """
+    def __init__(self, urls=config.OLLAMA_HOSTS, embed_url=config.OLLAMA_EMBED_HOST, retries=config.HOST_RETRIES):
+        self.hosts = [Host(url) for url in urls]
+        self.embed_host = Host(embed_url) if embed_url else None
+        self.retries = retries
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        # Single-host pools behave like the old single registry (e.g. for the scheduler)
+        return self.hosts[0].url if len(self.hosts) == 1 else None
+
+    def all_hosts(self):
+        return self.hosts + ([self.embed_host] if self.embed_host else [])
+
+    def start_background_refresh(self, interval=None):
+        for host in self.all_hosts():
+            host.registry.start_background_refresh(interval)
+
+    def invalidate(self):
+        for host in self.all_hosts():
+            host.registry.invalidate()
+
+    def models(self):
+        merged = {}
+        for host in self.hosts:
+            if host.available():
+                for m in host.registry.models():
+                    merged.setdefault(m["name"], m)
+        return list(merged.values())
+
+    def model_names(self):
+        return [m["name"] for m in self.models()]
+
+    def capabilities(self, model):
+        for host in self.hosts_for(model):
+            return host.registry.capabilities(model)
+        return self.hosts[0].registry.capabilities(model)
+
+    def hosts_for(self, model, embedding=False):
+        """
+        Healthy hosts that list the model, best first: fewest requests in flight,
+        then hosts that already have it loaded. With a single host, that host is
+        always returned so errors surface from Ollama itself.
+        """
+        if embedding and self.embed_host:
+            return [self.embed_host]
+        if len(self.hosts) == 1:
+            return list(self.hosts)
+        candidates = [h for h in self.hosts if h.available() and model in h.registry.model_names()]
+        with self._lock:
+            return sorted(candidates, key=lambda h: (h.outstanding, model not in h.loaded))
+
+    def _needs_listing(self, embedding):
+        # Only multi-host routing looks at the hosts' model lists
+        return not (embedding and self.embed_host) and len(self.hosts) > 1
+
+    def _begin(self, host):
+        with self._lock:
+            host.outstanding += 1
+
+    def _end(self, host):
+        with self._lock:
+            host.outstanding -= 1
+
+    def _failed(self, host, error):
+        if getattr(error, 'status_code', None) == 404:
+            # Model was removed since the last listing
+            host.registry.invalidate()
+        elif host in self.hosts and len(self.hosts) > 1:
+            host.down_until = time.monotonic() + config.HOST_FAILURE_COOLDOWN
+            print(f"Ollama host {host.label} failed ({error}); skipping it for {config.HOST_FAILURE_COOLDOWN}s")
+
+    def _attempts(self, model, embedding):
+        hosts = self.hosts_for(model, embedding)
+        if not hosts:
+            raise NoHostAvailable(f"model '{model}' is not available on any healthy host")
+        return hosts[:1 + self.retries]
+
+    async def call(self, model, fn, embedding=False, can_retry=None):
+        """
+        Awaits fn(client, host) on the best host for the model, retrying on the
+        next one when the host fails. can_retry() may veto the retry, e.g. once a
+        streamed answer has already been shown.
+        """
+        from async_runtime import runtime
+        error = None
+        if self._needs_listing(embedding) and not all(h.registry.fresh() for h in self.hosts):
+            # Routing would refresh a stale model list (a blocking ollama.list()): not on the event loop
+            attempts = await asyncio.to_thread(self._attempts, model, embedding)
+        else:
+            attempts = self._attempts(model, embedding)
+        for host in attempts:
+            self._begin(host)
+            try:
+                return await fn(runtime.get_client(host.url), host)
+            except Exception as e:
+                if not is_host_failure(e):
+                    raise
+                self._failed(host, e)
+                if can_retry is not None and not can_retry():
+                    raise
+                error = e
+            finally:
+                self._end(host)
+        raise error
+
+    def call_sync(self, model, fn, embedding=False):
+        """
+        Blocking variant of call() for worker threads: fn(client, host) gets a sync ollama.Client.
+        """
+        error = None
+        for host in self._attempts(model, embedding):
+            self._begin(host)
+            try:
+                return fn(host.registry.client, host)
+            except Exception as e:
+                if not is_host_failure(e):
+                    raise
+                self._failed(host, e)
+                error = e
+            finally:
+                self._end(host)
+        raise error
+
+    def status(self):
+        return [{
+            "host": host.label,
+            "role": "embedding" if host is self.embed_host else "council",
+            "healthy": host.available(),
+            "outstanding": host.outstanding,
+            "models": len(host.registry.model_names()) if host.available() else 0,
+            "loaded": sorted(host.loaded)
+        } for host in self.all_hosts()]
+
+    def embed(self, model, texts):
+        return self.call_sync(model, lambda client, host: client.embed(model=model, input=texts)['embeddings'], embedding=True)
+
+    def embed_registry(self):
+        """
+        Where VectorStore looks up embedding models: the dedicated host, or the whole pool.
+        """
+        return self.embed_host.registry if self.embed_host else self
+
+host_pool = HostPool()
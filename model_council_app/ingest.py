@@ -0,0 +1,183 @@
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import config
+from rag import DocumentProcessor
+import parsing
+
+_END = object()
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+def prefetch(iterable, maxsize):
+    """
+    Runs the producer side of a generator pipeline in its own thread, so parsing
+    and chunking overlap with embedding. At most maxsize items are buffered.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            put(_END)
+
+    producer = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        # Once closed, the caller may resume the source generator: the producer must be out of it
+        producer.join()
+
+class IngestJob:
+    """
+    Progress of one background ingestion, observable as a stream of events.
+    """
+    def __init__(self, filename):
+        self.id = uuid.uuid4().hex[:12]
+        self.filename = filename
+        self.status = "queued"
+        self.created = time.time()
+        self.events = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def emit(self, event, status=None):
+        with self._cond:
+            if status:
+                self.status = status
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def iter_events(self, keepalive=15):
+        """
+        Yields events as they happen (None on keepalive timeouts) until the job ends.
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                if sent >= len(self.events) and not self.finished:
+                    self._cond.wait(keepalive)
+                new_events = self.events[sent:]
+                finished = self.finished
+            sent += len(new_events)
+            if not new_events and not finished:
+                yield None
+            for event in new_events:
+                yield event
+            if finished and sent >= len(self.events):
+                return
+
+class IngestManager:
+    def __init__(self, workers=config.INGEST_WORKERS, keep=100):
+        self.jobs = {}
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def submit(self, filename, work):
+        """
+        Runs work(job) in the background. Its return value becomes the 'done' event.
+        """
+        job = IngestJob(filename)
+        with self._lock:
+            self.jobs[job.id] = job
+            finished = [j for j in self.jobs.values() if j.finished]
+            for old in sorted(finished, key=lambda j: j.created)[:max(0, len(finished) - self.keep)]:
+                del self.jobs[old.id]
+
+        def run():
+            job.status = "running"
+            try:
+                result = work(job)
+                job.emit({"type": "done", **result}, status="done")
+            except Exception as e:
+                job.emit({"type": "error", "error": str(e)}, status="error")
+
+        self._pool.submit(run)
+        return job
+
+def ingest_file(job, vector_store, path, ext, text_limit=config.FULL_TEXT_FALLBACK_CHARS):
+    """
+    Streams a saved upload through parse -> chunk -> embed, emitting progress
+    events on the job. Returns the ingest result plus the first text_limit
+    characters of the document (used as the no-embedder fallback context).
+    """
+    pieces, total = parsing.iter_file(path, ext)
+    progress = {"pieces": 0, "prefix": [], "prefix_len": 0}
+    start = time.perf_counter()
+
+    def counted(pieces):
+        for piece in pieces:
+            progress["pieces"] += 1
+            if progress["prefix_len"] < text_limit:
+                kept = piece[:text_limit - progress["prefix_len"]]
+                progress["prefix"].append(kept)
+                progress["prefix_len"] += len(kept)
+            yield piece
+
+    def report(chunks_seen, chunks_embedded):
+        done = progress["pieces"]
+        elapsed = time.perf_counter() - start
+        eta = elapsed * (total - done) / done if total and done else None
+        job.emit({
+            "type": "progress",
+            "pages": done,
+            "pages_total": total,
+            "chunks_embedded": chunks_embedded,
+            "chunks_seen": chunks_seen,
+            "eta_s": eta
+        })
+
+    window = config.EMBED_BATCH_SIZE * config.EMBED_MAX_IN_FLIGHT
+    counted_pieces = counted(pieces)
+    chunks = prefetch(DocumentProcessor.iter_chunks(counted_pieces), maxsize=window)
+    count = vector_store.add_chunks(chunks, job.filename, progress=report)
+    chunks.close()  # joins the prefetch thread before counted_pieces is read here
+
+    # No embedder: still read enough text for the fallback context
+    if not count:
+        for _ in counted_pieces:
+            if progress["prefix_len"] >= text_limit:
+                break
+
+    return {
+        "chunks": count,
+        "filename": job.filename,
+        "ingest": vector_store.last_ingest_stats if count else None,
+        "text": "".join(progress["prefix"])
+    }
+
+ingest_jobs = IngestManager()
@@ -0,0 +1,135 @@
+"""
+Token budget for the judge prompt.
+
+Member answers are pasted into SYNTHESIS_PROMPT_TEMPLATE in full, which can
+overflow the judge's context window (Ollama silently truncates the prompt) or
+make prefill very slow. Answers are compacted in increasing steps until they
+fit: duplicate paragraphs are dropped, then answers are reduced to their key
+points, then trimmed proportionally. When they exceed the budget by far, the
+council falls back to map-reduce synthesis (see ModelCouncil.prepare_synthesis).
+"""
+import math
+import re
+import config
+
+KEY_LINE = re.compile(r"^\s*(#{1,6}\s|[-*•]\s|\d+[.)]\s|\*\*)")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / config.CHARS_PER_TOKEN)
+
+def judge_context(capabilities):
+    """
+    (num_ctx to request, tokens available for the prompt) for a judge model,
+    given its registry capabilities (context_length may be unknown).
+    """
+    num_ctx = config.JUDGE_CONTEXT_TOKENS
+    context_length = capabilities.get("context_length")
+    if context_length:
+        num_ctx = min(num_ctx, context_length)
+    return num_ctx, max(256, num_ctx - config.JUDGE_OUTPUT_RESERVE)
+
+def format_responses(results):
+    return "".join(f"## Response from {res['model']}:\n{res['response']}\n\n" for res in results)
+
+def answers_tokens(results):
+    return estimate_tokens(format_responses(results))
+
+def _paragraphs(text):
+    return [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+def dedupe(results, threshold=config.JUDGE_DEDUP_SIMILARITY):
+    """
+    Drops paragraphs that (nearly) repeat a paragraph from an earlier answer,
+    by Jaccard similarity of word 3-grams.
+    """
+    seen = []
+    compacted = []
+    for res in results:
+        kept = []
+        for paragraph in _paragraphs(res["response"]):
+            shingles = _shingles(paragraph)
+            if any(len(shingles & s) / len(shingles | s) >= threshold for s in seen):
+                continue
+            seen.append(shingles)
+            kept.append(paragraph)
+        compacted.append(dict(res, response="\n\n".join(kept)))
+    return compacted
+
+def key_points(results):
+    """
+    Keeps headings, list items, bold lines and the first sentence of every
+    other paragraph: the skeleton of each answer.
+    """
+    compacted = []
+    for res in results:
+        points = []
+        for paragraph in _paragraphs(res["response"]):
+            lines = paragraph.strip().splitlines()
+            structured = [line.strip() for line in lines if KEY_LINE.match(line)]
+            if structured:
+                points.extend(structured)
+            else:
+                points.append(SENTENCE_END.split(paragraph.strip(), 1)[0])
+        compacted.append(dict(res, response="\n".join(points)))
+    return compacted
+
+def trim(results, budget):
+    """
+    Cuts every answer to its share of the budget (shorter answers give their
+    unused share to longer ones), on a sentence boundary where possible.
+    """
+    remaining_budget = budget - answers_tokens([dict(r, response="") for r in results])
+    by_size = sorted(range(len(results)), key=lambda i: len(results[i]["response"]))
+    compacted = list(results)
+    for n, i in enumerate(by_size):
+        share = remaining_budget // (len(results) - n)
+        text = results[i]["response"]
+        if estimate_tokens(text) > share:
+            cut = text[:max(0, share * config.CHARS_PER_TOKEN - 20)]
+            sentence = cut.rfind(". ")
+            if sentence > len(cut) // 2:
+                cut = cut[:sentence + 1]
+            text = cut + "\n...(cortado)"
+        compacted[i] = dict(results[i], response=text)
+        remaining_budget -= estimate_tokens(text)
+    return compacted
+
+def compact(results, budget):
+    """
+    Returns (results that fit in budget tokens, strategy used). Steps stop as
+    soon as the answers fit. "map_reduce" means they are too large even to
+    try: the caller should summarize them in groups first.
+    """
+    if answers_tokens(results) <= budget:
+        return results, "none"
+    if answers_tokens(results) > budget * config.JUDGE_MAP_REDUCE_RATIO:
+        return results, "map_reduce"
+    results = dedupe(results)
+    if answers_tokens(results) <= budget:
+        return results, "dedupe"
+    results = key_points(results)
+    if answers_tokens(results) <= budget:
+        return results, "key_points"
+    return trim(results, budget), "trim"
+
+def groups(results, budget):
+    """
+    Splits answers into consecutive groups that each fit in budget tokens
+    (an answer larger than the budget is trimmed and gets its own group).
+    """
+    batches, current = [], []
+    for res in results:
+        if answers_tokens([res]) > budget:
+            res = trim([res], budget)[0]
+        if current and answers_tokens(current + [res]) > budget:
+            batches.append(current)
+            current = []
+        current.append(res)
+    if current:
+        batches.append(current)
+    return batches
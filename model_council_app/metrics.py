@@ -0,0 +1,141 @@
+"""
+Timing instrumentation for council runs.
+
+Process-wide histograms (rendered in Prometheus text format at /api/metrics)
+plus a per-run collector: the RunTimings bound to the current context gets
+every stage and Ollama call of that run, and is sent as the 'timings' event.
+Asyncio tasks and to_thread calls copy the context, so member queries and the
+history write report to the run that started them.
+"""
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+import config
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=config.METRICS_SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # sorted label items -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return "\n".join(lines)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+STAGE_SECONDS = Histogram("council_stage_seconds", "Wall time of each council run stage.")
+OLLAMA_LOAD_SECONDS = Histogram("ollama_load_seconds", "Ollama load_duration: time spent loading the model.")
+OLLAMA_PROMPT_EVAL_SECONDS = Histogram("ollama_prompt_eval_seconds", "Ollama prompt_eval_duration: prefill time.")
+OLLAMA_EVAL_SECONDS = Histogram("ollama_eval_seconds", "Ollama eval_duration: generation time.")
+OLLAMA_EVAL_TOKENS = Histogram("ollama_eval_tokens", "Ollama eval_count: generated tokens per call.",
+                               buckets=config.METRICS_TOKENS_BUCKETS)
+HISTOGRAMS = [STAGE_SECONDS, OLLAMA_LOAD_SECONDS, OLLAMA_PROMPT_EVAL_SECONDS, OLLAMA_EVAL_SECONDS, OLLAMA_EVAL_TOKENS]
+
+class RunTimings:
+    """
+    What one council run spent where: seconds per stage and Ollama's own counters per call.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.calls = []
+
+    def summary(self):
+        return {
+            "total": time.perf_counter() - self.started,
+            "stages": dict(self.stages),
+            "calls": list(self.calls)
+        }
+
+_current_run = contextvars.ContextVar("council_run", default=None)
+
+def bind(timings=None):
+    """
+    Binds a RunTimings (a new one unless given) to the current context for
+    good, e.g. for the rest of an asyncio task. Returns it.
+    """
+    timings = timings or RunTimings()
+    _current_run.set(timings)
+    return timings
+
+@contextlib.contextmanager
+def run(timings=None):
+    """
+    Binds a RunTimings (a new one unless given) to the current context.
+    """
+    timings = timings or RunTimings()
+    token = _current_run.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_run.reset(token)
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Times a block into council_stage_seconds and the current run, if any.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        current = _current_run.get()
+        if current is not None:
+            current.stages[name] = current.stages.get(name, 0.0) + elapsed
+
+def observe_ollama(model, role, response):
+    """
+    Records the durations Ollama reports on a final chat/generate response
+    (nanoseconds) for a 'member', 'judge' or 'judge_map' call.
+    """
+    if not response:
+        return
+    seconds = lambda field: response.get(field) / 1e9 if response.get(field) is not None else None
+    call = {
+        "model": model,
+        "role": role,
+        "load_s": seconds('load_duration'),
+        "prefill_s": seconds('prompt_eval_duration'),
+        "generation_s": seconds('eval_duration'),
+        "prompt_tokens": response.get('prompt_eval_count'),
+        "eval_tokens": response.get('eval_count')
+    }
+    for histogram, value in ((OLLAMA_LOAD_SECONDS, call["load_s"]), (OLLAMA_PROMPT_EVAL_SECONDS, call["prefill_s"]),
+                             (OLLAMA_EVAL_SECONDS, call["generation_s"]), (OLLAMA_EVAL_TOKENS, call["eval_tokens"])):
+        if value is not None:
+            histogram.observe(value, model=model, role=role)
+    current = _current_run.get()
+    if current is not None:
+        current.calls.append(call)
+
+def render():
+    return "\n".join(h.render() for h in HISTOGRAMS) + "\n"
@@ -0,0 +1,155 @@
+import threading
+import time
+import ollama
+import config
+
+EMBEDDING_FAMILIES = ("bert", "nomic-bert")
+
+def _get(obj, key, default=None):
+    # Responses may be pydantic objects (new ollama versions) or plain dicts
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+class ModelRegistry:
+    """
+    Cached view of the models installed on one Ollama host.
+    The model list is refreshed at most once per TTL (or in the background),
+    and per-model capabilities are looked up once and kept until invalidated.
+    """
+    def __init__(self, host=None, ttl=config.MODEL_REGISTRY_TTL):
+        self.host = host
+        self.ttl = ttl
+        self._client = ollama.Client(host=host) if host else None
+        self._models = []
+        self._fetched_at = None
+        self._capabilities = {}
+        self._failed = {}  # model -> when its lookup last failed; not retried within the TTL
+        self._lock = threading.Lock()
+        self._refresher = None
+        self.healthy = None  # Result of the last refresh; None until the host was first asked
+
+    @property
+    def client(self):
+        return self._client or ollama
+
+    @staticmethod
+    def parse_models(models_info):
+        """
+        Normalizes an ollama.list() response into [{"name", "size", "family"}].
+        """
+        # New versions return an object with a 'models' attribute containing Model objects
+        models_list = _get(models_info, 'models')
+        if models_list is None:
+            # Fallback if it returns list directly
+            models_list = models_info
+
+        models = []
+        for m in models_list:
+            name = _get(m, 'model') or _get(m, 'name')
+            if not name:
+                continue
+            details = _get(m, 'details') or {}
+            models.append({
+                "name": name,
+                "size": _get(m, 'size') or 0,
+                "family": _get(details, 'family')
+            })
+        return models
+
+    def refresh(self):
+        """
+        Fetches the model list now. On failure the previous list is kept.
+        """
+        try:
+            models = self.parse_models(self.client.list())
+        except Exception as e:
+            print(f"Error fetching models from {self.host or 'default host'}: {e}")
+            self.healthy = False
+            with self._lock:
+                # Retry on the next call instead of hammering a host that is down
+                self._fetched_at = time.monotonic()
+                return list(self._models)
+        with self._lock:
+            self._models = models
+            self._fetched_at = time.monotonic()
+        self.healthy = True
+        return list(models)
+
+    def fresh(self):
+        """
+        True if models() would answer from the cache, without calling Ollama.
+        """
+        with self._lock:
+            return self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    def models(self):
+        with self._lock:
+            if self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl:
+                return list(self._models)
+        return self.refresh()
+
+    def model_names(self):
+        return [m["name"] for m in self.models()]
+
+    def invalidate(self):
+        """
+        Forces the next lookup to hit Ollama (e.g. after a pull, or a 'model not found').
+        """
+        with self._lock:
+            self._fetched_at = None
+            self._capabilities.clear()
+            self._failed.clear()
+
+    def start_background_refresh(self, interval=None):
+        """
+        Keeps the model list warm so request handlers never wait on ollama.list().
+        """
+        if self._refresher is not None:
+            return
+        interval = interval or max(1.0, self.ttl / 2)
+
+        def loop():
+            while True:
+                self.refresh()
+                time.sleep(interval)
+
+        self._refresher = threading.Thread(target=loop, name="model-registry", daemon=True)
+        self._refresher.start()
+
+    def capabilities(self, model):
+        """
+        Returns {"embedding": bool, "chat": bool, "context_length": int | None}.
+        """
+        with self._lock:
+            cached = self._capabilities.get(model)
+            failed_at = self._failed.get(model)
+        if cached is not None:
+            return cached
+
+        family = next((m["family"] for m in self._models if m["name"] == model), None)
+        caps = {"embedding": family in EMBEDDING_FAMILIES, "chat": family not in EMBEDDING_FAMILIES, "context_length": None}
+        if failed_at is not None and time.monotonic() - failed_at < self.ttl:
+            # Failed recently: answer from the listed family instead of another show() round trip
+            return caps
+        try:
+            info = self.client.show(model)
+            listed = _get(info, 'capabilities')
+            if listed:
+                caps["embedding"] = "embedding" in listed
+                caps["chat"] = "completion" in listed
+            family = _get(_get(info, 'details') or {}, 'family') or family
+            if not listed and family in EMBEDDING_FAMILIES:
+                caps["embedding"], caps["chat"] = True, False
+            for key, value in (_get(info, 'modelinfo') or _get(info, 'model_info') or {}).items():
+                if key.endswith(".context_length"):
+                    caps["context_length"] = int(value)
+        except Exception as e:
+            print(f"Error fetching capabilities for {model}: {e}")
+            with self._lock:
+                self._failed[model] = time.monotonic()
+            return caps
+
+        with self._lock:
+            self._capabilities[model] = caps
+        return caps
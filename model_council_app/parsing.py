@@ -0,0 +1,221 @@
+"""
+Document parsing in worker processes.
+
+PDF/DOCX/HTML extraction is CPU-bound pure Python; running it in the Flask
+process holds the GIL and slows every other request. Here it runs in a
+process pool, and the page ranges of one PDF are spread across workers.
+Workers are started with forkserver (spawn where it doesn't exist): forking
+the web process, which already runs threads, could copy locks held by them.
+This module is imported by the workers, so it must stay free of app imports.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+import PyPDF2
+import docx
+from bs4 import BeautifulSoup
+import config
+
+try:
+    import lxml  # noqa: F401  (BeautifulSoup's fastest HTML backend)
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+_pool = None
+_pool_lock = threading.Lock()
+_running = {}  # pool -> futures submitted to it and not finished yet
+
+def _mp_context():
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=config.PARSE_WORKERS, mp_context=_mp_context())
+            _running[_pool] = set()
+        return _pool
+
+def _submit(fn, *args):
+    """
+    Submits to the current pool. Returns (pool, future).
+    """
+    while True:
+        pool = _get_pool()
+        try:
+            future = pool.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError):
+            # Broken, or retired by another job between _get_pool() and submit()
+            _discard_pool(pool)
+            continue
+        with _pool_lock:
+            futures = _running.setdefault(pool, set())
+            futures.add(future)
+        future.add_done_callback(futures.discard)
+        return pool, future
+
+def _discard_pool(pool):
+    """
+    Stops handing out a pool; the next job gets fresh workers.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+def _retire_pool(pool, hung):
+    """
+    After a timeout: new work goes to fresh workers, the other jobs running on
+    the old ones get PARSE_TIMEOUT seconds to finish, then the old workers
+    (the stuck one among them) are terminated.
+    """
+    _discard_pool(pool)
+
+    def reap():
+        with _pool_lock:
+            others = [f for f in _running.get(pool, ()) if f not in hung]
+        wait(others, timeout=config.PARSE_TIMEOUT)
+        # ProcessPoolExecutor has no public way to kill a busy worker
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        with _pool_lock:
+            _running.pop(pool, None)
+
+    threading.Thread(target=reap, name="parse-pool-reaper", daemon=True).start()
+
+def _reset_pool():
+    """
+    Replaces the pool with fresh workers once the current ones are idle (benchmarks start from a cold pool).
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+        _running.pop(pool, None)
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+# --- Worker functions (run in child processes) ---
+
+def pdf_page_count(path):
+    with open(path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+def extract_pdf_pages(path, start, end):
+    with open(path, 'rb') as f:
+        pages = PyPDF2.PdfReader(f).pages
+        # One entry per page (empty pages too) so callers can count progress
+        return [(content + "\n") if content else "" for content in (pages[i].extract_text() for i in range(start, end))]
+
+def extract_docx_paragraphs(path):
+    return [para.text + "\n" for para in docx.Document(path).paragraphs]
+
+def html_to_text(content, parser=HTML_PARSER):
+    soup = BeautifulSoup(content, parser)
+
+    # Remove script and style elements
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+
+    text = soup.get_text()
+
+    # Break into lines and remove leading/trailing space on each
+    lines = (line.strip() for line in text.splitlines())
+    # Break multi-headlines into a line each
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    # Drop blank lines
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+# --- Client side (runs in the web server) ---
+
+def run(fn, *args, timeout=config.PARSE_TIMEOUT):
+    """
+    Runs one parsing function in the pool, or inline when PARSE_WORKERS is 0.
+    """
+    if not config.PARSE_WORKERS:
+        return fn(*args)
+    for attempt in range(2):
+        pool, future = _submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            _retire_pool(pool, {future})
+            raise TimeoutError(f"Parsing took longer than {timeout}s")
+        except BrokenProcessPool:
+            # Workers killed under this job (a crash, or another job's stuck worker): retry once on fresh ones
+            _discard_pool(pool)
+            if attempt:
+                raise
+
+def iter_pdf_pages(path, total=None, timeout=config.PARSE_TIMEOUT, pages_per_task=config.PARSE_PAGES_PER_TASK):
+    """
+    Yields page texts in order while workers extract later page ranges.
+    At most two tasks per worker are in flight, so memory stays bounded.
+    The whole document must be parsed within timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    if total is None:
+        total = run(pdf_page_count, path, timeout=timeout)
+    if not config.PARSE_WORKERS:
+        for start in range(0, total, pages_per_task):
+            yield from extract_pdf_pages(path, start, min(total, start + pages_per_task))
+        return
+
+    ranges = [(start, min(total, start + pages_per_task)) for start in range(0, total, pages_per_task)]
+    in_flight = []  # [start, end, pool, future, retried]
+    max_in_flight = 2 * config.PARSE_WORKERS
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < max_in_flight:
+                start, end = ranges.pop(0)
+                in_flight.append([start, end, *_submit(extract_pdf_pages, path, start, end), False])
+            task = in_flight[0]
+            remaining = deadline - time.monotonic()
+            try:
+                texts = task[3].result(timeout=max(0, remaining))
+            except TimeoutError:
+                # Only this document's tasks are abandoned; other jobs keep their workers
+                for _, _, _, future, _ in in_flight:
+                    future.cancel()
+                _retire_pool(task[2], {future for _, _, _, future, _ in in_flight})
+                raise TimeoutError(f"Parsing took longer than {timeout}s")
+            except BrokenProcessPool:
+                _discard_pool(task[2])
+                if task[4]:
+                    raise
+                task[2], task[3] = _submit(extract_pdf_pages, path, task[0], task[1])
+                task[4] = True
+                continue
+            in_flight.pop(0)
+            yield from texts
+    finally:
+        for _, _, _, future, _ in in_flight:
+            future.cancel()
+
+def iter_file(path, ext):
+    """
+    Returns (iterator of text pieces, number of pieces) for a saved upload.
+    PDF and DOCX are parsed in the process pool; TXT is streamed from disk.
+    """
+    if ext == 'pdf':
+        total = run(pdf_page_count, path)
+        return iter_pdf_pages(path, total), total
+    if ext == 'docx':
+        paragraphs = run(extract_docx_paragraphs, path)
+        return iter(paragraphs), len(paragraphs)
+    if ext == 'txt':
+        return _iter_txt(path), -(-os.path.getsize(path) // 65536)
+    return iter(()), 0
+
+def _iter_txt(path):
+    # Imported lazily: rag pulls in ollama, which worker processes don't need
+    from rag import DocumentProcessor
+    with open(path, 'rb') as f:
+        yield from DocumentProcessor.iter_txt_blocks(f)
@@ -1,62 +1,112 @@
+import codecs
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import PyPDF2
 import docx
 import numpy as np
-import ollama
-import requests
-from bs4 import BeautifulSoup
 import config
+import metrics
+import retrieval
+import parsing
+from embedding_cache import embedding_cache
+from vector_index import VectorIndex
+from host_pool import host_pool
+from url_fetch import fetcher
 
 class DocumentProcessor:
     @staticmethod
-    def load_pdf(file_bytes):
+    def iter_pdf_pages(file_bytes):
         pdf_reader = PyPDF2.PdfReader(file_bytes)
-        text = ""
         for page in pdf_reader.pages:
             content = page.extract_text()
             if content:
-                text += content + "\n"
-        return text
+                yield content + "\n"
 
     @staticmethod
-    def load_docx(file_bytes):
+    def iter_docx_paragraphs(file_bytes):
         doc = docx.Document(file_bytes)
-        text = ""
         for para in doc.paragraphs:
-            text += para.text + "\n"
-        return text
+            yield para.text + "\n"
+
+    @staticmethod
+    def iter_txt_blocks(file_bytes, block_size=65536):
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        while True:
+            block = file_bytes.read(block_size)
+            if not block:
+                break
+            yield decoder.decode(block)
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    @staticmethod
+    def load_pdf(file_bytes):
+        return "".join(DocumentProcessor.iter_pdf_pages(file_bytes))
+
+    @staticmethod
+    def load_docx(file_bytes):
+        return "".join(DocumentProcessor.iter_docx_paragraphs(file_bytes))
 
     @staticmethod
     def load_txt(file_bytes):
         return file_bytes.read().decode('utf-8')
 
+    @staticmethod
+    def page_text(page):
+        """
+        Text of a fetched page (see url_fetch.Fetcher.fetch).
+        """
+        if page["content_type"].startswith('text/plain'):
+            return page["content"].decode('utf-8', errors='replace')
+        # HTML parsing is CPU-bound: done in the parsing process pool
+        return parsing.run(parsing.html_to_text, page["content"])
+
     @staticmethod
     def load_url(url):
         try:
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-                
-            text = soup.get_text()
-            
-            # Break into lines and remove leading/trailing space on each
-            lines = (line.strip() for line in text.splitlines())
-            # Break multi-headlines into a line each
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            # Drop blank lines
-            text = '\n'.join(chunk for chunk in chunks if chunk)
-            
-            return text
+            return DocumentProcessor.page_text(fetcher.fetch(url))
         except Exception as e:
             print(f"Error scraping URL: {e}")
             return None
 
+    @staticmethod
+    def iter_urls(urls):
+        """
+        Fetches and parses pages concurrently. Yields (url, text, cached, error)
+        as each page is ready; text is None if the page failed.
+        """
+        def load(url):
+            page = fetcher.fetch(url)
+            return DocumentProcessor.page_text(page), page["cached"]
+
+        for url, result, error in fetcher.map(load, urls):
+            if error is not None:
+                print(f"Error scraping URL {url}: {error}")
+                yield url, None, False, str(error)
+            else:
+                yield url, result[0], result[1], None
+
+    @staticmethod
+    def iter_chunks(pieces, chunk_size=config.CHUNK_SIZE, overlap=config.CHUNK_OVERLAP):
+        """
+        Streaming split_text: consumes text pieces and yields the same chunks
+        split_text would yield for their concatenation, holding at most one
+        chunk plus one piece in memory.
+        """
+        step = chunk_size - overlap
+        buffer = ""
+        for piece in pieces:
+            buffer += piece
+            while len(buffer) >= chunk_size:
+                yield buffer[:chunk_size]
+                buffer = buffer[step:]
+        start = 0
+        while start < len(buffer):
+            yield buffer[start:start + chunk_size]
+            start += step
+
     @staticmethod
     def split_text(text, chunk_size=config.CHUNK_SIZE, overlap=config.CHUNK_OVERLAP):
         chunks = []
@@ -70,131 +120,266 @@ class DocumentProcessor:
         return chunks
 
 class VectorStore:
-    def __init__(self):
+    def __init__(self, path=None):
         # Using Ollama for embeddings to avoid heavy python dependencies (torch, etc.)
-        self.chunks = []
-        self.embeddings = None
+        # With a path (e.g. config.VECTOR_DB_PATH) documents persist across restarts.
+        self.index = VectorIndex(path)
         self.embedding_model = "all-minilm" # Default lightweight model for ollama
+        self.last_ingest_stats = None
+        self._embedder = None  # (installed model names, embedder chosen among them)
+
+    @property
+    def chunks(self):
+        return [c for s in self.index.segments for c in s.chunks()]
+
+    @property
+    def embeddings(self):
+        segments = [s for s in self.index.segments if s.meta["dim"]]
+        if not segments:
+            return None  # nothing stored, or only lexical-only documents
+        return np.vstack([s.embeddings for s in segments])
+
+    def documents(self):
+        return self.index.documents()
+
+    def memory_bytes(self):
+        return self.index.memory_bytes()
+
+    def delete_document(self, doc_id):
+        return self.index.delete(doc_id)
+
+    def clear(self):
+        self.index.clear()
 
     def _get_embedding_model_name(self):
         # Check if the preferred embedding model exists, else try to find one or fallback
-        try:
-            models_info = ollama.list()
-            
-            model_names = []
-            # Robust parsing (same as council.py)
-            source_list = []
-            if hasattr(models_info, 'models'):
-                source_list = models_info.models
-            elif isinstance(models_info, dict) and 'models' in models_info:
-                source_list = models_info['models']
-            else:
-                source_list = models_info
-                
-            for m in source_list:
-                if hasattr(m, 'model'):
-                    model_names.append(m.model)
-                elif isinstance(m, dict):
-                    model_names.append(m.get('model') or m.get('name'))
-            
-            # If our default is there, good.
-            if any(self.embedding_model in m for m in model_names):
-                return self.embedding_model
-            
-            # If not, look for known embedding models
-            known_embedders = [
-                "nomic-embed-text", 
-                "mxbai-embed-large", 
-                "snowflake-arctic-embed", 
-                "bge-m3", 
-                "starling-lm"
-            ]
-            
-            for known in known_embedders:
-                for m in model_names:
-                    if known in m:
-                        return m
-            
-            # Do NOT fallback to random chat models as they often don't support embeddings endpoint
-            # or are too heavy/wrong format.
-            print(f"No dedicated embedding model found. Available: {model_names}")
-            return None
+        registry = host_pool.embed_registry()
+        model_names = registry.model_names()
+        # Resolved once per model list: the capability probe below is one show() per model
+        if self._embedder is not None and self._embedder[0] == model_names:
+            return self._embedder[1]
+        self._embedder = (model_names, self._find_embedding_model(registry, model_names))
+        return self._embedder[1]
 
-        except Exception as e:
-            print(f"Error finding embedding model: {e}")
-            return None
+    def _find_embedding_model(self, registry, model_names):
+        # If our default is there, good.
+        if any(self.embedding_model in m for m in model_names):
+            return self.embedding_model
+        
+        # If not, look for known embedding models
+        known_embedders = [
+            "nomic-embed-text", 
+            "mxbai-embed-large", 
+            "snowflake-arctic-embed", 
+            "bge-m3", 
+            "starling-lm"
+        ]
+        
+        for known in known_embedders:
+            for m in model_names:
+                if known in m:
+                    return m
 
-    def add_document(self, text, source_name="upload"):
-        self.chunks = []
-        self.embeddings = None
+        # Any other model that reports the embedding capability
+        for m in model_names:
+            if registry.capabilities(m)["embedding"]:
+                return m
+        
+        # Do NOT fallback to random chat models as they often don't support embeddings endpoint
+        # or are too heavy/wrong format.
+        print(f"No dedicated embedding model found. Available: {model_names}")
+        return None
+
+    @staticmethod
+    def _embed_batch(model, texts):
+        # Routed to OLLAMA_EMBED_HOST when set, else to the least busy pool host with the model
+        return host_pool.embed(model, texts)
+
+    def embed_texts(self, texts, model, batch_size=config.EMBED_BATCH_SIZE, max_in_flight=config.EMBED_MAX_IN_FLIGHT):
+        """
+        Embeds texts through the multi-input embed endpoint, with at most
+        max_in_flight batches running at once. Failed batches are retried, then
+        split into single chunks so one bad chunk doesn't sink its neighbours.
+        Returns one vector per text, or None where embedding kept failing.
+        """
+        def run(start):
+            batch = texts[start:start + batch_size]
+            for attempt in range(config.EMBED_MAX_RETRIES + 1):
+                try:
+                    return self._embed_batch(model, batch)
+                except Exception as e:
+                    print(f"Embedding error (batch at {start}, attempt {attempt + 1}): {e}")
+
+            vectors = []
+            for chunk in batch:
+                vector = None
+                for attempt in range(config.EMBED_MAX_RETRIES + 1):
+                    try:
+                        vector = self._embed_batch(model, [chunk])[0]
+                        break
+                    except Exception as e:
+                        print(f"Embedding error (single chunk, attempt {attempt + 1}): {e}")
+                vectors.append(vector)
+            return vectors
+
+        vectors = []
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            for batch_vectors in pool.map(run, range(0, len(texts), batch_size)):
+                vectors.extend(batch_vectors)
+        return vectors
 
+    def embed_cached(self, texts, model):
+        """
+        Like embed_texts, but only calls Ollama for texts missing from the
+        embedding cache (duplicates within the call are embedded once).
+        """
+        if not config.EMBED_CACHE_ENABLED:
+            return self.embed_texts(texts, model)
+
+        vectors = embedding_cache.get_many(model, texts)
+        misses = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if misses:
+            fresh = dict(zip(misses, self.embed_texts(misses, model)))
+            embedding_cache.put_many(model, misses, [fresh[t] for t in misses])
+            vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def add_document(self, text, source_name="upload"):
+        """
+        Embeds a document and adds it to the index as a new document.
+        Documents already indexed are kept and not re-embedded.
+        """
         new_chunks = DocumentProcessor.split_text(text)
         if not new_chunks:
             return 0
-            
-        self.chunks = new_chunks
-        
+        return self.add_chunks(new_chunks, source_name)
+
+    def add_chunks(self, chunks, source_name="upload", progress=None):
+        """
+        Embeds chunks from any iterable (e.g. a streaming chunker) window by
+        window and appends them to a new document in the index.
+        progress(chunks_seen, chunks_embedded) is called after every window.
+        Without an embedding model the chunks are indexed for BM25 search only
+        (if BM25_ENABLED). Returns the number of chunks indexed.
+        """
         target_model = self._get_embedding_model_name()
-        if not target_model:
+        if not target_model and not config.BM25_ENABLED:
             # If no model found, we can't embed. Return 0 to indicate failure or handle upstream.
-            # For now let's just proceed and fail at embedding step with error log if needed, 
-            # or try to pull?
-            # Let's try to pull 'all-minilm' if we can't find it? 
             # Pulling is blocking and slow. Let's assume user has models or the app will warn.
             print("No models found for embedding.")
             return 0
+        if not target_model:
+            print(f"No models found for embedding; indexing {source_name} for lexical search only.")
 
-        # Generate embeddings in batch if possible or loop
-        embeddings = []
-        for chunk in new_chunks:
-            try:
-                resp = ollama.embeddings(model=target_model, prompt=chunk)
-                embeddings.append(resp['embedding'])
-            except Exception as e:
-                print(f"Embedding error: {e}")
-                
-        if not embeddings:
-            return 0
-            
-        # Convert to numpy
-        emb_matrix = np.array(embeddings)
-        
-        # Normalize
-        norms = np.linalg.norm(emb_matrix, axis=1, keepdims=True)
-        # Avoid divide by zero
-        norms[norms == 0] = 1e-10
-        self.embeddings = emb_matrix / norms
-        
-        return len(new_chunks)
+        window_size = config.EMBED_BATCH_SIZE * config.EMBED_MAX_IN_FLIGHT
+        writer = self.index.writer(source_name, target_model)
+        stats = {"seen": 0, "embedded": 0}
 
-    def query(self, prompt, n_results=3):
-        if not self.chunks or self.embeddings is None:
-            return []
-            
-        target_model = self._get_embedding_model_name()
-        if not target_model:
-            return []
+        def embed_window(window):
+            if not target_model:
+                writer.append(window)
+                stats["seen"] += len(window)
+                stats["embedded"] += len(window)
+                if progress:
+                    progress(stats["seen"], stats["embedded"])
+                return
+            vectors = self.embed_cached(window, target_model)
+
+            # Keep chunks and embeddings aligned: drop chunks that could not be embedded
+            kept = [(c, vec) for c, vec in zip(window, vectors) if vec is not None]
+            if kept:
+                # Convert to numpy
+                emb_matrix = np.array([vec for _, vec in kept], dtype=np.float32)
 
+                # Normalize
+                norms = np.linalg.norm(emb_matrix, axis=1, keepdims=True)
+                # Avoid divide by zero
+                norms[norms == 0] = 1e-10
+                writer.append([c for c, _ in kept], emb_matrix / norms)
+
+            stats["seen"] += len(window)
+            stats["embedded"] += len(kept)
+            if progress:
+                progress(stats["seen"], stats["embedded"])
+
+        start = time.perf_counter()
         try:
-            resp = ollama.embeddings(model=target_model, prompt=prompt)
-            query_embedding = np.array(resp['embedding'])
+            window = []
+            for chunk in chunks:
+                window.append(chunk)
+                if len(window) >= window_size:
+                    embed_window(window)
+                    window = []
+            if window:
+                embed_window(window)
+        except Exception:
+            writer.abort()
+            raise
+        elapsed = time.perf_counter() - start
+
+        seen, embedded = stats["seen"], stats["embedded"]
+        self.last_ingest_stats = {
+            "chunks": seen,
+            "embedded": embedded,
+            "failed": seen - embedded,
+            "seconds": elapsed,
+            "chunks_per_s": embedded / elapsed if elapsed > 0 else 0.0,
+            "lexical_only": not target_model
+        }
+        print(f"{'Embedded' if target_model else 'Indexed'} {embedded}/{seen} chunks from {source_name} "
+              f"in {elapsed:.2f}s ({self.last_ingest_stats['chunks_per_s']:.1f} chunks/s)")
+
+        self.last_ingest_stats["doc_id"] = writer.commit()
+        if target_model and config.EMBED_CACHE_ENABLED:
+            # One cache index write per document, off the query path
+            embedding_cache.flush()
+        return embedded
+
+    def _embed_query(self, prompt, target_model):
+        """
+        Normalized query embedding, or None if it could not be computed.
+        """
+        try:
+            with metrics.stage("retrieval_embed"):
+                query_embedding = self.embed_cached([prompt], target_model)[0]
+            if query_embedding is None:
+                return None
+            query_embedding = np.array(query_embedding, dtype=np.float32)
         except:
-            return []
+            return None
         
         # Normalize query
         query_norm = np.linalg.norm(query_embedding)
         if query_norm == 0:
+            return None
+        return query_embedding / query_norm
+
+    def query(self, prompt, n_results=3, diversify=True, max_chars=config.CONTEXT_MAX_CHARS, hybrid=config.HYBRID_RETRIEVAL):
+        """
+        Returns up to n_results context passages for the prompt. With diversify,
+        overlapping neighbour chunks are merged, passages are reranked with MMR
+        and cut to max_chars (see retrieval); otherwise the raw top chunks.
+        Without an embedding model, BM25 is used instead; with hybrid, the
+        vector and BM25 rankings are fused.
+        """
+        if not len(self.index):
             return []
             
-        query_embedding = query_embedding / query_norm
-        
-        # Cosine similarity
-        scores = np.dot(query_embedding, self.embeddings.T)
-        
-        if len(scores) < n_results:
-            n_results = len(scores)
-            
-        top_indices = np.argsort(scores)[-n_results:][::-1]
-        
-        results = [self.chunks[i] for i in top_indices]
-        return results
+        target_model = self._get_embedding_model_name()
+        query_embedding = self._embed_query(prompt, target_model) if target_model else None
+        if query_embedding is None and not config.BM25_ENABLED:
+            return []
+
+        n_hits = n_results * config.RETRIEVAL_CANDIDATES if diversify else n_results
+        with metrics.stage("retrieval_search"):
+            if query_embedding is None:
+                # No embedder (or it failed): lexical search over every document
+                hits = self.index.search_lexical(prompt, n_hits)
+            else:
+                # Cosine similarity across every document embedded with this model
+                hits = self.index.search(query_embedding, n_hits, model=target_model)
+                if hybrid and config.BM25_ENABLED:
+                    hits = retrieval.fuse([hits, self.index.search_lexical(prompt, n_hits)], n_hits)
+            if not diversify:
+                return [segment.chunk(i) for _, segment, i in hits]
+            return retrieval.build_context(query_embedding, hits, n_results, max_chars)
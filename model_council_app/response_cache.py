@@ -0,0 +1,84 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import config
+
+class ResponseCache:
+    """
+    Cache of council member answers keyed on (model, system prompt, context,
+    prompt, temperature). In-memory LRU with a per-entry TTL, optionally
+    backed by SQLite so answers survive restarts.
+    """
+    def __init__(self, max_entries=config.RESPONSE_CACHE_MAX_ENTRIES, ttl=config.RESPONSE_CACHE_TTL, path=config.RESPONSE_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, system_prompt, context, prompt, temperature):
+        payload = json.dumps([model, system_prompt, context, prompt, temperature], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _disk(self):
+        if self._db is None and self.path:
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            with self._db:
+                self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires REAL, value TEXT)")
+                self._db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+        return self._db
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.path:
+                row = self._disk().execute("SELECT expires, value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row:
+                    entry = (row[0], json.loads(row[1]))
+                    self._remember(key, entry)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key, result, ttl=None):
+        entry = (time.time() + (ttl or self.ttl), result)
+        with self._lock:
+            self._remember(key, entry)
+            if self.path:
+                with self._disk():
+                    self._db.execute("INSERT OR REPLACE INTO responses (key, expires, value) VALUES (?, ?, ?)",
+                                     (key, entry[0], json.dumps(result, ensure_ascii=False)))
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        if self.path:
+            with self._disk():
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                with self._disk():
+                    self._db.execute("DELETE FROM responses")
+
+response_cache = ResponseCache()
@@ -0,0 +1,110 @@
+"""
+Post-processing of vector search hits into the context block sent to the council.
+
+Chunks overlap by CHUNK_OVERLAP characters, so the raw top-k is often the same
+passage twice. Hits that are neighbours in their document are merged back into
+one passage (the overlap kept once), passages are picked with MMR so they
+cover different ground, and the result is cut to a character budget. Passages
+come out in document order, so the same question always yields the same block.
+Vector and BM25 hits can be combined beforehand with reciprocal rank fusion.
+"""
+import numpy as np
+import config
+
+def overlap_length(left, right, max_overlap=config.CHUNK_OVERLAP):
+    """
+    Length of the longest suffix of left that is a prefix of right (up to max_overlap).
+    """
+    for k in range(min(max_overlap, len(left), len(right)), 0, -1):
+        if left.endswith(right[:k]):
+            return k
+    return 0
+
+def merge_adjacent(hits):
+    """
+    hits: (score, segment, chunk index) tuples. Consecutive chunks of the same
+    document whose text overlaps become one passage. Returns passages as
+    {"segment", "start", "text", "score", "vector"} in document order.
+    """
+    passages = []
+    for score, segment, i in sorted(hits, key=lambda h: (h[1].doc_id, h[2])):
+        text = segment.chunk(i)
+        # Lexical-only documents have no vector
+        vector = segment.vector(i) if segment.meta["dim"] else None
+        last = passages[-1] if passages else None
+        if last is not None and last["segment"] is segment and last["end"] == i - 1:
+            k = overlap_length(last["text"], text)
+            if k:
+                last["text"] += text[k:]
+                last["end"] = i
+                last["score"] = max(last["score"], score)
+                if vector is not None:
+                    last["vector"] = last["vector"] + vector
+                continue
+        passages.append({"segment": segment, "start": i, "end": i, "text": text, "score": score, "vector": vector})
+    for p in passages:
+        norm = np.linalg.norm(p["vector"]) if p["vector"] is not None else 0
+        if norm:
+            p["vector"] = p["vector"] / norm
+    return passages
+
+def fuse(rankings, n_results, k=config.RRF_K):
+    """
+    Reciprocal rank fusion of several hit lists ((score, segment, chunk index),
+    best first): a chunk scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    fused = {}
+    for hits in rankings:
+        for rank, (_, segment, i) in enumerate(hits, start=1):
+            key = (segment.doc_id, i)
+            score = fused[key][0] if key in fused else 0.0
+            fused[key] = (score + 1 / (k + rank), segment, i)
+    return sorted(fused.values(), key=lambda h: -h[0])[:n_results]
+
+def mmr(query, passages, k, diversity=config.MMR_DIVERSITY):
+    """
+    Maximal marginal relevance: repeatedly picks the passage most similar to
+    the query and least similar to those already picked. Without a query
+    vector (or with passages that have none) the top k by score are kept.
+    """
+    if len(passages) <= 1:
+        return list(passages)
+    if query is None or any(p["vector"] is None or p["vector"].shape != query.shape for p in passages):
+        return sorted(passages, key=lambda p: -p["score"])[:k]
+    vectors = np.vstack([p["vector"] for p in passages])
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    chosen = [int(np.argmax(relevance))]
+    while len(chosen) < min(k, len(passages)):
+        redundancy = similarity[:, chosen].max(axis=1)
+        gain = (1 - diversity) * relevance - diversity * redundancy
+        gain[chosen] = -np.inf
+        chosen.append(int(np.argmax(gain)))
+    return [passages[i] for i in chosen]
+
+def fit_budget(passages, max_chars):
+    """
+    Keeps the best passages that fit in max_chars; the first one that doesn't is cut.
+    """
+    kept, used = [], 0
+    for p in sorted(passages, key=lambda p: -p["score"]):
+        room = max_chars - used
+        if room <= 0:
+            break
+        if len(p["text"]) > room:
+            p = dict(p, text=p["text"][:room].rsplit(" ", 1)[0] + "...")
+        kept.append(p)
+        used += len(p["text"])
+    return kept
+
+def build_context(query, hits, n_results, max_chars=config.CONTEXT_MAX_CHARS):
+    """
+    Merged, diversified, budgeted passage texts in document order.
+    """
+    passages = mmr(query, merge_adjacent(hits), n_results)
+    passages = fit_budget(passages, max_chars)
+    order = {}
+    for _, segment, _ in hits:
+        order.setdefault(segment.doc_id, len(order))
+    passages.sort(key=lambda p: (order[p["segment"].doc_id], p["start"]))
+    return [p["text"] for p in passages]
@@ -0,0 +1,197 @@
+"""
+Ollama-aware ordering of council calls.
+
+Firing every member at once on a box that cannot hold them all makes Ollama
+evict and reload models between requests. The scheduler plans a run from the
+host's free memory, the models Ollama already has loaded (/api/ps) and the
+model sizes from the registry: resident models go first, a warm judge keeps
+its memory reserved, and a member only starts once its model fits next to the
+ones in use.
+"""
+import asyncio
+import os
+from urllib.parse import urlparse
+import config
+from async_runtime import runtime
+from host_pool import host_pool
+from model_registry import _get
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "0.0.0.0", "::1")
+
+def host_memory():
+    """
+    Available memory on this machine in bytes, or None when unknown.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def _is_local(host):
+    if not host:
+        return True
+    return (urlparse(host if "://" in host else f"http://{host}").hostname or "") in LOCAL_HOSTS
+
+class Schedule:
+    """
+    Admission plan for one council run. Members are admitted in `order`; each
+    holds its model's size against `budget` while running. One member always
+    runs, even if it alone exceeds the budget.
+    """
+    def __init__(self, order, sizes, budget, resident, reserved=0):
+        self.order = order
+        self.sizes = sizes
+        self.budget = budget
+        self.resident = resident
+        self.reserved = reserved
+        self.loads_expected = [m for m in order if m not in resident]
+        self._next = 0
+        self._running = {}  # model -> active calls
+        self._in_use = 0
+        self._skipped = set()
+        self._cond = asyncio.Condition()
+
+    def summary(self):
+        return {
+            "order": self.order,
+            "resident": sorted(self.resident),
+            "budget_bytes": self.budget,
+            "reserved_bytes": self.reserved,
+            "loads_expected": len(self.loads_expected)
+        }
+
+    def _fits(self, model):
+        if self.budget is None or not self._running or model in self._running:
+            return True
+        return self._in_use + self.sizes.get(model, 0) + self.reserved <= self.budget
+
+    def _advance(self):
+        while self._next < len(self.order) and self.order[self._next] in self._skipped:
+            self._next += 1
+
+    def slot(self, model):
+        return _Slot(self, model)
+
+class _Slot:
+    def __init__(self, schedule, model):
+        self.schedule = schedule
+        self.model = model
+
+    async def __aenter__(self):
+        s = self.schedule
+        position = s.order.index(self.model)
+        async with s._cond:
+            try:
+                # Strict plan order: wait for every earlier member to be admitted, then for memory
+                await s._cond.wait_for(lambda: s._next >= position and s._fits(self.model))
+            except asyncio.CancelledError:
+                # A cancelled waiter (quorum/deadline) must not block the ones behind it
+                s._skipped.add(self.model)
+                s._advance()
+                s._cond.notify_all()
+                raise
+            if self.model not in s._running:
+                s._in_use += s.sizes.get(self.model, 0)
+            s._running[self.model] = s._running.get(self.model, 0) + 1
+            s._skipped.add(self.model)
+            s._advance()
+            s._cond.notify_all()
+        return self
+
+    async def skip(self):
+        """
+        Gives up the slot without running (answer served from the response
+        cache), so the members planned after this one aren't held behind it.
+        """
+        s = self.schedule
+        async with s._cond:
+            s._skipped.add(self.model)
+            s._advance()
+            s._cond.notify_all()
+
+    async def __aexit__(self, *exc):
+        s = self.schedule
+        async with s._cond:
+            s._running[self.model] -= 1
+            if not s._running[self.model]:
+                del s._running[self.model]
+                s._in_use -= s.sizes.get(self.model, 0)
+            s._cond.notify_all()
+
+class ModelScheduler:
+    """
+    Builds a Schedule per council run from live Ollama state.
+    """
+    def __init__(self, pool=host_pool, memory_budget=config.SCHEDULER_MEMORY_BUDGET):
+        self.pool = pool
+        self.memory_budget = memory_budget
+
+    async def loaded_models(self):
+        """
+        {model: bytes in memory} as reported by /api/ps on every healthy host,
+        or None if no host can be asked. Also records each host's loaded set for routing.
+        """
+        hosts = [h for h in self.pool.hosts if h.available()]
+
+        async def ps(host):
+            response = await runtime.get_client(host.url).ps()
+            host.loaded = {_get(m, 'model') or _get(m, 'name') for m in _get(response, 'models') or []}
+            return {_get(m, 'model') or _get(m, 'name'): _get(m, 'size') or 0 for m in _get(response, 'models') or []}
+
+        loaded = None
+        for host, result in zip(hosts, await asyncio.gather(*(ps(h) for h in hosts), return_exceptions=True)):
+            if isinstance(result, Exception):
+                print(f"Error fetching loaded models from {host.label}: {result}")
+                continue
+            loaded = loaded or {}
+            for model, size in result.items():
+                loaded[model] = max(size, loaded.get(model, 0))
+        return loaded
+
+    def budget(self, loaded):
+        """
+        Bytes the council may keep loaded at once: the configured budget, or free
+        memory plus what loaded models already hold (Ollama can reclaim it).
+        Unknown for remote hosts without a configured budget.
+        """
+        if self.memory_budget:
+            return self.memory_budget
+        if len(self.pool.hosts) > 1 or not _is_local(self.pool.host):
+            return None
+        available = host_memory()
+        if available is None:
+            return None
+        return int((available + sum(loaded.values())) * config.SCHEDULER_MEMORY_FRACTION)
+
+    async def plan(self, models, judge_model=None):
+        if not config.SCHEDULER_ENABLED:
+            return Schedule(list(models), {}, None, set())
+        loaded = await self.loaded_models()
+        if loaded is None:
+            # No information: keep the old all-at-once behaviour
+            return Schedule(list(models), {}, None, set())
+
+        listed = {m["name"]: m["size"] for m in await asyncio.to_thread(self.pool.models)}
+        # In-memory size is larger than the file on disk (KV cache, runtime buffers)
+        sizes = {m: loaded.get(m) or int(listed.get(m, 0) * config.SCHEDULER_SIZE_OVERHEAD) for m in (set(models) | {judge_model}) - {None}}
+        budget = self.budget(loaded)
+        resident = set(models) & set(loaded)
+
+        # Resident models first; the judge, if it is also a member, last so it is still loaded for the synthesis
+        order = sorted(dict.fromkeys(models), key=lambda m: (m == judge_model, m not in resident))
+
+        reserved = 0
+        if budget is not None and judge_model in loaded and judge_model not in models:
+            # Keep a warm judge loaded, unless that leaves no room for the largest member
+            if budget - sizes[judge_model] >= max((sizes[m] for m in models), default=0):
+                reserved = sizes[judge_model]
+        return Schedule(order, sizes, budget, resident, reserved)
+
+scheduler = ModelScheduler()
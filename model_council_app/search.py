@@ -0,0 +1,124 @@
+import numpy as np
+import config
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first. O(n) selection with
+    argpartition, then only the k winners are sorted.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+def dot_rows(matrix, query, scales=None, block=2048):
+    """
+    matrix @ query for float32, float16 or int8 rows, times per-row scales if
+    given. Narrow rows are widened to float32 one cache-sized block at a
+    time, so a quantized matrix is never decoded whole.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if matrix.dtype == np.float32:
+        scores = matrix @ query
+    else:
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), block):
+            scores[start:start + block] = matrix[start:start + block].astype(np.float32) @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+def widen_rows(rows, scales=None):
+    """
+    float32 copy of float32, float16 or int8 rows, times per-row scales if given.
+    """
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows * scales[:, None] if scales is not None else rows
+
+class ExactSearch:
+    """
+    Brute-force cosine search over a float32 matrix of normalized rows.
+    """
+    name = "exact"
+
+    def __init__(self, matrix, scales=None):
+        self.matrix = np.ascontiguousarray(widen_rows(matrix, scales))
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def search(self, query, k):
+        scores = self.matrix @ np.asarray(query, dtype=np.float32)
+        indices = top_k(scores, k)
+        return indices, scores[indices]
+
+class IVFSearch:
+    """
+    Inverted-file ANN index in pure NumPy. Rows are clustered with spherical
+    k-means; a query only scores the rows of its nprobe closest clusters.
+    More probes means higher recall and higher latency. float16 and int8 rows
+    (with their scales) are kept in that precision and widened per block.
+    """
+    name = "ivf"
+
+    def __init__(self, matrix, n_lists=None, nprobe=config.IVF_NPROBE, iterations=10, sample_size=50000, seed=0, scales=None):
+        matrix = np.asarray(matrix)
+        if matrix.dtype not in (np.float16, np.int8):
+            matrix = matrix.astype(np.float32, copy=False)
+        n = len(matrix)
+        self.nprobe = nprobe
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+
+        rng = np.random.default_rng(seed)
+        sampled = rng.choice(n, size=min(n, max(sample_size, self.n_lists)), replace=False)
+        sample = widen_rows(matrix[sampled], scales[sampled] if scales is not None else None)
+        self.centroids = self._train(sample, iterations, rng)
+
+        # Store rows grouped by cluster so each probe is one contiguous slice
+        assignment = self._assign(matrix, scales)
+        self.order = np.argsort(assignment, kind='stable')
+        self.matrix = np.ascontiguousarray(matrix[self.order])
+        self.scales = scales[self.order] if scales is not None else None
+        counts = np.bincount(assignment, minlength=self.n_lists)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def _train(self, sample, iterations, rng):
+        centroids = sample[rng.choice(len(sample), size=self.n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty clusters with random sample rows
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = sums / norms
+        return centroids.astype(np.float32)
+
+    def _assign(self, matrix, scales=None, batch=65536):
+        assignment = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), batch):
+            rows = widen_rows(matrix[start:start + batch], scales[start:start + batch] if scales is not None else None)
+            assignment[start:start + batch] = np.argmax(rows @ self.centroids.T, axis=1)
+        return assignment
+
+    def search(self, query, k, nprobe=None):
+        query = np.asarray(query, dtype=np.float32)
+        probes = top_k(self.centroids @ query, nprobe or self.nprobe)
+        rows = np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes])
+        scores = dot_rows(self.matrix[rows], query, self.scales[rows] if self.scales is not None else None)
+        best = top_k(scores, k)
+        return self.order[rows[best]], scores[best]
+
+BACKENDS = {"exact": ExactSearch, "ivf": IVFSearch}
+
+def build_backend(name, matrix, scales=None):
+    return BACKENDS[name](matrix, scales=scales)
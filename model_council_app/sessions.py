@@ -0,0 +1,178 @@
+"""
+Per-session document state.
+
+Each browser (cookie) or API client (X-Session-Id header) works on its own
+documents, so one analyst's upload no longer replaces what another is
+querying. Session indexes live on disk under SESSIONS_PATH/<id>; loaded ones
+count against SESSION_MEMORY_BUDGET and the least recently used idle ones are
+unloaded when it is exceeded (they reload from disk on their next request).
+Requests without a session id use the default session, backed by
+VECTOR_DB_PATH as before.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import config
+from rag import VectorStore
+
+DEFAULT_SESSION = "default"
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+STATE_FILE = "session.json"
+
+class SessionState:
+    """
+    Documents of one session (what used to be the app's single GlobalState).
+    """
+    def __init__(self, session_id=DEFAULT_SESSION, index_path=config.VECTOR_DB_PATH, state_path=None):
+        self.id = session_id
+        self.state_path = state_path
+        # Persistent index: documents from previous runs are available right away
+        self.vector_store = VectorStore(index_path)
+        documents = self.vector_store.documents()
+        self.doc_loaded = bool(documents)
+        self.filename = documents[-1]["name"] if documents else None
+        self.full_text = None
+        if state_path and os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self.full_text = saved.get("full_text")
+            self.filename = saved.get("filename") or self.filename
+        self.last_used = time.time()
+        self.pins = 0  # requests and ingest jobs using the session; pinned sessions are never unloaded
+
+    def memory_bytes(self):
+        return self.vector_store.memory_bytes() + len(self.full_text or "")
+
+    def save(self):
+        """
+        Writes what the index doesn't keep (the full-text fallback and the
+        current filename) next to it. Called whenever they change, so a restart
+        doesn't lose them.
+        """
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"full_text": self.full_text, "filename": self.filename}, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+class SessionManager:
+    def __init__(self, path=config.SESSIONS_PATH, memory_budget=config.SESSION_MEMORY_BUDGET):
+        self.path = path
+        self.memory_budget = memory_budget
+        self.default = SessionState()
+        self._sessions = OrderedDict()  # id -> SessionState, least recently used first
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    @staticmethod
+    def valid_id(session_id):
+        return bool(session_id) and SESSION_ID.match(session_id) is not None
+
+    def _load(self, session_id):
+        if not self.path:
+            return SessionState(session_id, None)
+        directory = os.path.join(self.path, session_id)
+        return SessionState(session_id, os.path.join(directory, "index"), os.path.join(directory, STATE_FILE))
+
+    def get(self, session_id):
+        """
+        The session's state, loaded from disk (or created) if needed. None or an
+        invalid id gives the default session.
+        """
+        if not config.SESSIONS_ENABLED or not self.valid_id(session_id) or session_id == DEFAULT_SESSION:
+            state = self.default
+        else:
+            with self._lock:
+                state = self._sessions.get(session_id)
+                if state is None:
+                    state = self._sessions[session_id] = self._load(session_id)
+                self._sessions.move_to_end(session_id)
+        state.last_used = time.time()
+        return state
+
+    def acquire(self, session_id):
+        """
+        get() and pin the session, so it stays loaded until release().
+        """
+        with self._lock:
+            state = self.get(session_id)
+            state.pins += 1
+        return state
+
+    def pin(self, state):
+        # For work that outlives the request holding the session (e.g. an ingest job)
+        with self._lock:
+            state.pins += 1
+
+    def release(self, state):
+        with self._lock:
+            state.pins -= 1
+        self.enforce_budget()
+
+    def enforce_budget(self):
+        """
+        Unloads idle sessions, least recently used first, until the loaded ones
+        fit in the memory budget. The default session is never unloaded.
+        """
+        if not self.memory_budget:
+            return
+        with self._lock:
+            usage = {sid: state.memory_bytes() for sid, state in self._sessions.items()}
+            used = sum(usage.values()) + self.default.memory_bytes()
+            for sid, state in list(self._sessions.items()):
+                if used <= self.memory_budget:
+                    break
+                if state.pins:
+                    continue
+                self._evict(state)
+                used -= usage[sid]
+
+    def _evict(self, state):
+        state.save()
+        del self._sessions[state.id]
+        self.evictions += 1
+        if not self.path:
+            print(f"Session {state.id} dropped to stay within the memory budget (no SESSIONS_PATH to keep it on disk)")
+
+    def _on_disk(self):
+        if not self.path or not os.path.isdir(self.path):
+            return []
+        return [d for d in os.listdir(self.path) if self.valid_id(d)]
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            loaded = [self.default] + list(self._sessions.values())
+            sessions = [{
+                "id": state.id,
+                "memory_bytes": state.memory_bytes(),
+                "documents": len(state.vector_store.documents()),
+                "chunks": len(state.vector_store.index),
+                "idle_s": now - state.last_used,
+                "pinned": state.pins > 0
+            } for state in loaded]
+            unloaded = [sid for sid in self._on_disk() if sid not in self._sessions]
+        return {
+            "memory_budget": self.memory_budget,
+            "memory_used": sum(s["memory_bytes"] for s in sessions),
+            "loaded": sessions,
+            "unloaded": len(unloaded),
+            "evictions": self.evictions
+        }
+
+    def public_stats(self, state):
+        """
+        stats() as served to clients: totals only, plus the caller's own session.
+        A session id is what gives access to its documents, so other sessions'
+        ids are never listed.
+        """
+        stats = self.stats()
+        own = next((s for s in stats["loaded"] if s["id"] == state.id), None)
+        return {**stats, "loaded": len(stats["loaded"]), "session": own}
+
+sessions = SessionManager()
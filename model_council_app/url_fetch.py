@@ -0,0 +1,167 @@
+"""
+Web page fetching for /api/upload_url.
+
+Every fetch goes through one requests.Session whose connection pool is sized
+for URL_FETCH_WORKERS, so pages of the same site reuse their connections, and
+through an on-disk HTTP cache under URL_CACHE_PATH: a page fetched before is
+revalidated with If-None-Match / If-Modified-Since and read back from disk on
+304 Not Modified instead of being downloaded again. The cache is bounded by
+URL_CACHE_MAX_BYTES, least recently used pages first.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+import config
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+class UrlCache:
+    """
+    One <sha256(url)>.body file per page plus a .json with its validators.
+    Pages without ETag or Last-Modified can't be revalidated and aren't kept.
+    A page's last use is the mtime of its .json, touched on every hit.
+    """
+    def __init__(self, path, max_bytes=config.URL_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk, counted on the first write
+
+    def _files(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, digest + ".json"), os.path.join(self.path, digest + ".body")
+
+    def get(self, url):
+        """
+        (meta, body) of a cached page, or None.
+        """
+        meta_path, body_path = self._files(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+            os.utime(meta_path)
+            return meta, body
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, response):
+        meta = {
+            "url": url,
+            "etag": response.headers.get('ETag'),
+            "last_modified": response.headers.get('Last-Modified'),
+            "content_type": response.headers.get('Content-Type', '')
+        }
+        if not meta["etag"] and not meta["last_modified"]:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        meta_path, body_path = self._files(url)
+        # Body first: a meta file always points at a complete body
+        payloads = ((body_path, 'wb', response.content), (meta_path, 'w', json.dumps(meta)))
+        for path, mode, payload in payloads:
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, mode) as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        self._prune(sum(len(payload) for _, _, payload in payloads))
+
+    def _entries(self):
+        """
+        (last use, bytes, meta path, body path) of every cached page.
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.path, name)
+            body_path = meta_path[:-len(".json")] + ".body"
+            try:
+                stat = os.stat(meta_path)
+                entries.append((stat.st_mtime, stat.st_size + os.path.getsize(body_path), meta_path, body_path))
+            except OSError:
+                continue
+        return entries
+
+    def _prune(self, added):
+        """
+        Removes the least recently used pages once the cache exceeds max_bytes.
+        The directory is only listed on the first write and when over the limit.
+        """
+        if not self.max_bytes:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _, _ in self._entries())
+            else:
+                self._size += added  # overcounts a rewritten page; the listing below corrects it
+            if self._size <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            self._size = sum(size for _, size, _, _ in entries)
+            for _, size, meta_path, body_path in entries:
+                if self._size <= self.max_bytes:
+                    break
+                # Meta first: a body without its meta is never read
+                for path in (meta_path, body_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._size -= size
+
+class Fetcher:
+    def __init__(self, cache_path=config.URL_CACHE_PATH, workers=config.URL_FETCH_WORKERS, timeout=config.URL_FETCH_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.cache = UrlCache(cache_path) if cache_path else None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="url-fetch")
+
+    def fetch(self, url):
+        """
+        {"url", "content" (bytes), "content_type", "cached"} for one page.
+        Raises on network errors and HTTP error statuses.
+        """
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            meta = cached[0]
+            if meta.get("etag"):
+                headers['If-None-Match'] = meta["etag"]
+            if meta.get("last_modified"):
+                headers['If-Modified-Since'] = meta["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached:
+            meta, body = cached
+            return {"url": url, "content": body, "content_type": meta.get("content_type", ''), "cached": True}
+        response.raise_for_status()
+        if self.cache:
+            self.cache.put(url, response)
+        return {"url": url, "content": response.content, "content_type": response.headers.get('Content-Type', ''), "cached": False}
+
+    def map(self, fn, urls):
+        """
+        Runs fn(url) for every url in the fetch pool; yields (url, result, error)
+        as each one finishes, so callers can use a page while others are in flight.
+        """
+        futures = {self._pool.submit(fn, url): url for url in urls}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+        finally:
+            for future in futures:
+                future.cancel()
+
+fetcher = Fetcher()
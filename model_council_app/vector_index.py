@@ -0,0 +1,371 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+import numpy as np
+import config
+import bm25
+from search import build_backend, top_k, dot_rows
+
+MANIFEST = "manifest.json"
+# Storage precision of a segment's vectors -> file suffix. int8 rows also keep
+# one float32 scale each (<id>.scale.f32): row ~= int8 values * scale.
+STORAGE = {"float32": ".f32", "float16": ".f16", "int8": ".i8"}
+
+def encode_vectors(embeddings, dtype):
+    """
+    (stored rows, per-row scales or None) of float32 embeddings in the given precision.
+    """
+    if dtype == "float32":
+        return embeddings, None
+    if dtype == "float16":
+        return embeddings.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(embeddings).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        stored = np.rint(embeddings / scales[:, None]).astype(np.int8)
+        return stored, scales.astype(np.float32)
+    raise ValueError(f"Unknown storage precision {dtype!r} (expected one of {', '.join(STORAGE)})")
+
+class Segment:
+    """
+    Embeddings, chunk text and BM25 index of one document. Segments are written
+    once and never modified; on disk they are memory-mapped lazily. A document
+    ingested without an embedding model has no embeddings (dim is None) and is
+    only found by lexical search. Vectors are kept in the precision the segment
+    was written with (meta "dtype"); chunk text is one UTF-8 buffer plus byte
+    offsets, in memory as on disk.
+    """
+    def __init__(self, meta, directory=None, vectors=None, scales=None, text=None, offsets=None, lexical=None):
+        self.meta = meta
+        self.directory = directory
+        self._vectors = vectors
+        self._scales = scales
+        self._lexical = lexical
+        self._offsets = offsets
+        self._text = text
+
+    @property
+    def doc_id(self):
+        return self.meta["id"]
+
+    @property
+    def dtype(self):
+        # Segments written before storage precisions existed are float32
+        return self.meta.get("dtype", "float32")
+
+    def __len__(self):
+        return self.meta["chunks"]
+
+    def _path(self, suffix):
+        return os.path.join(self.directory, self.doc_id + suffix)
+
+    @property
+    def vectors(self):
+        """
+        Stored rows, in the segment's precision.
+        """
+        if self.meta["dim"] is None:
+            return np.zeros((self.meta["chunks"], 0), dtype=np.float32)
+        if self._vectors is None:
+            self._vectors = np.memmap(self._path(STORAGE[self.dtype]), dtype=np.dtype(self.dtype), mode='r',
+                                      shape=(self.meta["chunks"], self.meta["dim"]))
+        return self._vectors
+
+    @property
+    def scales(self):
+        if self.dtype != "int8" or self.meta["dim"] is None:
+            return None
+        if self._scales is None:
+            self._scales = np.memmap(self._path(".scale.f32"), dtype=np.float32, mode='r', shape=(self.meta["chunks"],))
+        return self._scales
+
+    @property
+    def embeddings(self):
+        """
+        float32 rows (decoded from float16/int8 storage, so a copy for those).
+        """
+        vectors = self.vectors
+        if self.dtype == "float32" or not len(vectors):
+            return vectors
+        embeddings = vectors.astype(np.float32)
+        if self.scales is not None:
+            embeddings *= self.scales[:, None]
+        return embeddings
+
+    def vector(self, i):
+        vector = np.asarray(self.vectors[i], dtype=np.float32)
+        return vector * self.scales[i] if self.scales is not None else vector
+
+    def scores(self, query):
+        """
+        Dot product of every row with a float32 query, without decoding the whole matrix.
+        """
+        return dot_rows(self.vectors, query, self.scales)
+
+    def chunk(self, i):
+        if self._offsets is None:
+            self._offsets = np.load(self._path(".off.npy"), mmap_mode='r')
+            self._text = np.memmap(self._path(".txt"), dtype=np.uint8, mode='r') if self._offsets[-1] else b""
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._text[start:end]).decode('utf-8')
+
+    def chunks(self):
+        return [self.chunk(i) for i in range(len(self))]
+
+    def memory_bytes(self):
+        """
+        Bytes this segment holds in memory. Memory-mapped files count in full
+        once opened, so this is an upper bound for on-disk segments.
+        """
+        total = sum(a.nbytes for a in (self._vectors, self._scales, self._offsets) if a is not None)
+        total += len(self._text) if self._text is not None else 0
+        return total + (self._lexical.memory_bytes() if self._lexical is not None else 0)
+
+    @property
+    def lexical(self):
+        """
+        The segment's BM25 index. Segments written before it existed get one
+        built from their text on first use (and saved).
+        """
+        if self._lexical is None:
+            path = self._path(".bm25.npz") if self.directory else None
+            if path and os.path.exists(path):
+                self._lexical = bm25.LexicalIndex.load(path)
+            else:
+                self._lexical = bm25.LexicalIndex.build(self.chunks())
+                if path:
+                    try:
+                        self._lexical.save(path)
+                    except OSError as e:
+                        print(f"Could not save the lexical index of {self.doc_id}: {e}")
+        return self._lexical
+
+    def remove_files(self):
+        self._vectors = self._scales = self._offsets = self._text = self._lexical = None
+        for suffix in (*STORAGE.values(), ".scale.f32", ".txt", ".off.npy", ".bm25.npz"):
+            try:
+                os.remove(self._path(suffix))
+            except OSError:
+                pass
+
+class SegmentWriter:
+    """
+    Builds one segment incrementally, so ingestion never holds a whole
+    document in memory. Nothing is visible to searches until commit().
+    """
+    def __init__(self, index, name, model):
+        self.index = index
+        self.meta = {
+            "id": uuid.uuid4().hex[:12],
+            "name": name,
+            "model": model,
+            "dim": None,
+            "dtype": index.dtype,
+            "chunks": 0,
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.segment = Segment(self.meta, index.path)
+        self._offsets = [0]
+        self._vectors = []
+        self._scales = []
+        self._text = bytearray()
+        self._lexical = bm25.LexicalBuilder() if config.BM25_ENABLED else None
+        self._files = None
+
+    def append(self, chunks, embeddings=None):
+        """
+        Appends chunks with their embeddings, or without any (lexical-only
+        document, when there is no embedding model).
+        """
+        if not len(chunks):
+            return
+        vectors = scales = None
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            self.meta["dim"] = int(embeddings.shape[1])
+            vectors, scales = encode_vectors(embeddings, self.meta["dtype"])
+        self.meta["chunks"] += len(chunks)
+        if self._lexical is not None:
+            self._lexical.add(chunks)
+        if not self.index.path:
+            if vectors is not None:
+                self._vectors.append(vectors)
+                if scales is not None:
+                    self._scales.append(scales)
+            for chunk in chunks:
+                self._text += chunk.encode('utf-8')
+                self._offsets.append(len(self._text))
+            return
+
+        if self._files is None:
+            os.makedirs(self.index.path, exist_ok=True)
+            suffixes = {"vectors": STORAGE[self.meta["dtype"]], "text": ".txt"}
+            if self.meta["dtype"] == "int8":
+                suffixes["scales"] = ".scale.f32"
+            self._files = {name: open(self.segment._path(suffix), 'wb') for name, suffix in suffixes.items()}
+        if vectors is not None:
+            vectors.tofile(self._files["vectors"])
+            if scales is not None:
+                scales.tofile(self._files["scales"])
+        for chunk in chunks:
+            encoded = chunk.encode('utf-8')
+            self._files["text"].write(encoded)
+            self._offsets.append(self._offsets[-1] + len(encoded))
+
+    def commit(self):
+        """
+        Publishes the segment. Returns its document id, or None if it is empty.
+        """
+        if not self.meta["chunks"]:
+            self.abort()
+            return None
+        lexical = self._lexical.freeze() if self._lexical is not None else None
+        offsets = np.array(self._offsets, dtype=np.int64)
+        if self.index.path:
+            for f in self._files.values():
+                f.close()
+            np.save(self.segment._path(".off.npy"), offsets)
+            if lexical is not None:
+                lexical.save(self.segment._path(".bm25.npz"))
+                self.segment._lexical = lexical
+        else:
+            vectors = np.vstack(self._vectors) if self._vectors else None
+            scales = np.concatenate(self._scales) if self._scales else None
+            self.segment = Segment(self.meta, vectors=vectors, scales=scales, text=bytes(self._text),
+                                   offsets=offsets, lexical=lexical)
+        self.index._publish(self.segment)
+        return self.meta["id"]
+
+    def abort(self):
+        if self._files is not None:
+            for f in self._files.values():
+                f.close()
+            self.segment.remove_files()
+        self._files = None
+
+class VectorIndex:
+    """
+    Multi-document vector index. With a path, each document is an append-only
+    segment on disk and the manifest lists the live documents:
+      manifest.json   per-document metadata (id, name, model, dim, dtype, chunks, created)
+      <id>.f32        normalized embeddings: float32, or <id>.f16 / <id>.i8 (see EMBED_STORAGE_DTYPE)
+      <id>.scale.f32  per-row scale of int8 embeddings
+      <id>.txt        chunk text (UTF-8, back to back)
+      <id>.off.npy    byte offsets of each chunk in <id>.txt
+      <id>.bm25.npz   BM25 postings of the chunks
+    Opening only reads the manifest. Without a path everything stays in memory.
+    """
+    def __init__(self, path=None, backend=config.SEARCH_BACKEND, dtype=config.EMBED_STORAGE_DTYPE):
+        self.path = path
+        self.backend = backend
+        if dtype not in STORAGE:
+            raise ValueError(f"Unknown storage precision {dtype!r} (expected one of {', '.join(STORAGE)})")
+        self.dtype = dtype  # precision of the documents added from now on
+        self.segments = []
+        self._ann = None  # (doc ids, backend) built over the current segments
+        self._lock = threading.Lock()
+        if path and os.path.exists(os.path.join(path, MANIFEST)):
+            with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.segments = [Segment(meta, path) for meta in manifest["documents"]]
+
+    def _write_manifest(self):
+        tmp = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"documents": [s.meta for s in self.segments]}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+    def documents(self):
+        return [dict(s.meta) for s in self.segments]
+
+    def memory_bytes(self):
+        # The approximate index keeps its own (reordered) copy of the vectors
+        ann = self._ann[1].matrix.nbytes if self._ann is not None else 0
+        return sum(s.memory_bytes() for s in self.segments) + ann
+
+    def writer(self, name, model):
+        """
+        Starts a new document whose chunks are appended as they are embedded.
+        """
+        return SegmentWriter(self, name, model)
+
+    def add(self, name, chunks, embeddings=None, model=None):
+        """
+        Adds one document. Existing segments are left untouched.
+        """
+        writer = self.writer(name, model)
+        writer.append(chunks, embeddings)
+        return writer.commit()
+
+    def _publish(self, segment):
+        with self._lock:
+            self.segments = self.segments + [segment]
+            if self.path:
+                self._write_manifest()
+
+    def delete(self, doc_id):
+        with self._lock:
+            removed = [s for s in self.segments if s.doc_id == doc_id]
+            if not removed:
+                return False
+            self.segments = [s for s in self.segments if s.doc_id != doc_id]
+            if self.path:
+                self._write_manifest()
+                for s in removed:
+                    s.remove_files()
+        return True
+
+    def clear(self):
+        for s in list(self.segments):
+            self.delete(s.doc_id)
+
+    def search(self, query_embedding, n_results, model=None):
+        """
+        Cosine search over every document embedded with the given model.
+        Returns (score, segment, chunk index) tuples, best first.
+        """
+        segments = [s for s in self.segments
+                    if (model is None or s.meta["model"] == model) and s.meta["dim"] == len(query_embedding)]
+        if not segments:
+            return []
+
+        sizes = [len(s) for s in segments]
+        starts = np.cumsum([0] + sizes)
+
+        if self.backend != "exact" and starts[-1] >= config.IVF_MIN_VECTORS:
+            indices, scores = self._ann_backend(segments).search(query_embedding, n_results)
+        else:
+            scores = np.concatenate([s.scores(query_embedding) for s in segments])
+            indices = top_k(scores, n_results)
+            scores = scores[indices]
+
+        owners = np.searchsorted(starts, indices, side='right') - 1
+        return [(float(score), segments[o], int(i - starts[o])) for score, i, o in zip(scores, indices, owners)]
+
+    def search_lexical(self, query, n_results):
+        """
+        BM25 search over every document, whatever its embedding model.
+        Returns (score, segment, chunk index) tuples, best first.
+        """
+        return bm25.search([(s, s.lexical) for s in self.segments], query, n_results)
+
+    def _ann_backend(self, segments):
+        """
+        Approximate index over the given segments, rebuilt when documents change.
+        """
+        key = tuple(s.doc_id for s in segments)
+        with self._lock:
+            if self._ann is None or self._ann[0] != key:
+                if len({s.dtype for s in segments}) == 1:
+                    # One storage precision: the index keeps it rather than a decoded float32 copy
+                    matrix = np.vstack([s.vectors for s in segments])
+                    scales = np.concatenate([s.scales for s in segments]) if segments[0].scales is not None else None
+                else:
+                    matrix, scales = np.vstack([s.embeddings for s in segments]), None
+                self._ann = (key, build_backend(self.backend, matrix, scales))
+            return self._ann[1]
@@ -0,0 +1,35 @@
+import sys
+import os
+import asyncio
+import threading
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from async_runtime import AsyncRuntime
+
+def test_closing_the_stream_with_a_full_queue_closes_the_producer():
+    runtime = AsyncRuntime()
+    closed = threading.Event()
+
+    async def endless():
+        try:
+            n = 0
+            while True:
+                yield n
+                n += 1
+        finally:
+            closed.set()
+
+    events = runtime.stream(endless(), maxsize=1)
+    assert next(events) == 0
+    # The producer is now blocked on the full queue; the client goes away
+    events.close()
+    assert closed.wait(2)
+    runtime.run(asyncio.sleep(0.05))
+    assert runtime.run(_pending()) == 0
+
+async def _pending():
+    current = asyncio.current_task()
+    return sum(1 for t in asyncio.all_tasks() if t is not current and not t.done())
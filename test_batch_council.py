@@ -0,0 +1,65 @@
+import sys
+import os
+import json
+import asyncio
+import tempfile
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+import batch_council
+from council import ModelCouncil
+
+calls = []
+
+async def _fake_query(model_name, prompt, context=None, **kwargs):
+    calls.append((model_name, prompt))
+    await asyncio.sleep(0.01)
+    if prompt == "fail":
+        return {"model": model_name, "response": "Error: boom", "status": "Error"}
+    return {"model": model_name, "response": f"{model_name}: {prompt}", "status": "Success", "elapsed": 0.01, "ttft": 0.005}
+
+async def _fake_synthesis(judge_model, prompt, model_results, council_mode="Padrão", context=None):
+    return f"{judge_model} sums up {len(model_results)} answers"
+
+def _run(rows_path, out_path, **kwargs):
+    rows = batch_council.load_rows(rows_path, models=["a", "b"])
+    original = (ModelCouncil.query_model, ModelCouncil.synthesize_answers)
+    ModelCouncil.query_model = staticmethod(_fake_query)
+    ModelCouncil.synthesize_answers = staticmethod(_fake_synthesis)
+    try:
+        return asyncio.run(batch_council.run_batch(rows, out_path, concurrency=2, **kwargs))
+    finally:
+        ModelCouncil.query_model, ModelCouncil.synthesize_answers = original
+
+def test_batch_groups_by_models_streams_results_and_resumes():
+    directory = tempfile.mkdtemp()
+    rows_path = os.path.join(directory, "prompts.jsonl")
+    out_path = os.path.join(directory, "results.jsonl")
+    with open(rows_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "q1", "prompt": "one"}) + "\n")
+        f.write(json.dumps({"id": "q2", "prompt": "two", "models": ["c"]}) + "\n")
+        f.write(json.dumps({"id": "q3", "prompt": "fail"}) + "\n")
+        f.write(json.dumps({"prompt": ""}) + "\n")
+
+    rows = batch_council.load_rows(rows_path, models=["a", "b"])
+    assert [r["id"] for r in batch_council.group_rows(rows)] == ["q1", "q3", "line-4", "q2"]
+
+    summary = _run(rows_path, out_path)
+    assert summary["rows"] == 4 and summary["errors"] == 2
+    assert summary["models"]["a"]["answers"] == 1 and summary["models"]["a"]["errors"] == 1
+    with open(out_path, encoding="utf-8") as f:
+        records = {r["id"]: r for r in map(json.loads, f)}
+    assert records["q1"]["synthesis"] == "a sums up 2 answers"
+    assert records["q2"]["judge"] == "c" and records["q3"]["synthesis_status"] == "Empty"
+
+    # An interrupted write leaves half a line: it is dropped, finished rows are skipped
+    with open(out_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "q9", "sta')
+    calls.clear()
+    summary = _run(rows_path, out_path)
+    assert summary["rows"] == 0 and summary["skipped"] == 4 and calls == []
+
+    summary = _run(rows_path, out_path, retry_errors=True)
+    assert summary["rows"] == 2 and sorted(p for _, p in calls) == ["fail", "fail"]
@@ -0,0 +1,60 @@
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+import bm25
+import retrieval
+from vector_index import VectorIndex
+
+def test_tokenizer_folds_accents_and_drops_stopwords():
+    assert bm25.tokenize("A Atenção é da Gestão, não do TI") == ["atencao", "gestao", "ti"]
+
+def test_lexical_only_document_is_searchable_after_reopening():
+    path = tempfile.mkdtemp()
+    index = VectorIndex(path)
+    index.add("contrato.txt", [
+        "O prazo de entrega do projeto é de seis meses.",
+        "A multa por atraso é de dez por cento do valor.",
+        "Pagamento em três parcelas após a aprovação.",
+    ])
+
+    reopened = VectorIndex(path)
+    assert reopened.documents()[0]["dim"] is None
+    hits = reopened.search_lexical("Qual é a MULTA por atraso?", 3)
+    assert [segment.chunk(i) for _, segment, i in hits] == ["A multa por atraso é de dez por cento do valor."]
+    # Accent-insensitive match, and no vector search over a document without embeddings
+    assert reopened.search_lexical("aprovacao", 1)[0][2] == 2
+    assert reopened.search(np.ones(4, dtype=np.float32), 3) == []
+
+def test_rank_fusion_rewards_chunks_found_by_both_rankings():
+    index = VectorIndex()
+    index.add("a.txt", ["x0", "x1", "x2"])
+    segment = index.segments[0]
+    vector_hits = [(0.9, segment, 0), (0.8, segment, 1)]
+    lexical_hits = [(7.0, segment, 1), (5.0, segment, 2)]
+
+    fused = retrieval.fuse([vector_hits, lexical_hits], 3)
+    assert [i for _, _, i in fused] == [1, 0, 2]
+    # Passages without vectors skip MMR and keep the fused order
+    assert retrieval.build_context(None, fused, 2) == ["x0", "x1"]
+
+def test_full_text_fallback_when_nothing_was_indexed():
+    # An embedder is installed but every embed call failed: no segment, BM25 on
+    from council_runs import retrieve_context
+    from sessions import SessionState
+    state = SessionState("fallback", None)
+    state.vector_store.query = lambda prompt, n_results: []
+    state.doc_loaded = True
+    state.full_text = "O projeto Alpha está no prazo."
+    assert retrieve_context(state, "Qual o status do projeto?") == ["O projeto Alpha está no prazo."]
+
+def test_lexical_only_store_has_no_embeddings():
+    from rag import VectorStore
+    store = VectorStore()
+    store.index.add("notas.txt", ["Reunião na segunda.", "Entrega na sexta."])
+    assert store.embeddings is None and len(store.chunks) == 2
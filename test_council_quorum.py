@@ -0,0 +1,144 @@
+import sys
+import os
+import asyncio
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from model_council_app.council import ModelCouncil
+
+DELAYS = {"fast": 0.01, "medium": 0.05, "slow": 5.0}
+
+async def _fake_query(model_name, prompt, context=None, **kwargs):
+    await asyncio.sleep(DELAYS[model_name])
+    return {"model": model_name, "response": model_name, "status": "Success"}
+
+def _events(**kwargs):
+    async def collect():
+        return [e async for e in ModelCouncil.run_council(list(DELAYS), "q", stream=False, **kwargs)]
+    original = ModelCouncil.query_model
+    ModelCouncil.query_model = staticmethod(_fake_query)
+    try:
+        return asyncio.run(collect())
+    finally:
+        ModelCouncil.query_model = original
+
+def test_quorum_cancels_remaining_members():
+    events = _events(quorum=1)
+    assert [e["model"] for e in events if e["type"] == "model_done"] == ["fast"]
+    excluded = events[-1]
+    assert excluded["type"] == "members_excluded" and excluded["answered"] == 1
+    assert sorted((m["model"], m["reason"]) for m in excluded["members"]) == [("medium", "quorum"), ("slow", "quorum")]
+
+def test_deadline_reports_late_members():
+    events = _events(deadline=0.5)
+    assert sorted(e["model"] for e in events if e["type"] == "model_done") == ["fast", "medium"]
+    timeouts = [e for e in events if e["type"] == "model_timeout"]
+    assert timeouts == [{"type": "model_timeout", "model": "slow", "index": 2, "reason": "deadline"}]
+    assert events[-1]["members"] == [{"model": "slow", "reason": "deadline"}]
+
+def test_deadline_does_not_count_time_queued_by_the_scheduler():
+    # Memory for one model at a time: members run one after another
+    from model_council_app.scheduler import Schedule
+    import model_council_app.council as council_module
+
+    async def serialized_plan(models, judge_model=None):
+        return Schedule(list(models), {m: 2 for m in models}, budget=2, resident=set())
+
+    async def slotted_query(model_name, prompt, context=None, slot=None, **kwargs):
+        async with slot:
+            await asyncio.sleep(0.3)
+        return {"model": model_name, "response": model_name, "status": "Success"}
+
+    async def collect(models):
+        return [e async for e in ModelCouncil.run_council(models, "q", stream=False, deadline=0.5)]
+
+    original = (ModelCouncil.query_model, council_module.scheduler.plan)
+    ModelCouncil.query_model = staticmethod(slotted_query)
+    council_module.scheduler.plan = serialized_plan
+    try:
+        events = asyncio.run(collect(["a", "b"]))
+        bounded = asyncio.run(collect(["a", "b", "c"]))
+    finally:
+        ModelCouncil.query_model, council_module.scheduler.plan = original
+    # 0.6s in total, but each member only ran for 0.3s of its 0.5s
+    assert sorted(e["model"] for e in events if e["type"] == "model_done") == ["a", "b"]
+    assert not [e for e in events if e["type"] in ("model_timeout", "members_excluded")]
+
+    # Still queued when the run reaches its deadline: reported late, never admitted
+    assert sorted(e["model"] for e in bounded if e["type"] == "model_done") == ["a", "b"]
+    assert bounded[-1]["members"] == [{"model": "c", "reason": "deadline"}]
+
+def test_same_model_twice_streams_each_member_separately():
+    async def streaming_query(model_name, prompt, context=None, system_prompt=None, on_token=None, **kwargs):
+        for word in (system_prompt[:8], " ok"):
+            on_token(word)
+            await asyncio.sleep(0.01)
+        return {"model": model_name, "response": system_prompt[:8] + " ok", "status": "Success"}
+
+    async def collect():
+        return [e async for e in ModelCouncil.run_council(["llama3", "llama3"], "q", persona_mode="Debate (Opostos)", stream=True)]
+
+    original = ModelCouncil.query_model
+    ModelCouncil.query_model = staticmethod(streaming_query)
+    try:
+        events = asyncio.run(collect())
+    finally:
+        ModelCouncil.query_model = original
+    streamed = {0: "", 1: ""}
+    for e in events:
+        if e["type"] == "model_token":
+            assert e["model"] == "llama3"
+            streamed[e["index"]] += e["delta"]
+    done = {e["index"]: e["result"]["response"] for e in events if e["type"] == "model_done"}
+    assert streamed == done and streamed[0] != streamed[1]
+
+def test_cache_hit_does_not_hold_later_members_in_the_plan():
+    from model_council_app.scheduler import Schedule
+    from model_council_app.response_cache import ResponseCache
+    import model_council_app.council as council_module
+
+    async def serialized_plan(models, judge_model=None):
+        return Schedule(list(models), {m: 2 for m in models}, budget=2, resident=set())
+
+    class Host:
+        label = "stub"
+
+    async def call(model, attempt, can_retry=None):
+        await asyncio.sleep(0.01)
+        return f"{model} answer", {}, Host()
+
+    async def drain(run):
+        return [e async for e in run]
+
+    async def collect(models):
+        run = ModelCouncil.run_council(models, "q", stream=False, use_cache=True, deadline=2)
+        return await asyncio.wait_for(drain(run), timeout=5)
+
+    original = (council_module.scheduler.plan, council_module.host_pool.call, council_module.response_cache)
+    council_module.scheduler.plan = serialized_plan
+    council_module.host_pool.call = call
+    council_module.response_cache = ResponseCache(path=None)
+    try:
+        asyncio.run(collect(["a"]))
+        # "a" comes from the cache and is never admitted; "b", planned after it, still runs
+        events = asyncio.run(collect(["a", "b"]))
+    finally:
+        council_module.scheduler.plan, council_module.host_pool.call, council_module.response_cache = original
+    done = {e["model"]: e["cached"] for e in events if e["type"] == "model_done"}
+    assert done == {"a": True, "b": False}
+
+def test_run_options_are_numbers_clamped_at_zero():
+    from council_runs import parse_run
+    body = {"models": ["a"], "prompt": "q"}
+    run = parse_run({**body, "cache_ttl": "60", "quorum": 2.0, "deadline": -5})
+    assert (run["cache_ttl"], run["quorum"], run["deadline"]) == (60.0, 2, 0)
+    assert parse_run({**body, "deadline": None})["deadline"] is None
+    for bad in ({"cache_ttl": "soon"}, {"quorum": True}, {"deadline": [1]}, {"deadline": "inf"}):
+        try:
+            parse_run({**body, **bad})
+        except ValueError as e:
+            assert repr(next(iter(bad))) in str(e)
+        else:
+            raise AssertionError(f"{bad} was accepted")
@@ -0,0 +1,25 @@
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+import config
+from embedding_cache import EmbeddingCache
+
+def test_puts_are_written_to_disk_in_batches():
+    path = tempfile.mkdtemp()
+    cache = EmbeddingCache(path, max_entries=10000)
+    vector = np.ones(4, dtype=np.float32)
+    cache.put_many("embedder", ["consulta"], [vector])
+    # A single query miss doesn't rewrite the index on disk...
+    assert EmbeddingCache(path).get_many("embedder", ["consulta"]) == [None]
+    assert cache.get_many("embedder", ["consulta"])[0] is not None
+
+    # ...but it is there after a flush (a full batch, the interval, a document, or exit)
+    cache.put_many("embedder", [f"t{i}" for i in range(config.EMBED_CACHE_FLUSH_EVERY)],
+                   [vector] * config.EMBED_CACHE_FLUSH_EVERY)
+    assert EmbeddingCache(path).get_many("embedder", ["consulta"])[0] is not None
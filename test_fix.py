@@ -6,15 +6,14 @@ import os
 sys.path.append(os.getcwd())
 sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
 
-from model_council_app.app import state
+from model_council_app.app import state, VectorStore
 from model_council_app.rag import DocumentProcessor
 
 def test_fallback():
     print("Testing Fallback Logic...")
     
     # 1. Simulate a clear state
-    state.vector_store.chunks = []
-    state.vector_store.embeddings = None
+    state.vector_store = VectorStore()
     state.doc_loaded = False
     state.full_text = None
     
@@ -0,0 +1,51 @@
+import sys
+import os
+import json
+import tempfile
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from model_council_app import history
+from model_council_app.history import HistoryManager
+
+def _use_tmp_store(legacy=None):
+    directory = tempfile.mkdtemp()
+    history.HISTORY_DB = os.path.join(directory, "history.db")
+    history.HISTORY_FILE = os.path.join(directory, "history.json")
+    if legacy is not None:
+        with open(history.HISTORY_FILE, 'w', encoding='utf-8') as f:
+            json.dump(legacy, f)
+
+def test_save_list_and_get():
+    _use_tmp_store()
+    long_prompt = "p" * 500
+    first = HistoryManager.save_entry(long_prompt, "Debate (Opostos)", "veredito 1", ["llama3", "mistral"])
+    HistoryManager.save_entry("curto", "Padrão (Neutro)", "veredito 2", ["gemma"])
+
+    entries, total = HistoryManager.list_entries()
+    assert total == 2
+    assert [e["prompt"] for e in entries][0] == "curto"  # newest first
+    assert entries[1]["truncated"] and len(entries[1]["prompt"]) == history.PREVIEW_CHARS
+    assert "synthesis" not in entries[0]
+
+    full = HistoryManager.get_entry(first)
+    assert full["prompt"] == long_prompt and full["synthesis"] == "veredito 1"
+
+    assert HistoryManager.list_entries(model="mistral")[1] == 1
+    assert HistoryManager.list_entries(mode="Padrão (Neutro)")[0][0]["prompt"] == "curto"
+    assert HistoryManager.list_entries(limit=1, offset=1)[0][0]["id"] == first
+
+def test_legacy_json_is_imported_once():
+    _use_tmp_store(legacy=[
+        {"id": 2, "timestamp": "2026-02-19 15:24:08", "prompt": "novo", "mode": "m", "synthesis": "s2", "models": ["a"]},
+        {"id": 1, "timestamp": "2026-02-18 10:00:00", "prompt": "velho", "mode": "m", "synthesis": "s1", "models": ["b"]}
+    ])
+    entries, total = HistoryManager.list_entries()
+    assert total == 2 and entries[0]["prompt"] == "novo"
+    assert HistoryManager.list_entries(date_to="2026-02-18")[0][0]["prompt"] == "velho"
+
+    # Reconnecting must not import the file again
+    history._local.conn = None
+    assert HistoryManager.list_entries()[1] == 2
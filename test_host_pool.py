@@ -0,0 +1,88 @@
+import sys
+import os
+import asyncio
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app', 'benchmarks'))
+
+from stub_ollama import StubOllama
+from model_council_app.host_pool import HostPool
+
+async def _chat(pool, model):
+    async def attempt(client, host):
+        await client.chat(model=model, messages=[{'role': 'user', 'content': 'oi'}])
+        return host.url
+    return await pool.call(model, attempt)
+
+def test_routing_and_failover_across_stubs():
+    with StubOllama(models=["m1:latest", "shared:latest"], latency=0.05) as a, \
+         StubOllama(models=["m2:latest", "shared:latest"], latency=0.05) as b:
+        pool = HostPool([a.url, b.url])
+        assert sorted(pool.model_names()) == ["all-minilm:latest", "m1:latest", "m2:latest", "shared:latest"]
+        assert [h.url for h in pool.hosts_for("m2:latest")] == [b.url]
+
+        async def spread():
+            return await asyncio.gather(*(_chat(pool, "shared:latest") for _ in range(4)))
+        # Least-outstanding routing splits concurrent calls between the hosts
+        assert sorted(asyncio.run(spread())) == sorted([a.url, b.url] * 2)
+
+        a.stop()
+        # First choice is dead: the call is retried on the other host, which is then preferred
+        assert asyncio.run(_chat(pool, "shared:latest")) == b.url
+        assert not pool.hosts[0].available()
+        assert [h.url for h in pool.hosts_for("shared:latest")] == [b.url]
+
+def test_embeddings_go_to_dedicated_host():
+    with StubOllama() as council, StubOllama() as embedder:
+        pool = HostPool([council.url], embed_url=embedder.url)
+        before = council.requests
+        vectors = pool.embed("all-minilm:latest", ["um", "dois"])
+        assert len(vectors) == 2 and len(vectors[0]) == embedder.embedding_dim
+        assert council.requests == before
+        assert pool.embed_registry() is pool.embed_host.registry
+
+def test_stale_model_lists_are_refreshed_off_the_event_loop():
+    import threading
+    with StubOllama(models=["m1:latest"]) as a, StubOllama(models=["m2:latest"]) as b:
+        pool = HostPool([a.url, b.url])
+        threads = []
+        for host in pool.hosts:
+            refresh = host.registry.refresh
+            def recording(refresh=refresh):
+                threads.append(threading.current_thread())
+                return refresh()
+            host.registry.refresh = recording
+        # Never fetched: routing the first call has to list both hosts
+        assert asyncio.run(_chat(pool, "m2:latest")) == b.url
+        assert len(threads) == 2 and threading.main_thread() not in threads
+
+class _NoEmbedderClient:
+    def __init__(self):
+        self.shows = 0
+
+    def list(self):
+        return {"models": [{"model": "chat-a:latest", "size": 1}, {"model": "chat-b:latest", "size": 1}]}
+
+    def show(self, model):
+        self.shows += 1
+        raise ConnectionError("show failed")
+
+def test_embedder_lookup_is_not_repeated_for_every_query():
+    from model_council_app.model_registry import ModelRegistry
+    from model_council_app import rag
+
+    registry = ModelRegistry()
+    client = registry._client = _NoEmbedderClient()
+    original = rag.host_pool.embed_registry
+    rag.host_pool.embed_registry = lambda: registry
+    try:
+        store = rag.VectorStore()
+        assert store._get_embedding_model_name() is None
+        assert store._get_embedding_model_name() is None
+        # Failed lookups are remembered too: another store doesn't probe again
+        assert rag.VectorStore()._get_embedding_model_name() is None
+    finally:
+        rag.host_pool.embed_registry = original
+    assert client.shows == 2
@@ -0,0 +1,22 @@
+import sys
+import os
+import time
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from ingest import prefetch
+
+def test_closing_prefetch_leaves_the_source_free_to_resume():
+    def slow():
+        for i in range(5):
+            yield i
+            time.sleep(0.2)
+
+    source = slow()
+    items = prefetch(source, maxsize=1)
+    assert next(items) == 0
+    items.close()
+    # The producer thread is no longer inside the generator: no "already executing"
+    assert list(source) == [2, 3, 4]
@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from model_council_app import judge_budget
+
+PARAGRAPH = "O projeto é viável se os custos de infraestrutura forem controlados desde o início."
+
+def _answer(model, text):
+    return {"model": model, "response": text, "status": "Success"}
+
+def test_compaction_steps_stop_when_answers_fit():
+    short = [_answer("a", "Sim."), _answer("b", "Não.")]
+    assert judge_budget.compact(short, 100) == (short, "none")
+
+    # The same paragraph from three members: dropping repeats is enough
+    repeated = [_answer(m, PARAGRAPH + "\n\n" + f"Ponto exclusivo de {m}.") for m in "abc"]
+    answers, strategy = judge_budget.compact(repeated, 60)
+    assert strategy == "dedupe"
+    assert sum(a["response"].count(PARAGRAPH) for a in answers) == 1
+    assert all(f"Ponto exclusivo de {m}" in a["response"] for m, a in zip("abc", answers))
+
+def test_key_points_then_trim_fit_the_budget():
+    body = "\n\n".join(f"Parágrafo {i} com conclusão. Detalhes longos que podem sair {i} " * 3 for i in range(6))
+    answers = [_answer(m, f"# Título {m}\n\n- item {m}\n\n" + body) for m in "ab"]
+    budget = judge_budget.answers_tokens(answers) // 2
+    compacted, strategy = judge_budget.compact(answers, budget)
+    assert strategy == "key_points"
+    assert "- item a" in compacted[0]["response"] and "Detalhes longos" not in compacted[0]["response"]
+
+    tight = judge_budget.answers_tokens(compacted) // 2
+    trimmed = judge_budget.trim(answers, tight)
+    assert judge_budget.answers_tokens(trimmed) <= tight
+    assert all(a["response"].endswith("...(cortado)") for a in trimmed)
+
+def test_far_over_budget_asks_for_map_reduce_in_fitting_groups():
+    answers = [_answer(m, "palavra " * 400) for m in "abcd"]
+    assert judge_budget.compact(answers, 300)[1] == "map_reduce"
+    batches = judge_budget.groups(answers, 1700)
+    assert len(batches) == 2 and all(judge_budget.answers_tokens(b) <= 1700 for b in batches)
+
+def test_small_judge_context_cuts_the_context_block_not_the_answers():
+    import asyncio
+    from model_council_app import config
+    from model_council_app.council import ModelCouncil, host_pool
+
+    answers = [_answer(m, f"Resposta curta de {m}: {PARAGRAPH}") for m in "ab"]
+    original = host_pool.capabilities
+    host_pool.capabilities = lambda model: {"context_length": 2048}
+    try:
+        prepared = asyncio.run(ModelCouncil.prepare_synthesis("judge", "Vale a pena?", answers,
+                                                               context="Trecho do documento. " * 2000))
+    finally:
+        host_pool.capabilities = original
+
+    stats = prepared["stats"]
+    assert stats["context_trimmed"] and stats["strategy"] == "none"
+    # The answers reach the judge whole, and the prompt fits the judge's window
+    assert all(a["response"] in prepared["messages"][-1]["content"] for a in answers)
+    assert stats["tokens_after"] <= stats["budget_tokens"]
+    assert stats["tokens_after"] < stats["tokens_before"]
+    assert config.JUDGE_SEES_CONTEXT and prepared["messages"][0]["content"].startswith("Context information")
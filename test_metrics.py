@@ -0,0 +1,34 @@
+import sys
+import os
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+import metrics
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test.", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, stage='a"b')
+
+    lines = histogram.render().splitlines()
+    assert 'test_seconds_bucket{stage="a\\"b",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{stage="a\\"b",le="1"} 3' in lines
+    assert 'test_seconds_bucket{stage="a\\"b",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="a\\"b"} 4' in lines
+    assert 'test_seconds_sum{stage="a\\"b"} 3.65' in lines
+
+def test_run_collects_stages_and_ollama_calls():
+    with metrics.run() as timings:
+        with metrics.stage("retrieval_embed"):
+            pass
+        metrics.observe_ollama("m:latest", "member", {"load_duration": 2e9, "eval_duration": 5e8, "eval_count": 40})
+    # Outside the run, nothing more is collected
+    metrics.observe_ollama("m:latest", "member", {"eval_count": 1})
+
+    summary = timings.summary()
+    assert list(summary["stages"]) == ["retrieval_embed"]
+    assert summary["calls"] == [{"model": "m:latest", "role": "member", "load_s": 2.0, "prefill_s": None,
+                                 "generation_s": 0.5, "prompt_tokens": None, "eval_tokens": 40}]
+    assert 'ollama_load_seconds_count{model="m:latest",role="member"}' in metrics.render()
@@ -0,0 +1,49 @@
+import sys
+import os
+import time
+import threading
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+import config
+import parsing
+
+def _sleep_and_return(seconds, value):
+    time.sleep(seconds)
+    return value
+
+def test_timeout_of_one_job_does_not_break_the_others():
+    workers = config.PARSE_WORKERS
+    config.PARSE_WORKERS = 2
+    parsing._reset_pool()
+    try:
+        results = {}
+
+        def slow_but_fine():
+            results["other"] = parsing.run(_sleep_and_return, 1.0, "ok")
+
+        other = threading.Thread(target=slow_but_fine)
+        other.start()
+        time.sleep(0.2)
+        try:
+            parsing.run(_sleep_and_return, 30, "stuck", timeout=0.3)
+            assert False, "expected a timeout"
+        except TimeoutError:
+            pass
+        # New work goes to fresh workers while the other job finishes on the old ones
+        assert parsing.run(_sleep_and_return, 0, "fresh") == "fresh"
+        other.join()
+        assert results["other"] == "ok"
+    finally:
+        parsing._reset_pool()
+        config.PARSE_WORKERS = workers
+
+def test_workers_are_not_forked_from_the_web_process():
+    parsing._reset_pool()
+    try:
+        assert parsing._get_pool()._mp_context.get_start_method() in ("forkserver", "spawn")
+        assert parsing.run(_sleep_and_return, 0, "parsed") == "parsed"
+    finally:
+        parsing._reset_pool()
@@ -0,0 +1,31 @@
+import sys
+import os
+import time
+import tempfile
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from model_council_app.response_cache import ResponseCache
+
+def test_lru_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl=60, path=None)
+    keys = [ResponseCache.key("m", "sys", None, f"q{i}", 0.7) for i in range(3)]
+    assert ResponseCache.key("m", "sys", None, "q0", 0.8) != keys[0]
+
+    cache.put(keys[0], {"response": "a0"})
+    cache.put(keys[1], {"response": "a1"})
+    assert cache.get(keys[0])["response"] == "a0"  # q0 is now most recently used
+    cache.put(keys[2], {"response": "a2"})
+    assert cache.get(keys[1]) is None and cache.get(keys[0]) is not None
+
+    cache.put(keys[2], {"response": "a2"}, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get(keys[2]) is None
+
+def test_disk_store_survives_restart():
+    path = os.path.join(tempfile.mkdtemp(), "responses.db")
+    key = ResponseCache.key("m", None, "ctx", "q", 0.7)
+    ResponseCache(path=path).put(key, {"model": "m", "response": "ção", "status": "Success"})
+    assert ResponseCache(path=path).get(key)["response"] == "ção"
@@ -0,0 +1,48 @@
+import sys
+import os
+import numpy as np
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from model_council_app import retrieval
+from model_council_app.rag import DocumentProcessor
+from model_council_app.vector_index import VectorIndex
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+def _index():
+    text = "".join(f"Frase número {i} do relatório anual. " for i in range(120))
+    chunks = DocumentProcessor.split_text(text, chunk_size=300, overlap=60)
+    # Chunks 2 and 3 are about the query, chunk 4 nearly repeats chunk 3, the rest are unrelated
+    rng = np.random.default_rng(0)
+    embeddings = [_unit(np.r_[0, rng.standard_normal(7)]) for _ in chunks]
+    query = _unit([1, 0, 0, 0, 0, 0, 0, 0])
+    embeddings[2] = _unit([0.9, 0.3, 0, 0, 0, 0, 0, 0])
+    embeddings[3] = _unit([0.95, 0, 0.3, 0, 0, 0, 0, 0])
+    embeddings[7] = _unit([0.95, 0, 0.31, 0, 0, 0, 0, 0])
+    embeddings[10] = _unit([0.6, 0, 0, 0.8, 0, 0, 0, 0])
+    index = VectorIndex()
+    index.add("relatorio.txt", chunks, np.vstack(embeddings), "embedder")
+    return index, chunks, query
+
+def test_adjacent_chunks_merge_without_repeating_the_overlap():
+    index, chunks, query = _index()
+    hits = index.search(query, 6, model="embedder")
+    passages = retrieval.merge_adjacent(hits)
+    merged = next(p for p in passages if p["start"] == 2)
+    assert merged["end"] == 3
+    assert merged["text"] == chunks[2] + chunks[3][60:]
+
+def test_mmr_prefers_new_ground_and_budget_is_respected():
+    index, chunks, query = _index()
+    hits = index.search(query, 4, model="embedder")
+    context = retrieval.build_context(query, hits, 2, max_chars=10000)
+    # The merged 2-3 passage is picked; chunk 7 repeats it, so chunk 10 is chosen instead
+    assert context == [chunks[2] + chunks[3][60:], chunks[10]]
+
+    small = retrieval.build_context(query, hits, 2, max_chars=400)
+    assert sum(len(c) for c in small) <= 400
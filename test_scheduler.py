@@ -0,0 +1,48 @@
+import sys
+import os
+import asyncio
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from model_council_app.scheduler import Schedule
+
+def test_schedule_respects_order_and_memory():
+    schedule = Schedule(["a", "b", "c"], {"a": 2, "b": 2, "c": 2}, budget=4, resident={"a"})
+    started, running, peak = [], [0], [0]
+
+    async def member(model, delay):
+        async with schedule.slot(model):
+            started.append(model)
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(delay)
+            running[0] -= 1
+
+    async def main():
+        # Created in reverse order; admitted in plan order, two at a time
+        await asyncio.gather(member("c", 0.01), member("b", 0.01), member("a", 0.01))
+
+    asyncio.run(main())
+    assert started == ["a", "b", "c"]
+    assert peak[0] == 2
+    assert schedule.summary()["loads_expected"] == 2
+
+def test_cancelled_waiter_does_not_block_later_members():
+    schedule = Schedule(["a", "b", "c"], {"a": 3, "b": 3, "c": 1}, budget=4, resident=set())
+
+    async def main():
+        async def member(model, delay):
+            async with schedule.slot(model):
+                await asyncio.sleep(delay)
+            return model
+
+        a = asyncio.create_task(member("a", 0.05))
+        b = asyncio.create_task(member("b", 0.05))
+        c = asyncio.create_task(member("c", 0.0))
+        await asyncio.sleep(0.01)
+        b.cancel()  # b is waiting for memory; c must still get its turn
+        return await asyncio.wait_for(asyncio.gather(a, c), 1)
+
+    assert asyncio.run(main()) == ["a", "c"]
@@ -0,0 +1,63 @@
+import sys
+import os
+import tempfile
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from sessions import SessionManager
+
+def _upload(manager, session_id, text):
+    state = manager.acquire(session_id)
+    state.vector_store.index.add(f"{session_id}.txt", [text])
+    state.full_text = text
+    state.doc_loaded = True
+    manager.release(state)
+    return state
+
+def test_sessions_are_isolated_and_idle_ones_are_unloaded_to_disk():
+    manager = SessionManager(path=tempfile.mkdtemp(), memory_budget=None)
+    alice = _upload(manager, "alice-workspace", "Relatório financeiro do trimestre.")
+    bob = _upload(manager, "bob-workspace", "Contrato de prestação de serviços.")
+    assert [d["name"] for d in alice.vector_store.documents()] == ["alice-workspace.txt"]
+    assert manager.get(None) is manager.default
+
+    # Room for one session: the least recently used idle one (alice) is unloaded
+    manager.get("bob-workspace")
+    manager.memory_budget = manager.default.memory_bytes() + bob.memory_bytes()
+    manager.enforce_budget()
+    stats = manager.stats()
+    assert [s["id"] for s in stats["loaded"]] == ["default", "bob-workspace"]
+    assert stats["unloaded"] == 1 and stats["evictions"] == 1
+
+    # Pinned sessions stay; alice comes back from disk with her document and text
+    pinned = manager.acquire("bob-workspace")
+    alice = manager.get("alice-workspace")
+    assert [d["name"] for d in alice.vector_store.documents()] == ["alice-workspace.txt"]
+    assert alice.full_text == "Relatório financeiro do trimestre."
+    manager.enforce_budget()
+    assert "bob-workspace" in [s["id"] for s in manager.stats()["loaded"]]
+    manager.release(pinned)
+
+def test_session_text_and_filename_survive_a_restart_without_eviction():
+    path = tempfile.mkdtemp()
+    manager = SessionManager(path=path, memory_budget=None)
+    state = _upload(manager, "carol-workspace", "Ata da reunião de diretoria.")
+    state.filename = "ata.pdf"
+    state.save()
+
+    # A new process: nothing was evicted, yet the session comes back whole
+    restored = SessionManager(path=path, memory_budget=None).get("carol-workspace")
+    assert restored.full_text == "Ata da reunião de diretoria."
+    assert restored.filename == "ata.pdf"
+
+def test_public_stats_do_not_list_other_sessions():
+    import json
+    manager = SessionManager(path=tempfile.mkdtemp(), memory_budget=None)
+    alice = _upload(manager, "alice-secret-workspace-0001", "Plano de fusão confidencial.")
+    bob = _upload(manager, "bob-workspace", "Contrato de prestação de serviços.")
+    stats = manager.public_stats(bob)
+    assert stats["loaded"] == 3 and stats["session"]["id"] == "bob-workspace"
+    assert stats["memory_used"] >= alice.memory_bytes() + bob.memory_bytes()
+    assert "alice-secret-workspace-0001" not in json.dumps(stats)
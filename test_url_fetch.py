@@ -0,0 +1,76 @@
+import sys
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from url_fetch import Fetcher
+from rag import DocumentProcessor
+
+PAGES = {"/a": b"<html><body><p>Relatorio anual</p><script>x()</script></body></html>", "/b": b"<p>Contrato</p>"}
+downloads = []
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in PAGES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = f'"{self.path[1:]}-v1"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        downloads.append(self.path)
+        body = PAGES[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_pages_are_fetched_concurrently_and_revalidated_from_cache():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    fetcher = Fetcher(cache_path=tempfile.mkdtemp(), workers=4)
+    urls = [f"{base}/a", f"{base}/b", f"{base}/missing"]
+    try:
+        first = {url: (page, error) for url, page, error in fetcher.map(fetcher.fetch, urls)}
+        assert first[f"{base}/a"][0]["cached"] is False
+        assert first[f"{base}/missing"][1] is not None
+        assert "Relatorio anual" in DocumentProcessor.page_text(first[f"{base}/a"][0])
+        assert "x()" not in DocumentProcessor.page_text(first[f"{base}/a"][0])
+
+        # Second round: 304 Not Modified, bodies come from disk
+        again = fetcher.fetch(f"{base}/a")
+        assert again["cached"] is True and again["content"] == PAGES["/a"]
+        assert sorted(downloads) == ["/a", "/b"]
+    finally:
+        server.shutdown()
+
+class _Response:
+    def __init__(self, url, size):
+        self.headers = {'ETag': f'"{url}"', 'Content-Type': 'text/html'}
+        self.content = b"x" * size
+
+def test_url_cache_drops_least_recently_used_pages_beyond_its_size():
+    import time
+    from url_fetch import UrlCache
+    cache = UrlCache(tempfile.mkdtemp(), max_bytes=2500)
+    for url in ("a", "b"):
+        cache.put(url, _Response(url, 1000))
+        time.sleep(0.02)
+    assert cache.get("a") is not None  # "a" is now more recent than "b"
+    time.sleep(0.02)
+    cache.put("c", _Response("c", 1000))
+    assert cache.get("b") is None
+    assert cache.get("a")[1] == b"x" * 1000 and cache.get("c") is not None
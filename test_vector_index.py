@@ -0,0 +1,80 @@
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'model_council_app'))
+
+from model_council_app.vector_index import VectorIndex
+
+def _unit_rows(n, dim, seed):
+    rows = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+def test_persistent_index_roundtrip():
+    path = tempfile.mkdtemp()
+    index = VectorIndex(path)
+    emb_a, emb_b = _unit_rows(5, 8, 1), _unit_rows(3, 8, 2)
+    doc_a = index.add("a.txt", [f"a{i} ção" for i in range(5)], emb_a, "embedder")
+    index.add("b.txt", [f"b{i}" for i in range(3)], emb_b, "embedder")
+
+    # Reopen from disk: both documents are there, text and vectors intact
+    reopened = VectorIndex(path)
+    assert [d["name"] for d in reopened.documents()] == ["a.txt", "b.txt"]
+    score, segment, i = reopened.search(emb_a[2], 1, model="embedder")[0]
+    assert segment.chunk(i) == "a2 ção"
+    assert abs(score - 1.0) < 1e-5
+
+    # Deleting one document leaves the other searchable
+    assert reopened.delete(doc_a)
+    assert len(VectorIndex(path)) == 3
+    _, segment, i = VectorIndex(path).search(emb_b[1], 1, model="embedder")[0]
+    assert segment.chunk(i) == "b1"
+
+def test_search_ignores_other_embedding_models():
+    index = VectorIndex()
+    index.add("a.txt", ["a"], _unit_rows(1, 8, 1), "embedder-1")
+    assert index.search(_unit_rows(1, 8, 1)[0], 3, model="embedder-2") == []
+
+def test_quantized_storage_keeps_rankings_in_memory_and_on_disk():
+    emb = _unit_rows(200, 32, 3)
+    chunks = [f"trecho {i} ação" for i in range(200)]
+    for dtype, tolerance in (("float16", 1e-3), ("int8", 2e-2)):
+        for path in (None, tempfile.mkdtemp()):
+            index = VectorIndex(path, dtype=dtype)
+            index.add("a.txt", chunks, emb, "embedder")
+            if path:
+                index = VectorIndex(path)
+            segment = index.segments[0]
+            assert segment.vectors.dtype == np.dtype(dtype)
+            assert np.abs(segment.embeddings - emb).max() < tolerance
+            score, segment, i = index.search(emb[17], 1, model="embedder")[0]
+            assert (i, segment.chunk(i)) == (17, "trecho 17 ação")
+            assert abs(score - 1.0) < tolerance
+
+    # Chunk text of in-memory segments is one buffer, not a list of str
+    index = VectorIndex(dtype="int8")
+    index.add("a.txt", chunks, emb, "embedder")
+    assert isinstance(index.segments[0]._text, bytes)
+    segment = index.segments[0]
+    assert segment.vectors.nbytes + segment.scales.nbytes < emb.nbytes / 3
+
+def test_ivf_keeps_quantized_rows_in_their_precision():
+    import config
+    emb = _unit_rows(400, 32, 4)
+    exact = VectorIndex(dtype="int8")
+    exact.add("a.txt", [f"c{i}" for i in range(400)], emb, "embedder")
+    original = config.IVF_MIN_VECTORS
+    config.IVF_MIN_VECTORS = 100
+    try:
+        ivf = VectorIndex(dtype="int8", backend="ivf")
+        ivf.add("a.txt", [f"c{i}" for i in range(400)], emb, "embedder")
+        # Each row finds itself, scored as by the exact search over the same int8 rows
+        for row in (0, 123, 399):
+            score, _, i = ivf.search(emb[row], 1, model="embedder")[0]
+            assert i == row and abs(score - exact.search(emb[row], 1, model="embedder")[0][0]) < 1e-5
+        assert ivf._ann[1].matrix.dtype == np.int8
+    finally:
+        config.IVF_MIN_VECTORS = original